@@ -1,10 +1,55 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Deal, Business, User, SavedDeal, Notification, DealAnalytics, OTP, CustomerRequest
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import Deal, Business, User, SavedDeal, Notification, DealAnalytics, OTP, CustomerRequest, PlatformStats
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoid COUNT(*) over large tables: an unfiltered changelist uses the planner's
+    row estimate (pg_class.reltuples, summed over partitions), and a filtered one
+    counts at most ADMIN_COUNT_LIMIT rows.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        if not queryset.query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT SUM(GREATEST(c.reltuples, 0))::bigint FROM pg_class c "
+                "WHERE c.oid = %s::regclass OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                [table, table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else None
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables that grow without bound."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Deal)
-class DealAdmin(admin.ModelAdmin):
+class DealAdmin(ScalableAdmin):
     list_display = ['title', 'business', 'category', 'is_active', 'created_at']
-    list_filter = ['is_active', 'category', 'created_at']
+    list_filter = ['is_active', 'category']
+    list_select_related = ['business']
+    autocomplete_fields = ['business']
+    date_hierarchy = 'end_time'
     search_fields = ['title', 'description', 'business__name']
     readonly_fields = ['views', 'clicks', 'created_at', 'updated_at']
     
@@ -17,6 +62,8 @@ class DealAdmin(admin.ModelAdmin):
 @admin.register(Business)
 class BusinessAdmin(admin.ModelAdmin):
     list_display = ['name', 'owner_user', 'contact_phone']
+    list_select_related = ['owner_user']
+    autocomplete_fields = ['owner_user']
     search_fields = ['name', 'owner_user__phone']
 
 @admin.register(User)
@@ -26,27 +73,42 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ['phone', 'first_name', 'last_name']
 
 @admin.register(SavedDeal)
-class SavedDealAdmin(admin.ModelAdmin):
+class SavedDealAdmin(ScalableAdmin):
     list_display = ['user', 'deal', 'saved_at']
-    list_filter = ['saved_at']
+    list_select_related = ['user', 'deal']
+    raw_id_fields = ['user', 'deal']
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ScalableAdmin):
     list_display = ['user', 'title', 'notification_type', 'is_read', 'created_at']
-    list_filter = ['notification_type', 'is_read', 'created_at']
+    list_filter = ['notification_type', 'is_read']
+    list_select_related = ['user']
+    raw_id_fields = ['user', 'related_deal']
+    date_hierarchy = 'created_at'
 
 @admin.register(DealAnalytics)
-class DealAnalyticsAdmin(admin.ModelAdmin):
+class DealAnalyticsAdmin(ScalableAdmin):
     list_display = ['deal', 'user', 'action_type', 'created_at']
-    list_filter = ['action_type', 'created_at']
+    list_filter = ['action_type']
+    list_select_related = ['deal', 'user']
+    raw_id_fields = ['deal', 'user', 'agent']
+    date_hierarchy = 'created_at'
 
 @admin.register(OTP)
-class OTPAdmin(admin.ModelAdmin):
-    list_display = ['phone', 'otp_code', 'created_at', 'expires_at', 'is_verified']
+class OTPAdmin(ScalableAdmin):
+    list_display = ['phone', 'attempts', 'created_at', 'expires_at', 'is_verified']
     list_filter = ['is_verified', 'created_at']
-    readonly_fields = ['created_at', 'expires_at']
+    readonly_fields = ['code_hash', 'attempts', 'created_at', 'expires_at']
 
 @admin.register(CustomerRequest)
-class CustomerRequestAdmin(admin.ModelAdmin):
+class CustomerRequestAdmin(ScalableAdmin):
     list_display = ['user', 'title', 'category', 'is_active', 'created_at']
-    list_filter = ['category', 'is_active', 'created_at']
+    list_filter = ['category', 'is_active']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    date_hierarchy = 'created_at'
+
+@admin.register(PlatformStats)
+class PlatformStatsAdmin(admin.ModelAdmin):
+    list_display = ['total_customers', 'total_businesses', 'total_active_deals', 'total_customer_requests', 'updated_at']
+    readonly_fields = ['updated_at']
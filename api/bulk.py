@@ -0,0 +1,322 @@
+"""
+Bulk deal import and streaming exports for merchants.
+
+import_deals() validates CSV or JSON Lines rows one at a time as they are
+read. It inserts valid deals with bulk_create in batches of
+DEAL_IMPORT_BATCH_SIZE, fills missing locations from the business in memory,
+and queues one announcement per business for the whole import instead of one
+per deal. Announcements are sent by the send_announcements worker, never on
+the request thread: one SMS per customer takes minutes for a large audience.
+
+csv_response() and ndjson_response() stream any row iterator with constant
+memory; the deal export's columns can be imported again.
+"""
+import csv
+import io
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from . import inbox
+from .counters import pending_expression
+from .log import sample
+from .models import Deal, DealAnalytics, DealAnnouncement, Notification, User
+from .serializers import DealImportSerializer
+from .tiles import invalidate_points
+from .utils import notify
+
+logger = logging.getLogger('api')
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_COLUMNS = [
+    'id', 'business_id', 'title', 'description', 'category', 'cta', 'start_time', 'end_time',
+    'is_active', 'lat', 'lon', 'views', 'clicks', 'saves', 'created_at',
+]
+ANALYTICS_EXPORT_COLUMNS = ['id', 'created_at', 'deal_id', 'deal_title', 'action_type', 'user_id', 'user_agent']
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(filename, content_type=''):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in content_type:
+        return 'jsonl'
+    return None
+
+
+def iter_records(stream, fmt):
+    """
+    Yield (line number, record dict or None, error or None) from a binary stream
+    without reading it whole. Empty CSV cells are treated as missing.
+    """
+    text = io.TextIOWrapper(getattr(stream, 'file', stream), encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip()
+                for key, value in record.items()
+                if key and isinstance(value, str) and value.strip()
+            }, None
+    else:
+        for number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(record, dict):
+                yield number, None, 'Expected a JSON object'
+                continue
+            yield number, record, None
+
+
+def import_deals(businesses, stream, fmt, notify_customers=True, dry_run=False):
+    """
+    Import deals for the given businesses (the first is the default for rows
+    without business_id). Valid rows are inserted and invalid ones reported;
+    the whole import is one transaction.
+    """
+    allowed = {business.id: business for business in businesses}
+    summaries = {business.id: business.summary() for business in businesses}  # bulk_create skips Deal.save()
+    default = businesses[0]
+    batch_size = getattr(settings, 'DEAL_IMPORT_BATCH_SIZE', 500)
+    max_rows = getattr(settings, 'DEAL_IMPORT_MAX_ROWS', 5000)
+
+    created = {}  # business id -> [Deal]
+    errors, error_count, rows = [], 0, 0
+    batch = []
+
+    def report(line, detail):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line, 'errors': detail})
+
+    def flush():
+        if batch and not dry_run:
+            for deal in Deal.objects.bulk_create(batch):  # type: ignore[attr-defined]
+                created.setdefault(deal.business_id, []).append(deal)
+        elif batch:
+            for deal in batch:
+                created.setdefault(deal.business_id, []).append(deal)
+        batch.clear()
+
+    with transaction.atomic():
+        for line, record, error in iter_records(stream, fmt):
+            rows += 1
+            if rows > max_rows:
+                report(line, f'Import is limited to {max_rows} rows; the rest was ignored.')
+                break
+            if error:
+                report(line, error)
+                continue
+            serializer = DealImportSerializer(data=record)
+            if not serializer.is_valid():
+                report(line, serializer.errors)
+                continue
+            data = serializer.validated_data
+            business = allowed.get(data.pop('business_id', None) or default.id)
+            if business is None:
+                report(line, {'business_id': 'Not one of your businesses.'})
+                continue
+            lat, lon = data.pop('lat', None), data.pop('lon', None)
+            location = Point(lon, lat, srid=4326) if lat is not None else business.location
+            batch.append(Deal(business=business, business_summary=summaries[business.id], location=location, **data))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        if not dry_run:
+            transaction.on_commit(lambda: invalidate_points(
+                [deal.location for deals in created.values() for deal in deals]
+            ))
+            if notify_customers:
+                for business_id, deals in created.items():
+                    queue_announcement(allowed[business_id], deals)
+
+    return {
+        'created': sum(len(deals) for deals in created.values()),
+        'rows': rows,
+        'error_count': error_count,
+        'errors': errors,
+        'dry_run': dry_run,
+    }
+
+
+def queue_announcement(business, deals):
+    """Queue the customer announcement of a business's new deals (see send_announcements())."""
+    DealAnnouncement.objects.create(business=business, deal_ids=[deal.id for deal in deals])  # type: ignore[attr-defined]
+
+
+def claim_announcements(limit):
+    """
+    Mark up to `limit` queued announcements as started and return them.
+    Concurrent workers skip rows another worker has locked.
+    """
+    with transaction.atomic():
+        ids = list(
+            DealAnnouncement.objects.select_for_update(skip_locked=True)  # type: ignore[attr-defined]
+            .filter(started_at=None).order_by('id').values_list('id', flat=True)[:limit]
+        )
+        DealAnnouncement.objects.filter(id__in=ids).update(started_at=timezone.now())  # type: ignore[attr-defined]
+    return list(DealAnnouncement.objects.filter(id__in=ids).select_related('business').order_by('id'))  # type: ignore[attr-defined]
+
+
+def send_announcements(limit=20):
+    """
+    Send up to `limit` queued announcements and return how many were sent.
+    Sent rows are deleted. A claimed row is never retried, so a crash cannot
+    send customers the same SMS twice; failures keep their error.
+    """
+    sent = 0
+    for announcement in claim_announcements(limit):
+        # Deals removed or deactivated since the request are not announced
+        deals = list(Deal.objects.filter(id__in=announcement.deal_ids, is_active=True).order_by('id'))  # type: ignore[attr-defined]
+        try:
+            announce_deals(announcement.business, deals)
+        except Exception as e:
+            logger.error('Failed to send deal announcement %s for business %s: %s', announcement.id, announcement.business_id, e)
+            DealAnnouncement.objects.filter(id=announcement.id).update(error=str(e))  # type: ignore[attr-defined]
+            continue
+        announcement.delete()
+        sent += 1
+    return sent
+
+
+def announce_deals(business, deals):
+    """
+    One SMS and in-app notification per customer for a batch of new deals from
+    business, plus one confirmation to the business.
+    """
+    if not deals:
+        return
+    if len(deals) == 1:
+        sms = f"New promotion from {business.name}: {deals[0].title}. Open your Minglin app for details."
+        push = f"New promotion from {business.name}: {deals[0].title}."
+    else:
+        sms = f"{len(deals)} new promotions from {business.name}. Open your Minglin app for details."
+        push = f"{len(deals)} new promotions from {business.name}."
+
+    customers = (
+        User.objects.filter(User.notification_audience('new_deal'), role='user')  # type: ignore[attr-defined]
+        .exclude(phone='').only('id', 'phone')
+    )
+    notifications = []
+    sent = 0
+    for customer in customers.iterator(chunk_size=1000):
+        try:
+            notify(customer.phone.lstrip('+'), sms)
+            sent += 1
+            sample(logger, 'SMS notification sent to %s for %s deals of business %s', customer.phone, len(deals), business.id)
+        except Exception as e:
+            logger.error('Failed to send SMS to %s: %s', customer.phone, e)
+        notifications.append(Notification(
+            user_id=customer.id, title='New Deal!', message=push,
+            notification_type='new_deal', related_deal=deals[0],
+        ))
+        if len(notifications) >= 1000:
+            inbox.deliver(notifications)
+            notifications = []
+    inbox.deliver(notifications)
+
+    if business.contact_phone and sent:
+        try:
+            notify(business.contact_phone.lstrip('+'), f"Promotion notifications sent to {sent} customers")
+        except Exception as e:
+            logger.error('Failed to send confirmation SMS to business: %s', e)
+    logger.info('Announced %s deals of business %s to %s customers', len(deals), business.id, sent)
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming."""
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, header, rows):
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def ndjson_response(filename, header, rows):
+    """Stream rows as JSON Lines objects keyed by header."""
+    def stream():
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), default=str, separators=(',', ':')) + '\n'
+
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_deal_rows(businesses, using=None):
+    """
+    Rows of EXPORT_COLUMNS for the businesses' deals, read with a server-side
+    cursor. Rows are produced while the response streams, after the request's
+    database routing has been reset, so the caller picks the alias.
+    """
+    queryset = (
+        Deal.objects.using(using).filter(business__in=businesses)  # type: ignore[attr-defined]
+        .annotate(
+            pending_views=pending_expression('views'),
+            pending_clicks=pending_expression('clicks'),
+            saves=Count('saved_by'),
+        )
+        .order_by('id')
+        .values_list(
+            'id', 'business_id', 'title', 'description', 'category', 'cta', 'start_time', 'end_time',
+            'is_active', 'location', 'views', 'pending_views', 'clicks', 'pending_clicks', 'saves', 'created_at',
+        )
+    )
+    for (deal_id, business_id, title, description, category, cta, start_time, end_time, is_active,
+         location, views, pending_views, clicks, pending_clicks, saves, created_at) in queryset.iterator(chunk_size=2000):
+        yield [
+            deal_id, business_id, title, description, category, cta, start_time.isoformat(), end_time.isoformat(),
+            is_active, location.y if location else '', location.x if location else '',
+            views + pending_views, clicks + pending_clicks, saves, created_at.isoformat(),
+        ]
+
+
+def analytics_export_queryset(deal_ids, start, end, using=None):
+    """
+    Interactions with deal_ids between start and end, oldest first. Filtering
+    on the deal ids and created_at lets Postgres skip partitions outside the range.
+    """
+    return (
+        DealAnalytics.objects.using(using)  # type: ignore[attr-defined]
+        .filter(deal_id__in=list(deal_ids), created_at__gte=start, created_at__lt=end)
+        .annotate(agent_value=Coalesce('agent__value', NullIf('user_agent', Value(''))))
+        .order_by('created_at', 'id')
+        .values_list('id', 'created_at', 'deal_id', 'action_type', 'user_id', 'agent_value')
+    )
+
+
+def export_analytics_rows(deals, start, end, using=None):
+    """
+    Rows of ANALYTICS_EXPORT_COLUMNS for interactions with deals (a {id: title}
+    dict) between start and end. Titles come from the dict instead of a join.
+    IP addresses are not exported.
+    """
+    queryset = analytics_export_queryset(deals, start, end, using)
+    chunk_size = getattr(settings, 'ANALYTICS_EXPORT_CHUNK_SIZE', 5000)
+    for row_id, created_at, deal_id, action_type, user_id, agent in queryset.iterator(chunk_size=chunk_size):
+        yield [row_id, created_at.isoformat(), deal_id, deals.get(deal_id, ''), action_type, user_id, agent]
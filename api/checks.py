@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Map tile invalidation (api/tiles.py), read-your-writes pins (api/routers.py)
+    and, by default, throttles (api/throttling.py) only work across workers with a cache
+    they all share; a per-process local memory cache is fine for DEBUG only.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or not backend.endswith('.LocMemCache'):
+        return []
+    return [Warning(
+        'The default cache is local to each worker process.',
+        hint=(
+            'Set CACHE_URL to a cache shared by all workers (e.g. a redis URL, or '
+            'dbcache://django_cache after `manage.py createcachetable`); otherwise other '
+            'workers keep serving invalidated map tiles and reads are not pinned after writes.'
+        ),
+        id='api.W001',
+    )]
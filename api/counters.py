@@ -0,0 +1,110 @@
+"""
+Sharded deal counters.
+
+Popular deals get many concurrent view/click increments. Instead of every
+worker queueing on the Deal row lock (and bumping updated_at), increments are
+upserted into one of DEAL_COUNTER_SHARDS DealCounterShard rows chosen at
+random. Deal.views/clicks become a cache that reconcile() folds the shards
+into; exact totals are Deal.views plus the deal's remaining shards, so
+everything that shows or ranks by the counters reads through pending()
+(instances), pending_expression() (querysets) or totals().
+"""
+import random
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Deal, DealCounterShard
+
+SHARD_TABLE = DealCounterShard._meta.db_table
+
+
+def pick_shard():
+    return random.randrange(getattr(settings, 'DEAL_COUNTER_SHARDS', 16))
+
+
+def upsert_sql(source):
+    """
+    SQL adding (deal_id, views, clicks) rows from `source` to one shard, given as
+    the only placeholder. Usable as a data-modifying CTE.
+    """
+    return (
+        f"INSERT INTO {SHARD_TABLE} AS s (deal_id, shard, views, clicks) "
+        f"SELECT deal_id, %s, views, clicks FROM {source} WHERE views > 0 OR clicks > 0 "
+        f"ON CONFLICT (deal_id, shard) DO UPDATE "
+        f"SET views = s.views + EXCLUDED.views, clicks = s.clicks + EXCLUDED.clicks"
+    )
+
+
+def increment(deal_id, views=0, clicks=0):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH delta (deal_id, views, clicks) AS (VALUES (%s::bigint, %s::integer, %s::integer)) "
+            + upsert_sql('delta'),
+            [deal_id, views, clicks, pick_shard()]
+        )
+
+
+def pending(deal_ids):
+    """Return {deal_id: (views, clicks)} not yet reconciled, for deals with shards."""
+    shards = (
+        DealCounterShard.objects.filter(deal_id__in=deal_ids)  # type: ignore[attr-defined]
+        .values('deal_id').annotate(views=Sum('views'), clicks=Sum('clicks'))
+    )
+    return {shard['deal_id']: (shard['views'], shard['clicks']) for shard in shards}
+
+
+def pending_expression(field, deal='pk'):
+    """Unreconciled `field` ('views' or 'clicks') of the deal at OuterRef(deal), for annotations."""
+    shards = (
+        DealCounterShard.objects.filter(deal=OuterRef(deal))  # type: ignore[attr-defined]
+        .values('deal').annotate(total=Sum(field)).values('total')
+    )
+    return Coalesce(Subquery(shards), 0, output_field=IntegerField())
+
+
+def prefetch(deals):
+    """Load the unreconciled counts of Deal instances in one query (see current())."""
+    counts = pending([deal.id for deal in deals])
+    for deal in deals:
+        deal.pending_counts = counts.get(deal.id, (0, 0))
+    return deals
+
+
+def current(deal):
+    """Exact (views, clicks) of a Deal instance, prefetched or looked up."""
+    if not hasattr(deal, 'pending_counts'):
+        prefetch([deal])
+    return deal.views + deal.pending_counts[0], deal.clicks + deal.pending_counts[1]
+
+
+def totals(deal_ids):
+    """
+    Return {deal_id: (views, clicks)} including increments not yet reconciled.
+    """
+    counts = pending(deal_ids)
+    return {
+        deal['id']: (
+            deal['views'] + counts.get(deal['id'], (0, 0))[0],
+            deal['clicks'] + counts.get(deal['id'], (0, 0))[1],
+        )
+        for deal in Deal.objects.filter(id__in=deal_ids).values('id', 'views', 'clicks')  # type: ignore[attr-defined]
+    }
+
+
+def reconcile():
+    """
+    Atomically drain all shards into Deal.views/clicks. Returns the number of deals updated.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH drained AS (DELETE FROM {SHARD_TABLE} RETURNING deal_id, views, clicks), "
+            f"delta AS (SELECT deal_id, SUM(views) AS views, SUM(clicks) AS clicks FROM drained GROUP BY deal_id) "
+            f"UPDATE {Deal._meta.db_table} d SET views = d.views + delta.views, clicks = d.clicks + delta.clicks "
+            f"FROM delta WHERE d.id = delta.deal_id"
+        )
+        return cursor.rowcount
+
+# See README.md and inline comments for documentation.
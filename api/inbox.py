@@ -0,0 +1,134 @@
+"""
+Notification inbox: unread counters and retention.
+
+NotificationCounter keeps each user's unread count. deliver() bulk-inserts
+notifications and adds them to their recipients' counters in the same
+transaction; mark_read() flips is_read with one UPDATE and subtracts the
+number of rows it actually changed, so repeated or concurrent calls never
+double count. delete() removes many notifications at once (e.g. those of a
+deleted deal) with their tombstones and counter updates in one statement.
+Single saves and deletes are counted by the receivers in api/signals.py.
+
+Counter rows are created from a real COUNT the first time they are read
+(unread_count), and adjustments skip users without a row, so existing users
+need no backfill. recount() repairs drift, e.g. after QuerySet.update() calls
+that bypass this module. prune() deletes old read notifications.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter, Tombstone
+
+COUNTER_TABLE = NotificationCounter._meta.db_table
+NOTIFICATION_TABLE = Notification._meta.db_table
+TOMBSTONE_TABLE = Tombstone._meta.db_table
+
+
+def adjust(deltas):
+    """Add {user_id: delta} to the users' existing counters."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = sorted(deltas)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Lock in user id order so concurrent fan-outs cannot deadlock
+        cursor.execute(
+            f"SELECT 1 FROM {COUNTER_TABLE} WHERE user_id = ANY(%s) ORDER BY user_id FOR UPDATE", [user_ids]
+        )
+        cursor.execute(
+            f"UPDATE {COUNTER_TABLE} AS c SET unread = GREATEST(c.unread + d.delta, 0) "
+            f"FROM unnest(%s::bigint[], %s::integer[]) AS d(user_id, delta) WHERE c.user_id = d.user_id",
+            [user_ids, [deltas[user_id] for user_id in user_ids]],
+        )
+
+
+def deliver(notifications, batch_size=1000):
+    """bulk_create notifications and count the unread ones for their recipients."""
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=batch_size)  # type: ignore[attr-defined]
+        adjust(Counter(notification.user_id for notification in created if not notification.is_read))
+    return created
+
+
+def mark_read(user_id, ids=None):
+    """Mark the user's unread notifications (or only those in ids) read. Returns how many changed."""
+    queryset = Notification.objects.filter(user_id=user_id, is_read=False)  # type: ignore[attr-defined]
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    with transaction.atomic():
+        # update() bypasses auto_now, so bump updated_at explicitly for sync clients
+        changed = queryset.update(is_read=True, updated_at=timezone.now())
+        adjust({user_id: -changed})
+    return changed
+
+
+def delete(queryset):
+    """
+    Delete the notifications in queryset with one raw DELETE, writing their
+    sync tombstones with INSERT ... SELECT from the deleted rows and taking
+    the unread ones off their recipients' counters with one grouped UPDATE.
+    Call it before deleting rows whose cascade reaches many notifications:
+    the per-row receivers in api/signals.py cost several queries each.
+    Returns the number deleted.
+    """
+    sql, params = queryset.values('id').query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH gone AS (DELETE FROM {NOTIFICATION_TABLE} WHERE id IN ({sql}) RETURNING id, user_id, is_read), "
+            f"tombstones AS (INSERT INTO {TOMBSTONE_TABLE} (model, object_id, user_id, deleted_at) "
+            f"SELECT 'notification', id, user_id, %s FROM gone) "
+            f"SELECT user_id, count(*) FILTER (WHERE NOT is_read), count(*) FROM gone GROUP BY user_id",
+            [*params, timezone.now()],
+        )
+        rows = cursor.fetchall()
+        adjust({user_id: -unread for user_id, unread, _ in rows})
+    return sum(deleted for _, _, deleted in rows)
+
+
+def recount(user_ids):
+    """Set the users' counters from a COUNT of their unread notifications. Returns {user_id: unread}."""
+    if not user_ids:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {COUNTER_TABLE} AS c (user_id, unread) "
+            f"SELECT u.id, (SELECT count(*) FROM {NOTIFICATION_TABLE} n WHERE n.user_id = u.id AND NOT n.is_read) "
+            f"FROM unnest(%s::bigint[]) AS u(id) "
+            f"ON CONFLICT (user_id) DO UPDATE SET unread = EXCLUDED.unread "
+            f"RETURNING c.user_id, c.unread",
+            [list(user_ids)],
+        )
+        return dict(cursor.fetchall())
+
+
+def unread_count(user_id):
+    unread = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()  # type: ignore[attr-defined]
+    if unread is None:
+        unread = recount([user_id]).get(user_id, 0)
+    return unread
+
+
+def prune(older_than, batch_size=5000):
+    """
+    Delete read notifications created before older_than in batches, writing
+    the sync tombstones in bulk. Read rows do not affect the counters, so the
+    per-row delete signals are skipped. Returns the number deleted.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Notification.objects.filter(is_read=True, created_at__lt=older_than)  # type: ignore[attr-defined]
+                .order_by('id').values_list('id', 'user_id')[:batch_size]
+            )
+            if not rows:
+                return total
+            Tombstone.objects.bulk_create([  # type: ignore[attr-defined]
+                Tombstone(model='notification', object_id=notification_id, user_id=user_id)
+                for notification_id, user_id in rows
+            ])
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {NOTIFICATION_TABLE} WHERE id = ANY(%s)", [[row[0] for row in rows]])
+        total += len(rows)
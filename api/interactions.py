@@ -0,0 +1,81 @@
+"""
+Database-enforced deduplication of deal interactions.
+
+record_interactions() runs a single statement that inserts the first
+(deal, user, action) interactions into DealInteraction with
+ON CONFLICT DO NOTHING, logs only the rows actually inserted to DealAnalytics,
+adds those rows to a sharded view/click counter (see api/counters.py) and
+returns the resulting totals.
+Concurrent requests from the same user cannot double count, and each call
+costs one round trip however many deals it touches.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .counters import SHARD_TABLE, pick_shard, upsert_sql
+from .models import Deal, DealAnalytics, DealInteraction
+
+
+def record_interactions(user, events, ip_address=None, agent_id=None):
+    """
+    Record (deal_id, action_type, created_at) events for user.
+
+    Returns {deal_id: {'views': n, 'clicks': n, 'recorded': [action_type, ...]}}
+    for every event deal that exists; unknown deal ids are left out.
+    """
+    events = list(events)
+    if not events:
+        return {}
+
+    values = ', '.join(['(%s::bigint, %s::varchar, %s::timestamptz)'] * len(events))
+    params = []
+    for deal_id, action_type, created_at in events:
+        params.extend([deal_id, action_type, created_at or timezone.now()])
+
+    deal_table = Deal._meta.db_table
+    sql = f"""
+        WITH input (deal_id, action_type, created_at) AS (VALUES {values}),
+        inserted AS (
+            INSERT INTO {DealInteraction._meta.db_table} (deal_id, user_id, action_type, created_at)
+            SELECT DISTINCT ON (input.deal_id, input.action_type)
+                input.deal_id, %s, input.action_type, input.created_at
+            FROM input JOIN {deal_table} d ON d.id = input.deal_id
+            ORDER BY input.deal_id, input.action_type, input.created_at
+            ON CONFLICT (deal_id, user_id, action_type) DO NOTHING
+            RETURNING deal_id, action_type, created_at
+        ),
+        logged AS (
+            INSERT INTO {DealAnalytics._meta.db_table}
+                (deal_id, user_id, action_type, ip_address, agent_id, user_agent, created_at)
+            SELECT deal_id, %s, action_type, %s::inet, %s, '', created_at FROM inserted
+        ),
+        counts AS (
+            SELECT deal_id,
+                COUNT(*) FILTER (WHERE action_type = 'view') AS views,
+                COUNT(*) FILTER (WHERE action_type = 'click') AS clicks
+            FROM inserted GROUP BY deal_id
+        ),
+        bumped AS ({upsert_sql('counts')})
+        SELECT d.id,
+            d.views + COALESCE(p.views, 0) + COALESCE(c.views, 0),
+            d.clicks + COALESCE(p.clicks, 0) + COALESCE(c.clicks, 0),
+            ARRAY(SELECT i.action_type FROM inserted i WHERE i.deal_id = d.id)
+        FROM {deal_table} d
+        LEFT JOIN counts c ON c.deal_id = d.id
+        LEFT JOIN (
+            SELECT deal_id, SUM(views) AS views, SUM(clicks) AS clicks
+            FROM {SHARD_TABLE} WHERE deal_id IN (SELECT deal_id FROM input) GROUP BY deal_id
+        ) p ON p.deal_id = d.id
+        WHERE d.id IN (SELECT deal_id FROM input)
+    """
+    params.extend([user.id, user.id, ip_address, agent_id, pick_shard()])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return {
+        deal_id: {'views': views, 'clicks': clicks, 'recorded': list(recorded)}
+        for deal_id, views, clicks, recorded in rows
+    }
+
+# See README.md and inline comments for documentation.
@@ -0,0 +1,102 @@
+"""
+Structured, low-overhead logging.
+
+QueueListenerHandler is the only handler attached to the loggers: a request
+thread merely enqueues the record, and a background QueueListener thread does
+the JSON encoding and stream I/O. Every record carries the id of the request
+that produced it (see RequestLoggingMiddleware). Per-row messages go through
+sample() so only LOG_SAMPLE_RATE of them are emitted.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+request_id = ContextVar('request_id', default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are included as top-level keys."""
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        rid = getattr(record, 'request_id', None)
+        if rid:
+            entry['request_id'] = rid
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        elif record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Enqueue records for a QueueListener thread that writes them to stderr
+    as JSON (`output='json'`) or plain text. Usable directly as a handler class
+    in LOGGING.
+    """
+    def __init__(self, output='json', maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JSONFormatter() if output == 'json' else logging.Formatter(
+            '%(levelname)s %(asctime)s %(name)s %(process)d %(request_id)s %(message)s'
+        ))
+        self.listener = QueueListener(self.queue, stream, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+        # Threads do not survive fork (gunicorn --preload): give each child its own listener
+        os.register_at_fork(after_in_child=self._restart_listener)
+
+    def _restart_listener(self):
+        self.queue = self.listener.queue = queue.Queue(self.queue.maxsize)
+        self.listener._thread = None
+        self.listener.start()
+
+    def prepare(self, record):
+        # Merge args now (they may be mutated after the call returns) and render
+        # tracebacks while the frames still exist; JSON encoding and the write
+        # happen on the listener thread.
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:  # Drop rather than block a request on a slow stream
+            pass
+
+
+def sample(logger, msg, *args, rate=None, level=logging.INFO):
+    """
+    Log a high-volume, per-row message for only a fraction of calls (LOG_SAMPLE_RATE
+    by default). Emitted records carry `sample_rate` so counts can be scaled back up.
+    """
+    if rate is None:
+        from django.conf import settings
+        rate = getattr(settings, 'LOG_SAMPLE_RATE', 0.01)
+    if logger.isEnabledFor(level) and random.random() < rate:
+        logger.log(level, msg, *args, extra={'sample_rate': rate})
@@ -0,0 +1,170 @@
+import gzip
+import os
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.models import DealAnalytics
+
+TABLE = DealAnalytics._meta.db_table
+PREFIX = f'{TABLE}_p'
+
+
+def month_start(day, offset=0):
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start):
+    return f'{PREFIX}{start:%Y%m}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage monthly range partitions of DealAnalytics on created_at: create upcoming '
+        'partitions and drop or archive (gzip CSV) partitions past ANALYTICS_RETENTION_MONTHS. '
+        'Run --convert once to turn the existing table into a partitioned one. '
+        'Schedule the default run daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Convert the existing table to a partitioned table (one-off, locks the table)')
+        parser.add_argument('--months-ahead', type=int, default=settings.ANALYTICS_PARTITION_MONTHS_AHEAD)
+        parser.add_argument('--retention-months', type=int, default=settings.ANALYTICS_RETENTION_MONTHS, help='0 keeps everything')
+        parser.add_argument('--action', choices=['archive', 'drop'], default=settings.ANALYTICS_RETENTION_ACTION)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL')
+        self.dry_run = options['dry_run']
+
+        if options['convert']:
+            self.convert(options['months_ahead'])
+        elif not self.is_partitioned():
+            raise CommandError(f'{TABLE} is not partitioned yet; run with --convert first')
+
+        today = date.today()
+        for offset in range(0, options['months_ahead'] + 1):
+            self.create_partition(month_start(today, offset))
+
+        if options['retention_months']:
+            cutoff = month_start(today, -options['retention_months'])
+            for name, start in self.partitions():
+                if start < cutoff:
+                    self.expire_partition(name, options['action'])
+
+    def execute_sql(self, sql, params=None):
+        if self.dry_run:
+            self.stdout.write(f'[dry-run] {sql}')
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def is_partitioned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TABLE])
+            row = cursor.fetchone()
+        return bool(row) and row[0] == 'p'
+
+    def partitions(self):
+        """Return (name, month start) of each monthly partition, oldest first."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = %s ORDER BY c.relname",
+                [TABLE]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        result = []
+        for name in names:
+            suffix = name[len(PREFIX):]
+            if name.startswith(PREFIX) and len(suffix) == 6 and suffix.isdigit():
+                result.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+        return result
+
+    def create_partition(self, start):
+        name = partition_name(start)
+        self.execute_sql(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{month_start(start, 1).isoformat()}')"
+        )
+
+    def expire_partition(self, name, action):
+        if action == 'archive':
+            archive_dir = settings.ANALYTICS_ARCHIVE_DIR
+            path = os.path.join(archive_dir, f'{name}.csv.gz')
+            if self.dry_run:
+                self.stdout.write(f'[dry-run] archive {name} to {path}')
+            else:
+                os.makedirs(archive_dir, exist_ok=True)
+                self.archive(name, path)
+                self.stdout.write(f'Archived {name} to {path}')
+        self.execute_sql(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        self.execute_sql(f'DROP TABLE {name}')
+        self.stdout.write(self.style.SUCCESS(f'Dropped partition {name}'))
+
+    def archive(self, name, path):
+        sql = f'COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)'
+        with connection.cursor() as cursor, gzip.open(path, 'wb') as out:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, out)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    for data in copy:
+                        out.write(data)
+
+    def convert(self, months_ahead):
+        """
+        Rebuild the table as PARTITION BY RANGE (created_at) with the same columns,
+        defaults, identity, foreign keys and index names, then copy existing rows.
+        """
+        if self.is_partitioned():
+            self.stdout.write(f'{TABLE} is already partitioned')
+            return
+        legacy = f'{TABLE}_legacy'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+                "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+                [TABLE, TABLE]
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [TABLE]
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f"SELECT MIN(created_at)::date FROM {TABLE}")
+            oldest = cursor.fetchone()[0] or date.today()
+
+        with transaction.atomic():
+            self.execute_sql(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+            self.execute_sql(f'ALTER TABLE {TABLE} RENAME TO {legacy}')
+            for name, _ in indexes:
+                self.execute_sql(f'ALTER INDEX {name} RENAME TO {name}_legacy')
+            self.execute_sql(
+                f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                f'PARTITION BY RANGE (created_at)'
+            )
+            # Unique keys on a partitioned table must include the partition key
+            self.execute_sql(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+            for name, definition in foreign_keys:
+                self.execute_sql(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+            for name, definition in indexes:
+                # pg_indexes was read before the rename, so definitions target the new table
+                self.execute_sql(definition)
+            self.execute_sql(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+            start = month_start(oldest)
+            while start <= month_start(date.today(), months_ahead):
+                self.create_partition(start)
+                start = month_start(start, 1)
+            self.execute_sql(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+            self.execute_sql(
+                f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE((SELECT MAX(id) FROM {TABLE}), 1))"
+            )
+            self.execute_sql(f'DROP TABLE {legacy}')
+        self.stdout.write(self.style.SUCCESS(f'Converted {TABLE} to monthly partitions'))
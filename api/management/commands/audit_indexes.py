@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from api import queryplans
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN (ANALYZE, BUFFERS) over the queries of the list endpoints (api.queryplans.ENDPOINTS) '
+        'and report sequential scans of large tables and indexes that are never used. '
+        '--seed fills the database with synthetic data first: scratch databases only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, metavar='DEALS', help='Insert this many synthetic deals (and related rows) first')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only audit these catalogue names')
+        parser.add_argument('--min-rows', type=int, default=queryplans.LARGE_TABLE_ROWS, help='Ignore sequential scans of smaller tables')
+        parser.add_argument('--verbose-sql', action='store_true', help='Print each query')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            counts = queryplans.seed(options['seed'])
+            self.stdout.write('Seeded ' + ', '.join(f'{count} {model}' for model, count in counts.items()))
+
+        sample = queryplans.Sample()
+        try:
+            sample.values()
+        except LookupError as e:
+            raise CommandError(f'{e}; run with --seed on a scratch database')
+        users = {'customer': sample.customer, 'owner': sample.owner}
+        rows = queryplans.table_rows()
+
+        endpoints = [
+            endpoint for endpoint in queryplans.ENDPOINTS
+            if not options['endpoints'] or endpoint.name in options['endpoints']
+        ]
+        seq_scans = {}
+        for endpoint in endpoints:
+            if endpoint.caller and users[endpoint.caller] is None:
+                self.stdout.write(f'{endpoint.name}: skipped, no {endpoint.caller} in the database')
+                continue
+            status_code, queries = queryplans.capture(endpoint, sample, users)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{endpoint.name} [{status_code}] {len(queries)} distinct queries'))
+            for sql, times in queries:
+                summary = queryplans.summarize(queryplans.explain(sql), rows, options['min_rows'])
+                repeated = f' x{times}' if times > 1 else ''
+                self.stdout.write(
+                    f"  cost={summary['cost']:.0f} time={summary['time_ms']}ms "
+                    f"hit={summary['shared_hit']} read={summary['shared_read']}{repeated} "
+                    f"indexes={','.join(summary['indexes']) or '-'}"
+                )
+                if options['verbose_sql']:
+                    self.stdout.write(f'    {sql}')
+                for table in summary['seq_scans']:
+                    seq_scans.setdefault(table, set()).add(endpoint.name)
+                    self.stdout.write(self.style.WARNING(f'    Seq Scan on {table} ({rows[table]:.0f} rows)'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Sequential scans of large tables'))
+        for table, names in sorted(seq_scans.items()):
+            self.stdout.write(self.style.WARNING(f"  {table}: {', '.join(sorted(names))}"))
+        if not seq_scans:
+            self.stdout.write(self.style.SUCCESS('  none'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Indexes never scanned since statistics were reset'))
+        for table, index, size in queryplans.unused_indexes():
+            self.stdout.write(f'  {table}.{index} ({size // 1024} kB)')
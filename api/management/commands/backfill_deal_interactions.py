@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api.models import DealAnalytics, DealInteraction
+
+
+class Command(BaseCommand):
+    help = 'Seed DealInteraction with the first interaction of each kind already recorded in DealAnalytics, so existing users are not counted twice.'
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {DealInteraction._meta.db_table} (deal_id, user_id, action_type, created_at) "
+                f"SELECT deal_id, user_id, action_type, MIN(created_at) FROM {DealAnalytics._meta.db_table} "
+                f"WHERE user_id IS NOT NULL GROUP BY deal_id, user_id, action_type "
+                f"ON CONFLICT (deal_id, user_id, action_type) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {inserted} deal interactions'))
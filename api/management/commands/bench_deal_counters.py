@@ -0,0 +1,71 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import F
+from api import counters
+from api.models import Deal, DealCounterShard
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrency benchmark: many threads incrementing one deal, comparing a single '
+        'row UPDATE against sharded counters. Run against a scratch database; the '
+        "deal's counters are restored afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_id', type=int)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--increments', type=int, default=200, help='Increments per thread')
+
+    def handle(self, *args, **options):
+        try:
+            deal = Deal.objects.get(id=options['deal_id'])  # type: ignore[attr-defined]
+        except Deal.DoesNotExist:  # type: ignore[attr-defined]
+            raise CommandError('Deal not found')
+        counters.reconcile()
+        deal.refresh_from_db()
+        original = (deal.views, deal.clicks)
+
+        def row_update():
+            Deal.objects.filter(id=deal.id).update(views=F('views') + 1)  # type: ignore[attr-defined]
+
+        def sharded():
+            counters.increment(deal.id, views=1)
+
+        try:
+            for name, increment in [('row', row_update), ('sharded', sharded)]:
+                elapsed = self.run_threads(increment, options['threads'], options['increments'])
+                total = options['threads'] * options['increments']
+                self.stdout.write(
+                    f'{name:8} {total} increments with {options["threads"]} threads: '
+                    f'{elapsed:.2f}s ({total / elapsed:.0f}/s)'
+                )
+            views, _ = counters.totals([deal.id])[deal.id]
+            expected = original[0] + 2 * options['threads'] * options['increments']
+            self.stdout.write(f'Totals consistent: {views == expected} ({views} views)')
+        finally:
+            DealCounterShard.objects.filter(deal=deal).delete()  # type: ignore[attr-defined]
+            Deal.objects.filter(id=deal.id).update(views=original[0], clicks=original[1])  # type: ignore[attr-defined]
+
+    def run_threads(self, increment, threads, increments):
+        start_barrier = threading.Barrier(threads + 1)
+
+        def worker():
+            try:
+                connection.ensure_connection()  # Connect before the clock starts
+                start_barrier.wait()
+                for _ in range(increments):
+                    increment()
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        start_barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start
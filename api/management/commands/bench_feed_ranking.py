@@ -0,0 +1,47 @@
+import statistics
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from api.ranking import score, top_k
+
+
+class Command(BaseCommand):
+    help = (
+        'Time feed scoring and top-K selection (api.ranking) on synthetic candidates. '
+        'Needs no database; the target is well under 100ms for 50k candidates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--candidates', type=int, default=50000)
+        parser.add_argument('-k', type=int, default=21, help='Page size + 1')
+        parser.add_argument('-n', '--runs', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n = options['candidates']
+        now = time.time()
+        views = rng.poisson(200, n).astype(np.float64)
+        features = {
+            'id': np.arange(1, n + 1, dtype=np.int64),
+            'distance_km': rng.uniform(0, 25, n),
+            'created': now - rng.uniform(0, 30 * 86400, n),
+            'views': views,
+            'clicks': rng.binomial(views.astype(np.int64), 0.05).astype(np.float64),
+            'preferred': rng.random(n) < 0.2,
+            'saved': rng.random(n) < 0.02,
+            'viewed': rng.random(n) < 0.1,
+        }
+
+        timings = []
+        for _ in range(options['runs'] + 3):
+            start = time.perf_counter()
+            scores = score(features, now)
+            top_k(features['id'], scores, options['k'])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings = sorted(timings[3:])  # Drop warm-up runs
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{n} candidates, k={options['k']}: "
+            f"p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms max={timings[-1]:.2f}ms"
+        )
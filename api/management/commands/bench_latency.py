@@ -0,0 +1,62 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+
+DEFAULT_PATHS = ['/api/v1/healthcheck/', '/api/v1/deals/customer/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Report p50/p95 latency of API endpoints. Runs in-process through the Django '
+        'test client (which opens and closes DB connections like a real request), or '
+        'against a running server with --base-url.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('-n', '--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--base-url', help='e.g. http://localhost:8000 to benchmark a running server')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer Authorization header')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+
+        if options['base_url']:
+            import requests
+            session = requests.Session()
+            base_url = options['base_url'].rstrip('/')
+
+            def fetch(path):
+                return session.get(base_url + path, headers=headers).status_code
+        else:
+            client = Client(headers=headers)
+            db = connections['default'].settings_dict
+            self.stdout.write(
+                f"CONN_MAX_AGE={db.get('CONN_MAX_AGE')} "
+                f"CONN_HEALTH_CHECKS={db.get('CONN_HEALTH_CHECKS')} "
+                f"pool={'pool' in db.get('OPTIONS', {})}"
+            )
+
+            def fetch(path):
+                return client.get(path).status_code
+
+        for path in options['paths']:
+            for _ in range(options['warmup']):
+                fetch(path)
+            samples = []
+            status_code = None
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                status_code = fetch(path)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            self.stdout.write(
+                f"{path} [{status_code}] n={len(samples)} "
+                f"p50={statistics.median(samples):.2f}ms p95={p95:.2f}ms max={samples[-1]:.2f}ms"
+            )
@@ -0,0 +1,45 @@
+import gzip
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_PATHS = ['/api/v1/deals/customer/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Report response sizes of API endpoints as full JSON, compact JSON (?format=compact), '
+        'sparse fields (--fields) and after gzip/Brotli compression.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--fields', default='id,title,category,end_time,image_url,business')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer Authorization header')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+        client = Client(headers=headers)
+
+        variants = [
+            ('json', {}),
+            ('compact', {'format': 'compact'}),
+            ('sparse', {'fields': options['fields']}),
+            ('sparse+compact', {'fields': options['fields'], 'format': 'compact'}),
+        ]
+        for path in options['paths']:
+            self.stdout.write(path)
+            for name, params in variants:
+                # No Accept-Encoding, so the body comes back uncompressed
+                response = client.get(path, params)
+                body = response.content
+                line = f"  {name:<15} [{response.status_code}] raw={len(body)}B gzip={len(gzip.compress(body, 6))}B"
+                if brotli is not None:
+                    line += f" br={len(brotli.compress(body, quality=5))}B"
+                self.stdout.write(line)
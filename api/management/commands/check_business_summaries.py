@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from api.models import Business, Deal
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare each Deal.business_summary with its business and report stale snapshots. '
+        'Run with --fix after migrating and after bulk Business updates that skip signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite stale snapshots')
+
+    def handle(self, *args, **options):
+        # One pass over the distinct snapshots instead of one query per business
+        stored = {}
+        for business_id, summary in Deal.objects.values_list('business_id', 'business_summary').distinct():  # type: ignore[attr-defined]
+            stored.setdefault(business_id, []).append(summary)
+
+        stale_businesses = stale_deals = 0
+        for business in Business.objects.filter(id__in=list(stored)).iterator(chunk_size=1000):  # type: ignore[attr-defined]
+            summary = business.summary()
+            if all(snapshot == summary for snapshot in stored[business.id]):
+                continue
+            stale_businesses += 1
+            if options['fix']:
+                count = business.sync_deal_summaries()
+            else:
+                count = Deal.objects.filter(business=business).exclude(business_summary=summary).count()  # type: ignore[attr-defined]
+            stale_deals += count
+            self.stdout.write(f'Business {business.id}: {count} stale deals')
+
+        verb = 'Fixed' if options['fix'] else 'Found'
+        style = self.style.SUCCESS if options['fix'] or not stale_deals else self.style.WARNING
+        self.stdout.write(style(f'{verb} {stale_deals} stale deals across {stale_businesses} businesses'))
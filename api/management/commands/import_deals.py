@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.bulk import FORMATS, detect_format, import_deals
+from api.models import Business
+
+
+class Command(BaseCommand):
+    help = 'Import deals for a business from a CSV or JSON Lines file (same columns as POST /api/v1/deals/import/).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--business', type=int, required=True, help='Business id the deals belong to')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Validate rows without creating deals')
+        parser.add_argument('--no-notify', action='store_true', help='Do not notify customers')
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(pk=options['business'])  # type: ignore[attr-defined]
+        except Business.DoesNotExist:  # type: ignore[attr-defined]
+            raise CommandError(f"Business {options['business']} does not exist")
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        with open(options['path'], 'rb') as f:
+            result = import_deals([business], f, fmt, notify_customers=not options['no_notify'], dry_run=options['dry_run'])
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if result['error_count'] > len(result['errors']):
+            self.stderr.write(f"... and {result['error_count'] - len(result['errors'])} more")
+        verb = 'Validated' if result['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} deals from {result['rows']} rows ({result['error_count']} errors)"
+        ))
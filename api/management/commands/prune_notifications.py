@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api import inbox
+from api.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete read notifications older than NOTIFICATION_RETENTION_DAYS in batches. '
+        '--recount also rebuilds every unread counter from the notifications table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Override NOTIFICATION_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--recount', action='store_true', help='Recount unread notifications for users with a counter')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.NOTIFICATION_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        total = inbox.prune(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {total} read notifications older than {cutoff.isoformat()}'))
+
+        if options['recount']:
+            user_ids = list(NotificationCounter.objects.values_list('user_id', flat=True))  # type: ignore[attr-defined]
+            recounted = 0
+            for start in range(0, len(user_ids), options['batch_size']):
+                recounted += len(inbox.recount(user_ids[start:start + options['batch_size']]))
+            self.stdout.write(self.style.SUCCESS(f'Recounted {recounted} unread counters'))
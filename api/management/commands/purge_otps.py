@@ -0,0 +1,25 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from api.models import OTP
+
+
+class Command(BaseCommand):
+    help = 'Delete verified and expired OTP rows in batches. Run from a scheduler (e.g. hourly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--grace-minutes', type=int, default=60, help='Keep expired rows this long for support lookups')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        stale = OTP.objects.filter(Q(is_verified=True) | Q(expires_at__lt=cutoff))  # type: ignore[attr-defined]
+        total = 0
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # Re-check: generate_otp reuses a phone's row, which may have been reissued meanwhile
+            total += stale.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} stale OTPs'))
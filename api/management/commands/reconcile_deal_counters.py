@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Fold sharded deal view/click counters into Deal.views and Deal.clicks. Run from a scheduler (e.g. every minute).'
+
+    def handle(self, *args, **options):
+        updated = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {updated} deals'))
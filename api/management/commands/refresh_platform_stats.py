@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.models import PlatformStats
+
+
+class Command(BaseCommand):
+    help = 'Recount platform statistics into the PlatformStats snapshot. Run from a scheduler (e.g. cron every 5 minutes).'
+
+    def handle(self, *args, **options):
+        stats = PlatformStats.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Platform stats refreshed: {stats.total_customers} customers, {stats.total_businesses} businesses, '
+            f'{stats.total_active_deals} active deals, {stats.total_customer_requests} customer requests'
+        ))
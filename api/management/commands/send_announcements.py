@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.bulk import send_announcements
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued new-deal announcements (SMS and in-app notifications) to customers. '
+        'Run continuously with --loop (the `announcer` Compose service), or from a scheduler every minute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Announcements claimed per round')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent = send_announcements(options['batch_size'])
+            if sent:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} announcements'))
+            if not options['loop']:
+                break
+            if sent < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from api.models import User, Business
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill indexed notification opt-in columns from User.preferences and normalize '
+        'Business.categories to lowercase. Run once after deploying; saves keep them in sync.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = list(User.NOTIFICATION_PREFERENCE_KEYS)
+
+        users = []
+        user_count = 0
+        for user in User.objects.only('id', 'preferences', *fields).iterator(chunk_size=batch_size):
+            user.sync_notification_preferences()
+            users.append(user)
+            if len(users) >= batch_size:
+                User.objects.bulk_update(users, fields)
+                user_count += len(users)
+                users = []
+        User.objects.bulk_update(users, fields)
+        user_count += len(users)
+
+        businesses = []
+        for business in Business.objects.only('id', 'categories').iterator(chunk_size=batch_size):
+            normalized = Business.normalize_categories(business.categories)
+            if normalized != business.categories:
+                business.categories = normalized
+                businesses.append(business)
+        Business.objects.bulk_update(businesses, ['categories'], batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced notification columns for {user_count} users and normalized {len(businesses)} businesses'
+        ))
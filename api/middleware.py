@@ -1,26 +1,68 @@
 import logging
+import random
 import time
 import json
+import re
+import uuid
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
 from django.http import JsonResponse
 from rest_framework import status
 
+from .log import request_id
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
 logger = logging.getLogger('api')
 
-class RequestLoggingMiddleware(MiddlewareMixin):
+class RequestLoggingMiddleware:
     """
-    Log all API requests with timing and response status.
+    Assign each request an id (the incoming X-Request-ID, or a new one), expose it
+    to every log record of the request and in the response, and log one line per
+    request with its timing. Slow (SLOW_REQUEST_THRESHOLD) and failed requests are
+    always logged at WARNING; others at INFO for REQUEST_LOG_SAMPLE_RATE of requests.
     """
-    def process_request(self, request):
-        request.start_time = time.time()
-        logger.info(f"Request started: {request.method} {request.path}")
-
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            logger.info(
-                f"Request completed: {request.method} {request.path} - "
-                f"Status: {response.status_code} - Duration: {duration:.3f}s"
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', 1.0)
+        self.sample_rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        rid = request.META.get('HTTP_X_REQUEST_ID', '')[:64] or uuid.uuid4().hex
+        request.request_id = rid
+        token = request_id.set(rid)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(token)
+        duration_ms = (time.perf_counter() - start) * 1000
+        response['X-Request-ID'] = rid
+
+        slow = duration_ms >= self.slow_threshold * 1000
+        if slow or response.status_code >= 500:
+            level = logging.WARNING
+        elif self.sample_rate >= 1 or random.random() < self.sample_rate:
+            level = logging.INFO
+        else:
+            return response
+        if logger.isEnabledFor(level):
+            logger.log(
+                level, '%s %s %s %.1fms%s',
+                request.method, request.path, response.status_code, duration_ms, ' (slow)' if slow else '',
+                extra={
+                    'request_id': rid,
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 1),
+                    'user_id': getattr(getattr(request, 'user', None), 'id', None),
+                }
             )
         return response
 
@@ -30,7 +72,7 @@ class ErrorLoggingMiddleware(MiddlewareMixin):
     """
     def process_exception(self, request, exception):
         logger.error(
-            f"Exception in {request.method} {request.path}: {str(exception)}",
+            'Exception in %s %s: %s', request.method, request.path, exception,
             exc_info=True,
             extra={
                 'request_method': request.method,
@@ -43,20 +85,48 @@ class ErrorLoggingMiddleware(MiddlewareMixin):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-class PerformanceMonitoringMiddleware(MiddlewareMixin):
+class CompressionMiddleware:
     """
-    Monitor slow requests and log performance metrics.
+    Compress API responses with Brotli when the client accepts it and the
+    `brotli` package is installed, otherwise gzip. Bodies smaller than
+    COMPRESSION_MIN_SIZE bytes are sent as is; streaming responses are gzipped
+    chunk by chunk.
     """
-    SLOW_REQUEST_THRESHOLD = 1.0  # seconds
-
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            if duration > self.SLOW_REQUEST_THRESHOLD:
-                logger.warning(
-                    f"Slow request detected: {request.method} {request.path} - "
-                    f"Duration: {duration:.3f}s"
-                )
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        if response.streaming:
+            if not re.search(r'\bgzip\b', accepted):
+                return response
+            response.streaming_content = compress_sequence(response.streaming_content)
+            response['Content-Encoding'] = 'gzip'
+            del response['Content-Length']
+            return response
+
+        if len(response.content) < self.min_size:
+            return response
+        if brotli is not None and re.search(r'\bbr\b', accepted):
+            body, encoding = brotli.compress(response.content, quality=5), 'br'
+        elif re.search(r'\bgzip\b', accepted):
+            body, encoding = compress_string(response.content), 'gzip'
+        else:
+            return response
+        if len(body) >= len(response.content):
+            return response
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
         return response
 
 # See README.md and inline comments for documentation. 
\ No newline at end of file
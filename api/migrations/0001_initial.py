@@ -0,0 +1,193 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.contrib.auth.models
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('role', models.CharField(choices=[('user', 'User'), ('business', 'Business')], max_length=20)),
+                ('phone', models.CharField(max_length=32, unique=True)),
+                ('preferences', models.JSONField(blank=True, default=list)),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326)),
+                ('notifications_push', models.BooleanField(default=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('username', models.CharField(default='', max_length=32, unique=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('contact_phone', models.CharField(blank=True, max_length=32)),
+                ('address', models.TextField(blank=True)),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='business_logos/')),
+                ('categories', models.JSONField(blank=True, default=list)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('verification_date', models.DateTimeField(blank=True, null=True)),
+                ('verification_documents', models.JSONField(blank=True, default=list)),
+                ('owner_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='businesses', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Deal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='deals/')),
+                ('category', models.CharField(blank=True, max_length=128)),
+                ('cta', models.CharField(blank=True, max_length=255)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326)),
+                ('is_active', models.BooleanField(default=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deals', to='api.business')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DealAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('view', 'View'), ('click', 'Click'), ('save', 'Save'), ('unsave', 'Unsave')], max_length=20)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='api.deal')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('deal_expiring', 'Deal Expiring'), ('new_deal', 'New Deal'), ('deal_clicked', 'Deal Clicked'), ('system', 'System'), ('new_business', 'New Business'), ('deal_removed', 'Deal Removed'), ('deal_expiring_soon', 'Deal Expiring Soon')], max_length=20)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('related_deal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.deal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OTP',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=32)),
+                ('otp_code', models.CharField(max_length=6)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['phone', 'created_at'], name='api_otp_phone_4be102_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedDeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saved_at', models.DateTimeField(auto_now_add=True)),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_by', to='api.deal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_deals', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('category', models.CharField(blank=True, max_length=128)),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326)),
+                ('budget_min', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('budget_max', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('urgency', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=20)),
+                ('preferred_contact', models.CharField(choices=[('call', 'Phone Call'), ('whatsapp', 'WhatsApp'), ('sms', 'SMS')], default='call', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category'], name='api_custome_categor_a2dd52_idx'), models.Index(fields=['is_active'], name='api_custome_is_acti_641662_idx'), models.Index(fields=['created_at'], name='api_custome_created_ee309a_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['end_time'], name='api_deal_end_tim_c7d649_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['title'], name='api_deal_title_fa4c3e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['category'], name='api_deal_categor_316e15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealanalytics',
+            index=models.Index(fields=['deal', 'action_type'], name='api_dealana_deal_id_281be5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealanalytics',
+            index=models.Index(fields=['created_at'], name='api_dealana_created_d34af2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='api_notific_user_id_16328d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='api_notific_created_238c70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saveddeal',
+            index=models.Index(fields=['user', 'saved_at'], name='api_savedde_user_id_5f7dbf_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='saveddeal',
+            unique_together={('user', 'deal')},
+        ),
+    ]
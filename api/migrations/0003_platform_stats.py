@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_customers', models.PositiveIntegerField(default=0)),
+                ('total_businesses', models.PositiveIntegerField(default=0)),
+                ('total_active_deals', models.PositiveIntegerField(default=0)),
+                ('total_customer_requests', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_platform_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dealanalytics',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
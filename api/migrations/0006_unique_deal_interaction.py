@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_analytics_user_agents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('view', 'View'), ('click', 'Click'), ('save', 'Save'), ('unsave', 'Unsave')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.deal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('deal', 'user', 'action_type'), name='unique_deal_interaction')],
+            },
+        ),
+    ]
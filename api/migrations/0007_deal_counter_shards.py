@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_unique_deal_interaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='api.deal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('deal', 'shard'), name='unique_deal_counter_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_deal_counter_shards'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={},
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='notify_deal_alerts',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='notify_expiring_deals',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='notify_new_businesses',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['categories'], name='api_business_categories_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='customerrequest',
+            index=models.Index(django.db.models.functions.text.Lower('category'), condition=models.Q(('is_active', True)), name='api_custreq_active_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('notify_deal_alerts', True)), fields=['role'], name='api_user_deal_alerts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('notify_expiring_deals', True)), fields=['role'], name='api_user_expiring_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('notify_new_businesses', True)), fields=['role'], name='api_user_new_business_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_preference_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='otp',
+            name='otp_code',
+        ),
+        migrations.AddField(
+            model_name='otp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otp',
+            name='code_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='api_otp_expires_25c66a_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_hashed_otp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='business_summary',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
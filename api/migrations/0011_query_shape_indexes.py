@@ -0,0 +1,160 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+# Deal, Notification, DealAnalytics and CustomerRequest are large and written
+# to constantly, so every index is built and dropped CONCURRENTLY, which cannot
+# run inside a transaction.
+
+DEAL_LOCATION_INDEX = 'api_deal_location_42950f5f_id'
+ANALYTICS_TABLE = 'api_dealanalytics'
+ANALYTICS_INDEX = 'api_analytics_deal_time_idx'
+ANALYTICS_INDEX_COLUMNS = '("deal_id", "created_at") INCLUDE ("action_type")'
+ANALYTICS_OLD_INDEX = 'api_dealana_deal_id_281be5_idx'
+ANALYTICS_OLD_INDEX_COLUMNS = '("deal_id", "action_type")'
+
+
+def analytics_partitions(cursor):
+    """Partitions of DealAnalytics, or None while it is a plain table.
+
+    `analytics_partitions --convert` turns the table into a partitioned one,
+    and PostgreSQL does not build indexes CONCURRENTLY on a partitioned table:
+    the parent index is created ON ONLY the parent and each partition's index
+    is built concurrently and attached.
+    """
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [ANALYTICS_TABLE])
+    if cursor.fetchone()[0] != 'p':
+        return None
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+        [ANALYTICS_TABLE]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_analytics_index(cursor, name, columns):
+    partitions = analytics_partitions(cursor)
+    if partitions is None:
+        cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{ANALYTICS_TABLE}" {columns}')
+        return
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON ONLY "{ANALYTICS_TABLE}" {columns}')
+    for partition in partitions:
+        partition_index = f'{partition}_{name}'[:63]
+        cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{partition_index}" ON "{partition}" {columns}')
+        cursor.execute(f'ALTER INDEX "{name}" ATTACH PARTITION "{partition_index}"')
+
+
+def drop_analytics_index(cursor, name):
+    if analytics_partitions(cursor) is None:
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+    else:
+        # Dropping a partitioned index only removes catalog entries
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def add_analytics_deal_time_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        create_analytics_index(cursor, ANALYTICS_INDEX, ANALYTICS_INDEX_COLUMNS)
+        drop_analytics_index(cursor, ANALYTICS_OLD_INDEX)
+
+
+def remove_analytics_deal_time_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        create_analytics_index(cursor, ANALYTICS_OLD_INDEX, ANALYTICS_OLD_INDEX_COLUMNS)
+        drop_analytics_index(cursor, ANALYTICS_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0010_deal_business_summary'),
+    ]
+
+    operations = [
+        # New indexes first, so the queries they serve never fall back to a scan
+        AddIndexConcurrently(
+            model_name='customerrequest',
+            index=models.Index(fields=['user', '-created_at'], name='api_custreq_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_time'], name='api_deal_live_end_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'end_time'], name='api_deal_live_cat_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('is_active', True)), fields=['location'], name='api_deal_live_geo_gist'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='api_notif_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user'], name='api_notif_unread_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='dealanalytics',
+                    index=models.Index(fields=['deal', 'created_at'], include=('action_type',), name=ANALYTICS_INDEX),
+                ),
+                migrations.RemoveIndex(
+                    model_name='dealanalytics',
+                    name=ANALYTICS_OLD_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_analytics_deal_time_index, remove_analytics_deal_time_index),
+            ],
+        ),
+        RemoveIndexConcurrently(
+            model_name='customerrequest',
+            name='api_custome_categor_a2dd52_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='customerrequest',
+            name='api_custome_is_acti_641662_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='api_deal_end_tim_c7d649_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='api_deal_title_fa4c3e_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='api_deal_categor_316e15_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='notification',
+            name='api_notific_user_id_16328d_idx',
+        ),
+        # The full GiST index on Deal.location is replaced by api_deal_live_geo_gist
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='deal',
+                    name='location',
+                    field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, spatial_index=False, srid=4326),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX CONCURRENTLY IF EXISTS "{DEAL_LOCATION_INDEX}"',
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{DEAL_LOCATION_INDEX}" ON "api_deal" USING GIST ("location")',
+                ),
+            ],
+        ),
+    ]
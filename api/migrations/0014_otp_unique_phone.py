@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_deal_announcements'),
+    ]
+
+    operations = [
+        # Keep only the newest code per phone; older ones were already superseded
+        migrations.RunSQL(
+            "DELETE FROM api_otp a USING api_otp b "
+            "WHERE a.phone = b.phone AND (a.created_at, a.id) < (b.created_at, b.id)",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RemoveIndex(
+            model_name='otp',
+            name='api_otp_phone_4be102_idx',
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='phone',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import timedelta
-import random
-import string
+from functools import lru_cache
+import hashlib
+import hmac
 
 class User(AbstractUser):
     """
@@ -19,33 +22,78 @@ class User(AbstractUser):
     preferences = models.JSONField(default=list, blank=True)
     location = models.PointField(geography=True, null=True, blank=True)
     notifications_push = models.BooleanField(default=True)
+    # Notification opt-ins mirrored from preferences['notifications'] on save, so
+    # fan-out audiences are index lookups instead of parsing JSON per user
+    notify_deal_alerts = models.BooleanField(default=True)
+    notify_expiring_deals = models.BooleanField(default=True)
+    notify_new_businesses = models.BooleanField(default=True)
     # Remove email requirement - use phone as username
     email = models.EmailField(blank=True, null=True)
     
     # Override username to use phone number
     username = models.CharField(max_length=32, unique=True, default='')
+
+    # Notification column -> key in preferences['notifications'] (as sent by the app)
+    NOTIFICATION_PREFERENCE_KEYS = {
+        'notify_deal_alerts': 'dealAlerts',
+        'notify_expiring_deals': 'expiringDeals',
+        'notify_new_businesses': 'newBusinesses',
+    }
+    # Notification type -> column gating it; other types are always sent
+    NOTIFICATION_TYPE_FIELDS = {
+        'new_deal': 'notify_deal_alerts',
+        'deal_removed': 'notify_deal_alerts',
+        'deal_expiring': 'notify_expiring_deals',
+        'deal_expiring_soon': 'notify_expiring_deals',
+        'new_business': 'notify_new_businesses',
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['role'], name='api_user_deal_alerts_idx', condition=models.Q(notify_deal_alerts=True)),
+            models.Index(fields=['role'], name='api_user_expiring_idx', condition=models.Q(notify_expiring_deals=True)),
+            models.Index(fields=['role'], name='api_user_new_business_idx', condition=models.Q(notify_new_businesses=True)),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.username:
             self.username = self.phone
+        self.sync_notification_preferences()
         super().save(*args, **kwargs)
 
+    def sync_notification_preferences(self):
+        """Copy notification opt-ins from preferences into their indexed columns."""
+        prefs = self.preferences if isinstance(self.preferences, dict) else {}
+        notif_prefs = prefs.get('notifications', {})
+        if not isinstance(notif_prefs, dict):
+            notif_prefs = {}
+        for field, key in self.NOTIFICATION_PREFERENCE_KEYS.items():
+            setattr(self, field, bool(notif_prefs.get(key, True)))
+
+    @classmethod
+    def notification_audience(cls, notification_type):
+        """Q filter for users who want notifications of this type."""
+        field = cls.NOTIFICATION_TYPE_FIELDS.get(notification_type)
+        return models.Q(**{field: True}) if field else models.Q()
+
     def __str__(self):
         return f"{self.phone} ({self.role})"
 
 class OTP(models.Model):
     """
-    OTP model for phone verification.
+    OTP model for phone verification. Only a keyed hash of the code is stored.
+    See api/otp.py for the pluggable backends that issue and verify codes.
     """
-    phone = models.CharField(max_length=32)
-    otp_code = models.CharField(max_length=6)
+    phone = models.CharField(max_length=32, unique=True)  # One live code per phone (generate_otp upserts)
+    code_hash = models.CharField(max_length=64, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     
     class Meta:
         indexes = [
-            models.Index(fields=['phone', 'created_at']),
+            models.Index(fields=['expires_at']),  # Purge of stale rows
         ]
     
     def __str__(self):
@@ -54,43 +102,60 @@ class OTP(models.Model):
     def is_expired(self):
         return timezone.now() > self.expires_at
     
+    @staticmethod
+    def hash_code(phone, otp_code):
+        """Keyed hash of a code, bound to its phone number."""
+        from django.conf import settings
+        return hmac.new(settings.SECRET_KEY.encode(), f'{phone}:{otp_code}'.encode(), hashlib.sha256).hexdigest()
+
     @classmethod
-    def generate_otp(cls, phone):
-        """Generate a new OTP for the given phone number."""
-        # Delete any existing OTPs for this phone
-        cls.objects.filter(phone=phone).delete()
-        
-        # Generate 6-digit OTP
-        otp_code = ''.join(random.choices(string.digits, k=6))
-        
-        # Create OTP with 10 minutes expiry
-        otp = cls.objects.create(
+    def generate_otp(cls, phone, otp_code, ttl):
+        """
+        Store a new OTP for the given phone number, replacing any previous one
+        with a single INSERT ... ON CONFLICT (phone) DO UPDATE, so concurrent
+        sends for one phone cannot interleave a delete and an insert.
+        """
+        otp = cls(
             phone=phone,
-            otp_code=otp_code,
-            expires_at=timezone.now() + timedelta(minutes=10)
+            code_hash=cls.hash_code(phone, otp_code),
+            attempts=0,
+            is_verified=False,
+            expires_at=timezone.now() + ttl
+        )
+        cls.objects.bulk_create(
+            [otp], update_conflicts=True, unique_fields=['phone'],
+            update_fields=['code_hash', 'attempts', 'is_verified', 'created_at', 'expires_at'],
         )
-        
         return otp
     
     @classmethod
-    def verify_otp(cls, phone, otp_code):
-        """Verify OTP for the given phone number."""
-        try:
-            otp = cls.objects.get(
-                phone=phone,
-                otp_code=otp_code,
-                is_verified=False
+    def verify_otp(cls, phone, otp_code, max_attempts):
+        """
+        Verify OTP for the given phone number with a single
+        UPDATE ... WHERE ... RETURNING, counting the attempt either way.
+        Returns an error message, or None on success.
+        """
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {cls._meta.db_table} SET attempts = attempts + 1, is_verified = (code_hash = %s) "
+                f"WHERE phone = %s AND is_verified = false AND expires_at > %s AND attempts < %s "
+                f"RETURNING is_verified",
+                [cls.hash_code(phone, otp_code), phone, timezone.now(), max_attempts]
             )
-            
-            if otp.is_expired():
-                return None, "OTP has expired"
-            
-            otp.is_verified = True
-            otp.save()
-            return otp, None
-            
-        except cls.DoesNotExist:
-            return None, "Invalid OTP"
+            rows = cursor.fetchall()
+        if any(verified for verified, in rows):
+            return None
+        if rows:
+            return "Invalid OTP"
+        # Failure path only: explain why no usable OTP matched
+        otp = cls.objects.filter(phone=phone, is_verified=False).first()
+        if otp is None:
+            return "Invalid OTP"
+        if otp.is_expired():
+            return "OTP has expired"
+        return "Too many attempts. Please request a new OTP"
 
 class Business(models.Model):
     """
@@ -117,15 +182,59 @@ class Business(models.Model):
     address = models.TextField(blank=True)  # Business address
     location = models.PointField(geography=True, null=True, blank=True)  # Business location
     logo = models.ImageField(upload_to='business_logos/', null=True, blank=True)
-    categories = models.JSONField(default=list, blank=True)  # List of business categories
+    categories = models.JSONField(default=list, blank=True)  # List of lowercase business categories
     is_verified = models.BooleanField(default=False)  # Business verification status
     verification_date = models.DateTimeField(null=True, blank=True)  # When verified
     verification_documents = models.JSONField(default=list, blank=True)  # List of uploaded documents
     owner_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='businesses')
 
+    class Meta:
+        indexes = [
+            # Serves categories @> '["food"]' containment lookups
+            GinIndex(fields=['categories'], name='api_business_categories_gin'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.categories = self.normalize_categories(self.categories)
+        super().save(*args, **kwargs)
+
+    def summary(self):
+        """Compact snapshot stored on each of the business's deals (Deal.business_summary)."""
+        return {
+            'id': self.pk,
+            'name': self.name,
+            'logo_url': self.logo.url if self.logo else None,
+            'is_verified': self.is_verified,
+            'categories': self.categories,
+        }
+
+    def sync_deal_summaries(self):
+        """
+        Copy summary() onto the deals whose snapshot differs, in one UPDATE.
+        updated_at is bumped so incremental sync clients pick up the change.
+        """
+        summary = self.summary()
+        return (
+            Deal.objects.filter(business=self).exclude(business_summary=summary)  # type: ignore[attr-defined]
+            .update(business_summary=summary, updated_at=timezone.now())
+        )
+
+    @staticmethod
+    def normalize_categories(categories):
+        """Lowercase, strip and dedupe categories so containment lookups match exactly."""
+        if not isinstance(categories, list):
+            return categories
+        normalized = []
+        for category in categories:
+            if isinstance(category, str):
+                category = category.strip().lower()
+            if category and category not in normalized:
+                normalized.append(category)
+        return normalized
+
 class Deal(models.Model):
     """
     Deal model for business offers, with geospatial location.
@@ -138,23 +247,45 @@ class Deal(models.Model):
     cta = models.CharField(max_length=255, blank=True)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
-    location = models.PointField(geography=True, null=True, blank=True)
+    location = models.PointField(geography=True, null=True, blank=True, spatial_index=False)  # Partial GiST index below
     is_active = models.BooleanField(default=True)
     views = models.PositiveIntegerField(default=0)
     clicks = models.PositiveIntegerField(default=0)
+    # Business.summary() copy, so listings need no join (kept in sync by api/signals.py)
+    business_summary = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # Every customer-facing read filters is_active=True AND end_time >= now(),
+        # so the listing indexes only cover active deals (see audit_indexes)
         indexes = [
-            models.Index(fields=['end_time']),
-            models.Index(fields=['title']),
-            models.Index(fields=['category']),
+            models.Index(fields=['end_time'], name='api_deal_live_end_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['category', 'end_time'], name='api_deal_live_cat_idx', condition=models.Q(is_active=True)),
+            GistIndex(fields=['location'], name='api_deal_live_geo_gist', condition=models.Q(is_active=True)),
+            models.Index(fields=['updated_at', 'id']),  # Incremental sync cursor
         ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored location, so a moved deal also invalidates its old map tiles (api/signals.py)
+        if 'location' in field_names:
+            location = values[field_names.index('location')]
+            if location is not models.DEFERRED:
+                instance._stored_location = location
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Always rebuilt from the business, so a snapshot set on the instance
+        # (e.g. from request data) is never stored
+        if self.business_id:
+            self.business_summary = self.business.summary()
+        super().save(*args, **kwargs)
+
 class SavedDeal(models.Model):
     """
     Model for users to save deals they're interested in.
@@ -193,41 +324,152 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     related_deal = models.ForeignKey(Deal, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=['user', 'is_read']),
+            models.Index(fields=['user', '-created_at'], name='api_notif_user_created_idx'),  # Inbox, newest first
+            models.Index(fields=['user'], name='api_notif_unread_idx', condition=models.Q(is_read=False)),
             models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'updated_at', 'id']),  # Incremental sync cursor
         ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored read state, so a single save adjusts the unread counter without a lookup (api/signals.py)
+        if 'is_read' in field_names:
+            is_read = values[field_names.index('is_read')]
+            if is_read is not models.DEFERRED:
+                instance._was_read = is_read
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Bulk updates (inbox.mark_read) may have changed the stored read state; look it up on the next save
+        self.__dict__.pop('_was_read', None)
+
+class NotificationCounter(models.Model):
+    """
+    Unread notifications per user, maintained by api/inbox.py so the app badge
+    is a primary-key read instead of a COUNT over the user's inbox.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+class DealAnnouncement(models.Model):
+    """
+    Queued customer announcement of new deals. Requests only insert a row (in
+    their own transaction); the send_announcements worker claims it and sends
+    the SMS and in-app notifications (api/bulk.py). Sent rows are deleted,
+    failed ones keep their error.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='+')
+    deal_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{len(self.deal_ids)} deals of business {self.business_id}"
+
+class UserAgent(models.Model):
+    """
+    Dictionary of distinct user-agent strings, so analytics rows store a small integer.
+    """
+    id = models.AutoField(primary_key=True)
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of value
+    value = models.TextField()
+
+    def __str__(self):
+        return self.value[:80]
+
+    @classmethod
+    def id_for(cls, value):
+        """Return the dictionary id for a user-agent string, creating it if new."""
+        if not value:
+            return None
+        return _user_agent_id(value)
+
+@lru_cache(maxsize=4096)
+def _user_agent_id(value):
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    agent, _ = UserAgent.objects.get_or_create(digest=digest, defaults={'value': value})
+    return agent.id
+
 class DealAnalytics(models.Model):
     """
     Analytics model for tracking deal interactions.
     """
-    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name='analytics')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    action_type = models.CharField(max_length=20, choices=[
+    ACTION_CHOICES = (
         ('view', 'View'),
         ('click', 'Click'),
         ('save', 'Save'),
         ('unsave', 'Unsave'),
-    ])
+    )
+
+    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name='analytics')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    action_type = models.CharField(max_length=20, choices=ACTION_CHOICES)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    agent = models.ForeignKey(UserAgent, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    user_agent = models.TextField(blank=True)  # Legacy rows only; new rows reference `agent`
+    # Defaults to now, but batched client events carry their own (clamped) timestamp
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         indexes = [
-            models.Index(fields=['deal', 'action_type']),
+            # Per-deal counts over a time range (AnalyticsView, analytics export), index-only
+            models.Index(fields=['deal', 'created_at'], include=['action_type'], name='api_analytics_deal_time_idx'),
             models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
         return f"{self.deal.title} - {self.action_type}"
 
+class DealInteraction(models.Model):
+    """
+    First interaction of each kind per user and deal. The unique key lets the
+    database deduplicate with INSERT ... ON CONFLICT DO NOTHING (see api/interactions.py).
+    """
+    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    action_type = models.CharField(max_length=20, choices=DealAnalytics.ACTION_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'user', 'action_type'], name='unique_deal_interaction'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.action_type} {self.deal_id}"
+
+class DealCounterShard(models.Model):
+    """
+    One of DEAL_COUNTER_SHARDS partial view/click counters per deal. Increments
+    upsert a random shard instead of locking the Deal row; reconcile_deal_counters
+    periodically folds the shards into Deal.views/clicks (see api/counters.py).
+    """
+    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    views = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'shard'], name='unique_deal_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f"Deal {self.deal_id} shard {self.shard}"
+
 class CustomerRequest(models.Model):
     """
     Model for customer requests (what they are looking for).
@@ -260,12 +502,96 @@ class CustomerRequest(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['category']),
-            models.Index(fields=['is_active']),
+            models.Index(fields=['user', '-created_at'], name='api_custreq_user_created_idx'),
             models.Index(fields=['created_at']),
+            # Case-insensitive category matching for businesses (LOWER(category) IN (...))
+            models.Index(Lower('category'), name='api_custreq_active_cat_idx', condition=models.Q(is_active=True)),
         ]
 
     def __str__(self):
         return f"{self.title} by {self.user.username}"
 
+class Tombstone(models.Model):
+    """
+    Record of a hard-deleted row, so sync clients can drop it locally.
+    Rows scoped to a single user (e.g. notifications) carry that user's id.
+    """
+    MODEL_CHOICES = (
+        ('deal', 'Deal'),
+        ('notification', 'Notification'),
+    )
+
+    model = models.CharField(max_length=32, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    # Plain id rather than a FK: tombstones are written while the user may be mid-cascade delete
+    user_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id']),
+            models.Index(fields=['user_id', 'model', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted"
+
+class PlatformStats(models.Model):
+    """
+    Single-row snapshot of platform-wide counts for business dashboards.
+    Refreshed by `manage.py refresh_platform_stats` (run it from a scheduler),
+    or on read once the snapshot is older than PLATFORM_STATS_MAX_AGE.
+    """
+    SINGLETON_ID = 1
+    CACHE_KEY = 'platform-stats'
+
+    total_customers = models.PositiveIntegerField(default=0)
+    total_businesses = models.PositiveIntegerField(default=0)
+    total_active_deals = models.PositiveIntegerField(default=0)
+    total_customer_requests = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Platform stats at {self.updated_at}"
+
+    @classmethod
+    def refresh(cls):
+        """Recount everything and store the snapshot."""
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.db.models import Count, Q
+
+        user_counts = User.objects.aggregate(
+            customers=Count('id', filter=Q(role='user')),
+            businesses=Count('id', filter=Q(role='business')),
+        )
+        stats, _ = cls.objects.update_or_create(
+            id=cls.SINGLETON_ID,
+            defaults={
+                'total_customers': user_counts['customers'],
+                'total_businesses': user_counts['businesses'],
+                'total_active_deals': Deal.objects.filter(is_active=True, end_time__gte=timezone.now()).count(),
+                'total_customer_requests': CustomerRequest.objects.filter(is_active=True).count(),
+                'updated_at': timezone.now(),
+            }
+        )
+        cache.set(cls.CACHE_KEY, stats, timeout=getattr(settings, 'PLATFORM_STATS_CACHE_SECONDS', 60))
+        return stats
+
+    @classmethod
+    def current(cls):
+        """Return the snapshot from cache or by primary key, refreshing it if missing or stale."""
+        from django.conf import settings
+        from django.core.cache import cache
+
+        stats = cache.get(cls.CACHE_KEY)
+        if stats is None:
+            stats = cls.objects.filter(id=cls.SINGLETON_ID).first()
+            if stats is not None:
+                cache.set(cls.CACHE_KEY, stats, timeout=getattr(settings, 'PLATFORM_STATS_CACHE_SECONDS', 60))
+        max_age = timedelta(seconds=getattr(settings, 'PLATFORM_STATS_MAX_AGE', 900))
+        if stats is None or timezone.now() - stats.updated_at > max_age:
+            stats = cls.refresh()
+        return stats
+
 # See README.md and inline comments for documentation.
@@ -0,0 +1,77 @@
+"""
+Pluggable OTP backends.
+
+OTP_BACKEND selects where codes live: DatabaseOTPBackend (the OTP table) or
+CacheOTPBackend (the default Django cache, keeping OTP traffic off Postgres).
+Both store only a keyed hash of the code, expire codes after OTP_TTL_SECONDS
+and allow OTP_MAX_ATTEMPTS verification attempts per code.
+"""
+import hmac
+import secrets
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .models import OTP
+
+
+def generate_code():
+    return f'{secrets.randbelow(10 ** 6):06d}'
+
+
+class DatabaseOTPBackend:
+    """
+    Codes in the OTP table; verification is one atomic UPDATE ... RETURNING.
+    Stale rows are removed by `manage.py purge_otps`.
+    """
+    def issue(self, phone):
+        code = generate_code()
+        OTP.generate_otp(phone, code, timedelta(seconds=settings.OTP_TTL_SECONDS))
+        return code
+
+    def verify(self, phone, code):
+        return OTP.verify_otp(phone, code, settings.OTP_MAX_ATTEMPTS)
+
+
+class CacheOTPBackend:
+    """
+    Codes in the default cache, expired by the cache itself. Use a cache shared
+    by all workers (see CACHES in settings.py).
+    """
+    def _keys(self, phone):
+        return f'otp:{phone}', f'otp-attempts:{phone}'
+
+    def issue(self, phone):
+        code = generate_code()
+        code_key, attempts_key = self._keys(phone)
+        cache.set_many({code_key: OTP.hash_code(phone, code), attempts_key: 0}, timeout=settings.OTP_TTL_SECONDS)
+        return code
+
+    def verify(self, phone, code):
+        code_key, attempts_key = self._keys(phone)
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:  # No attempts counter: never issued or expired
+            return "Invalid OTP or OTP has expired"
+        if attempts > settings.OTP_MAX_ATTEMPTS:
+            return "Too many attempts. Please request a new OTP"
+        code_hash = cache.get(code_key)
+        if code_hash is None:
+            return "Invalid OTP or OTP has expired"
+        if not hmac.compare_digest(code_hash, OTP.hash_code(phone, code)):
+            return "Invalid OTP"
+        # Deleting claims the code, so two concurrent verifications cannot both succeed
+        if not cache.delete(code_key):
+            return "Invalid OTP"
+        cache.delete(attempts_key)
+        return None
+
+
+@lru_cache(maxsize=None)
+def otp_backend():
+    return import_string(settings.OTP_BACKEND)()
+
+# See README.md and inline comments for documentation.
@@ -0,0 +1,322 @@
+"""
+Query plans of the app's list endpoints.
+
+ENDPOINTS is the catalogue of requests the clients make. capture() calls one
+through the real URL, view and serializer code inside a rolled-back
+transaction and returns every distinct SELECT it ran (N+1 loops collapse to
+one shape with a count). explain() runs EXPLAIN (ANALYZE, BUFFERS, FORMAT
+JSON) on a query and summarize() reduces the plan to cost, time, buffers, the
+indexes used and any sequential scan of a large table.
+
+seed() fills a scratch database with synthetic data so the plans reflect
+production-sized tables. Used by the audit_indexes command and the
+query-plan regression tests (api.tests.QueryPlanRegressionTests).
+"""
+import hashlib
+import json
+import random
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Business, CustomerRequest, Deal, DealAnalytics, Notification, SavedDeal, User,
+)
+from .tiles import tile_for
+
+LARGE_TABLE_ROWS = 10000  # Sequential scans of smaller tables are not reported
+
+
+@dataclass
+class Endpoint:
+    """A catalogue request. `{name}` placeholders are filled from Sample.values()."""
+    name: str
+    url_name: str
+    params: dict = field(default_factory=dict)
+    kwargs: dict = field(default_factory=dict)
+    caller: str = None  # 'customer', 'owner' or None for anonymous
+
+
+ENDPOINTS = [
+    Endpoint('customer-deals', 'customer-deals'),
+    Endpoint('customer-deals-category', 'customer-deals', {'category': '{category}'}),
+    Endpoint('customer-deals-geo', 'customer-deals', {'lat': '{lat}', 'lon': '{lon}', 'radius': '5000'}),
+    Endpoint('deal-feed', 'deal-feed', {'lat': '{lat}', 'lon': '{lon}'}, caller='customer'),
+    Endpoint('deal-tile', 'deal-tile', kwargs={'z': '{tile_z}', 'x': '{tile_x}', 'y': '{tile_y}'}),
+    Endpoint('deal-search', 'deal-search', {'q': '{term}'}),
+    Endpoint('deal-search-geo', 'deal-search', {'q': '{term}', 'latitude': '{lat}', 'longitude': '{lon}', 'max_distance': '5000'}),
+    Endpoint('deal-sync', 'deal-sync'),
+    Endpoint('my-deals', 'my-deals', caller='owner'),
+    Endpoint('owner-deals', 'deal-list', caller='owner'),
+    Endpoint('owner-businesses', 'business-list', caller='owner'),
+    Endpoint('saved-deals', 'saved-deal-list', caller='customer'),
+    Endpoint('verified-businesses', 'verified-businesses'),
+    Endpoint('verified-businesses-geo', 'verified-businesses', {'lat': '{lat}', 'lon': '{lon}', 'radius': '10'}),
+    Endpoint('business-details', 'business-detail-with-deals', kwargs={'pk': '{business}'}),
+    Endpoint('analytics', 'analytics', {'timeframe': '30d'}, caller='owner'),
+    Endpoint('analytics-export', 'analytics-export', caller='owner'),
+    Endpoint('deal-export', 'deal-export', caller='owner'),
+    Endpoint('notifications', 'notification-list', caller='customer'),
+    Endpoint('notifications-unread', 'notification-list', {'unread': '1'}, caller='customer'),
+    Endpoint('notification-unread-count', 'notification-unread-count', caller='customer'),
+    Endpoint('notification-sync', 'notification-sync', caller='customer'),
+    Endpoint('customer-requests', 'customer-request-list', caller='customer'),
+    Endpoint('customer-requests-business', 'customer-request-list', caller='owner'),
+    Endpoint('business-requests', 'business-requests', caller='owner'),
+    Endpoint('business-requests-geo', 'business-requests', {'lat': '{lat}', 'lon': '{lon}', 'radius': '5000'}, caller='owner'),
+]
+
+UNCATALOGUED = {'user-list'}  # Admin only
+
+
+def list_url_names():
+    """Names of the api URL patterns that serve lists (ListAPIView and viewset list routes)."""
+    from rest_framework.mixins import ListModelMixin
+    from . import urls
+
+    names = set()
+    for pattern in list(urls.urlpatterns) + list(urls.router.urls):
+        view = getattr(pattern, 'callback', None)
+        cls = getattr(view, 'cls', None)
+        if cls is None or not issubclass(cls, ListModelMixin):
+            continue
+        actions = getattr(view, 'actions', None)
+        if actions is None or actions.get('get') == 'list':
+            names.add(pattern.name)
+    return names
+
+
+class Sample:
+    """Representative parameters for the catalogue, picked from the data."""
+
+    def __init__(self):
+        self.customer = User.objects.filter(  # type: ignore[attr-defined]
+            id=Notification.objects.order_by('id').values('user_id')[:1]  # type: ignore[attr-defined]
+        ).first() or User.objects.filter(role='user').order_by('id').first()  # type: ignore[attr-defined]
+        self.business = Business.objects.filter(is_verified=True).order_by('id').first() or Business.objects.order_by('id').first()  # type: ignore[attr-defined]
+        self.owner = self.business.owner_user if self.business else None
+        self.deal = (
+            Deal.objects.filter(is_active=True, end_time__gte=timezone.now())  # type: ignore[attr-defined]
+            .exclude(location=None).order_by('id').first()
+        )
+
+    def values(self):
+        if self.deal is None or self.business is None:
+            raise LookupError('The database needs at least one business and one active deal with a location')
+        lon, lat = self.deal.location.x, self.deal.location.y
+        _, tile_x, tile_y = tile_for(lon, lat, 14)
+        words = [word for word in self.deal.title.split() if len(word) >= 4]
+        return {
+            'lat': lat, 'lon': lon, 'tile_z': 14, 'tile_x': tile_x, 'tile_y': tile_y,
+            'category': self.deal.category, 'term': (words or [self.deal.title])[0].lower(),
+            'business': self.business.id,
+        }
+
+
+def _shape(sql):
+    """SQL with literals replaced, so the same query with other values compares equal."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', sql)
+
+
+def _select(sql):
+    """The SELECT of a plain or server-side cursor query, or None for anything else."""
+    match = re.match(r'\s*DECLARE\s.*?\sCURSOR\s.*?\bFOR\s(.*)$', sql, re.S | re.I)
+    if match:
+        sql = match.group(1)
+    return sql if re.match(r'\s*(SELECT|WITH)\b', sql, re.I) else None
+
+
+def capture(endpoint, sample, users, using='default'):
+    """
+    Request endpoint and return (status code, [(sql, times seen)]) for the
+    distinct SELECTs it ran. Writes made by the view are rolled back; replicas
+    and throttling are switched off so every query runs on `using`.
+    """
+    values = sample.values()
+    path = reverse(endpoint.url_name, kwargs={key: value.format(**values) for key, value in endpoint.kwargs.items()})
+    params = {key: value.format(**values) for key, value in endpoint.params.items()}
+    host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')), 'localhost')
+
+    client = APIClient(HTTP_HOST=host)
+    if endpoint.caller:
+        client.force_authenticate(users[endpoint.caller])
+    with override_settings(DATABASE_REPLICAS=[], THROTTLE_ENABLED=False), transaction.atomic(using=using), \
+            CaptureQueriesContext(connections[using]) as captured:
+        response = client.get(path, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True, using=using)
+
+    seen = {}
+    for query in captured.captured_queries:
+        sql = _select(query['sql'])
+        if sql is None:
+            continue
+        shape = _shape(sql)
+        if shape in seen:
+            seen[shape][1] += 1
+        else:
+            seen[shape] = [sql, 1]
+    return response.status_code, [tuple(item) for item in seen.values()]
+
+
+def query_key(sql):
+    """Stable id of a query's shape, for baselines."""
+    return hashlib.sha1(_shape(sql).encode()).hexdigest()[:12]
+
+
+def explain(sql, using='default', analyze=True):
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'EXPLAIN ({options}) {sql}')
+        plan = cursor.fetchone()[0]
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def table_rows(using='default'):
+    """Estimated row count of every table and partition (pg_class.reltuples)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()"
+        )
+        return dict(cursor.fetchall())
+
+
+def _nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _nodes(child)
+
+
+def summarize(plan, rows, min_rows=LARGE_TABLE_ROWS):
+    root = plan[0]
+    nodes = list(_nodes(root['Plan']))
+    return {
+        'cost': root['Plan']['Total Cost'],
+        'time_ms': round(root.get('Planning Time', 0) + root.get('Execution Time', 0), 2),
+        'shared_hit': root['Plan'].get('Shared Hit Blocks', 0),
+        'shared_read': root['Plan'].get('Shared Read Blocks', 0),
+        'indexes': sorted({node['Index Name'] for node in nodes if 'Index Name' in node}),
+        'seq_scans': sorted({
+            node['Relation Name'] for node in nodes
+            if node['Node Type'] == 'Seq Scan' and rows.get(node.get('Relation Name'), 0) >= min_rows
+        }),
+    }
+
+
+def unused_indexes(using='default'):
+    """
+    Non-unique indexes of the app's tables never used since statistics were
+    last reset, as (table, index, size in bytes).
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT s.relname, s.indexrelname, pg_relation_size(s.indexrelid) "
+            "FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid "
+            "WHERE s.idx_scan = 0 AND NOT i.indisunique AND s.relname LIKE 'api\\_%' "
+            "ORDER BY pg_relation_size(s.indexrelid) DESC"
+        )
+        return cursor.fetchall()
+
+
+CATEGORIES = [key for key, _ in Business.BUSINESS_CATEGORIES]
+WORDS = ['lunch', 'pizza', 'shoes', 'phone', 'laptop', 'haircut', 'massage', 'repair', 'course', 'concert', 'sofa', 'tyres']
+
+
+def seed(deals=50000, center=(28.28, -15.41), spread=0.3, batch_size=5000, rng=None):
+    """
+    Insert synthetic users, businesses, deals, saved deals, notifications,
+    analytics and customer requests around center (lon, lat), then ANALYZE.
+    Scratch databases only. Returns the number of rows per model.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    run = now.strftime('%Y%m%d%H%M%S')
+    customers_n, businesses_n = max(deals // 5, 1), max(deals // 25, 1)
+
+    def point():
+        return Point(center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread), srid=4326)
+
+    def user(role, i):
+        return User(
+            username=f'seed{run}{role[0]}{i}'[:32], phone=f'+9{run}{i:07d}'[:32], role=role, password='!',
+            location=point() if role == 'user' else None, preferences=rng.sample(CATEGORIES, 2),
+        )
+
+    customers = User.objects.bulk_create([user('user', i) for i in range(customers_n)], batch_size=batch_size)  # type: ignore[attr-defined]
+    owners = User.objects.bulk_create([user('business', i) for i in range(businesses_n)], batch_size=batch_size)  # type: ignore[attr-defined]
+    businesses = Business.objects.bulk_create([  # type: ignore[attr-defined]
+        Business(
+            name=f'{rng.choice(WORDS).title()} Place {i}', owner_user=owner, location=point(),
+            categories=rng.sample(CATEGORIES, 2), is_verified=rng.random() < 0.5,
+        )
+        for i, owner in enumerate(owners)
+    ], batch_size=batch_size)
+
+    deal_rows = []
+    for i in range(deals):
+        business = rng.choice(businesses)
+        start = now - timedelta(days=rng.uniform(0, 60))
+        deal_rows.append(Deal(
+            business=business, business_summary=business.summary(),
+            title=f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} offer {i}', description=f'{rng.choice(WORDS)} deal',
+            category=rng.choice(business.categories), start_time=start, end_time=start + timedelta(days=rng.uniform(1, 90)),
+            location=business.location, is_active=rng.random() < 0.8, views=rng.randint(0, 500), clicks=rng.randint(0, 50),
+        ))
+    deal_rows = Deal.objects.bulk_create(deal_rows, batch_size=batch_size)  # type: ignore[attr-defined]
+
+    def insert(model, rows):
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += len(model.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        return count + len(model.objects.bulk_create(batch, ignore_conflicts=True))
+
+    counts = {
+        'user': len(customers) + len(owners), 'business': len(businesses), 'deal': len(deal_rows),
+        'saveddeal': insert(SavedDeal, (
+            SavedDeal(user=customer, deal=rng.choice(deal_rows)) for customer in customers for _ in range(5)
+        )),
+        'notification': insert(Notification, (
+            Notification(
+                user=customer, title='New Deal!', message=deal.title, notification_type='new_deal',
+                related_deal=deal, is_read=rng.random() < 0.7,
+            )
+            for customer in customers for deal in rng.sample(deal_rows, min(20, len(deal_rows)))
+        )),
+        # Analytics stay in the current month so a partitioned table has a partition for them
+        'dealanalytics': insert(DealAnalytics, (
+            DealAnalytics(
+                deal=deal, user=rng.choice(customers), action_type=rng.choice(['view', 'view', 'view', 'click', 'save']),
+                created_at=now - timedelta(seconds=rng.uniform(0, (now.day - 1) * 86400 + now.hour * 3600)),
+            )
+            for deal in deal_rows for _ in range(10)
+        )),
+        'customerrequest': insert(CustomerRequest, (
+            CustomerRequest(
+                user=customer, title=f'Looking for {rng.choice(WORDS)}', category=rng.choice(CATEGORIES),
+                location=customer.location, is_active=rng.random() < 0.6,
+            )
+            for customer in customers[::2]
+        )),
+    }
+    with connections['default'].cursor() as cursor:
+        for model in (User, Business, Deal, SavedDeal, Notification, DealAnalytics, CustomerRequest):
+            cursor.execute(f'ANALYZE {connections["default"].ops.quote_name(model._meta.db_table)}')
+    return counts
+
+# See README.md and inline comments for documentation.
@@ -0,0 +1,197 @@
+"""
+Personalised deal feed ranking.
+
+candidates() pulls active deals within the search radius in one query, with
+per-user signals (preferred category, saved, viewed) computed by the database.
+score() then ranks the whole candidate set with vectorized NumPy arithmetic:
+
+    score = w_distance * exp(-distance / FEED_DISTANCE_SCALE_KM)
+          + w_category * preferred
+          + w_recency  * 0.5 ** (age / FEED_RECENCY_HALF_LIFE_HOURS)
+          + w_ctr      * smoothed CTR relative to the prior
+          + w_saved    * saved + w_viewed * viewed
+
+Weights come from settings.FEED_WEIGHTS. Pages are cut by a keyset cursor on
+(score, id); the cursor also pins the reference time so recency does not
+shift between pages.
+"""
+import base64
+import json
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .counters import pending_expression
+from .models import Deal, DealInteraction, SavedDeal
+from .sync import InvalidCursor
+
+DEFAULT_WEIGHTS = {
+    'distance': 1.0,
+    'category': 0.6,
+    'recency': 0.4,
+    'ctr': 0.5,
+    'saved': -0.3,
+    'viewed': -0.2,
+}
+# Beta prior for click-through rate: deals with few views score near the prior
+CTR_PRIOR_CLICKS = 1.0
+CTR_PRIOR_VIEWS = 20.0
+
+
+class FeedCursor:
+    """
+    Keyset position (score, id) of the last deal returned, plus the reference time.
+    """
+    def __init__(self, now, score=np.inf, deal_id=0):
+        self.now = now
+        self.score = score
+        self.deal_id = deal_id
+
+    @classmethod
+    def decode(cls, token):
+        if not token:
+            return cls(time.time())
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            return cls(float(raw['t']), float(raw['s']), int(raw['i']))
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(f"Invalid feed cursor: {e}")
+
+    def encode(self):
+        raw = {'t': self.now, 's': self.score, 'i': self.deal_id}
+        return base64.urlsafe_b64encode(json.dumps(raw, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def preferred_categories(user):
+    """Lower-cased categories from preferences (a list, or a dict with 'categories')."""
+    prefs = getattr(user, 'preferences', None)
+    if isinstance(prefs, dict):
+        prefs = prefs.get('categories', [])
+    if not isinstance(prefs, list):
+        return []
+    return sorted({str(item).strip().lower() for item in prefs if isinstance(item, str) and item.strip()})
+
+
+def candidate_queryset(user, point, radius_km):
+    """
+    Active deals within radius_km of point (nearest first) as rows of id,
+    distance_m, created_at, views, clicks, preferred, saved, viewed. Views and
+    clicks include the increments not yet reconciled from counter shards.
+    """
+    never = Value(False, output_field=BooleanField())
+    queryset = Deal.objects.filter(is_active=True, end_time__gte=timezone.now()).annotate(  # type: ignore[attr-defined]
+        total_views=F('views') + pending_expression('views'),
+        total_clicks=F('clicks') + pending_expression('clicks'),
+    )
+    if point is not None:
+        queryset = queryset.filter(location__dwithin=(point, D(km=radius_km))).annotate(
+            distance_m=Distance('location', point, output_field=FloatField())
+        ).order_by('distance_m')
+    else:
+        queryset = queryset.annotate(distance_m=Value(0.0, output_field=FloatField())).order_by('-created_at')
+
+    categories = preferred_categories(user)
+    if categories:
+        queryset = queryset.annotate(category_lower=Lower('category')).annotate(
+            preferred=ExpressionWrapper(Q(category_lower__in=categories), output_field=BooleanField())
+        )
+    else:
+        queryset = queryset.annotate(preferred=never)
+
+    if user is not None and user.is_authenticated:
+        queryset = queryset.annotate(
+            saved=Exists(SavedDeal.objects.filter(user_id=user.id, deal=OuterRef('pk'))),  # type: ignore[attr-defined]
+            viewed=Exists(DealInteraction.objects.filter(  # type: ignore[attr-defined]
+                user_id=user.id, deal=OuterRef('pk'), action_type='view'
+            )),
+        )
+    else:
+        queryset = queryset.annotate(saved=never, viewed=never)
+
+    return queryset.values_list('id', 'distance_m', 'created_at', 'total_views', 'total_clicks', 'preferred', 'saved', 'viewed')
+
+
+def candidates(user, point, radius_km, limit):
+    """
+    Fetch up to `limit` candidate_queryset() rows and return their columns as
+    NumPy arrays: id, distance_km, created (epoch seconds), views, clicks,
+    preferred, saved, viewed.
+    """
+    rows = list(candidate_queryset(user, point, radius_km)[:limit])
+    columns = list(zip(*rows)) if rows else [()] * 8
+    return {
+        'id': np.array(columns[0], dtype=np.int64),
+        'distance_km': np.array(columns[1], dtype=np.float64) / 1000,
+        'created': np.array([created.timestamp() for created in columns[2]], dtype=np.float64),
+        'views': np.array(columns[3], dtype=np.float64),
+        'clicks': np.array(columns[4], dtype=np.float64),
+        'preferred': np.array(columns[5], dtype=bool),
+        'saved': np.array(columns[6], dtype=bool),
+        'viewed': np.array(columns[7], dtype=bool),
+    }
+
+
+def score(features, now, weights=None):
+    """Score every candidate at once; returns a float64 array aligned with features['id']."""
+    w = {**DEFAULT_WEIGHTS, **getattr(settings, 'FEED_WEIGHTS', {}), **(weights or {})}
+    distance_scale = getattr(settings, 'FEED_DISTANCE_SCALE_KM', 5.0)
+    half_life = getattr(settings, 'FEED_RECENCY_HALF_LIFE_HOURS', 72.0) * 3600
+
+    age = np.maximum(now - features['created'], 0.0)
+    ctr = (features['clicks'] + CTR_PRIOR_CLICKS) / (features['views'] + CTR_PRIOR_VIEWS)
+    prior = CTR_PRIOR_CLICKS / CTR_PRIOR_VIEWS
+
+    result = w['distance'] * np.exp(-features['distance_km'] / distance_scale)
+    result += w['recency'] * np.exp2(-age / half_life)
+    result += w['ctr'] * np.minimum(ctr / prior, 5.0) / 5.0
+    result += w['category'] * features['preferred']
+    result += w['saved'] * features['saved']
+    result += w['viewed'] * features['viewed']
+    return result
+
+
+def top_k(ids, scores, k, after_score=np.inf, after_id=0):
+    """
+    Indices of the k best candidates ranked strictly after (after_score, after_id),
+    ordered by score descending then id ascending. O(n) selection plus O(k log k) sort.
+    """
+    eligible = np.flatnonzero((scores < after_score) | ((scores == after_score) & (ids > after_id)))
+    if len(eligible) > k:
+        # Keep everything tied with the k-th best score so the id tiebreak, and
+        # hence the cursor, sees every tied candidate
+        threshold = -np.partition(-scores[eligible], k - 1)[k - 1]
+        eligible = eligible[scores[eligible] >= threshold]
+    return eligible[np.lexsort((ids[eligible], -scores[eligible]))][:k]
+
+
+def rank_feed(user, point, cursor, page_size):
+    """
+    Return (deal_ids, scores, distances_km, next_cursor, has_more) for one feed page.
+    """
+    features = candidates(
+        user, point,
+        getattr(settings, 'FEED_RADIUS_KM', 25.0),
+        getattr(settings, 'FEED_CANDIDATE_LIMIT', 5000),
+    )
+    scores = score(features, cursor.now)
+    order = top_k(features['id'], scores, page_size + 1, cursor.score, cursor.deal_id)
+    has_more = len(order) > page_size
+    order = order[:page_size]
+    next_cursor = None
+    if has_more:
+        last = order[-1]
+        next_cursor = FeedCursor(cursor.now, float(scores[last]), int(features['id'][last]))
+    return (
+        features['id'][order].tolist(),
+        scores[order].tolist(),
+        features['distance_km'][order].tolist(),
+        next_cursor,
+        has_more,
+    )
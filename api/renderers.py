@@ -0,0 +1,58 @@
+from rest_framework.renderers import JSONRenderer
+
+
+def drop_nulls(value):
+    if isinstance(value, dict):
+        return {key: drop_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [drop_nulls(item) for item in value]
+    return value
+
+
+def compact_payload(data):
+    """
+    Replace every nested `business` object with its id and collect the
+    businesses once into a top-level `businesses` table keyed by id.
+    List responses become {'results': [...], 'businesses': {...}}.
+    """
+    businesses = {}
+
+    def hoist(value):
+        if isinstance(value, list):
+            return [hoist(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for key, item in value.items():
+            if key == 'business' and isinstance(item, dict) and 'id' in item:
+                businesses.setdefault(str(item['id']), item)
+                result[key] = item['id']
+            else:
+                result[key] = hoist(item)
+        return result
+
+    data = hoist(data)
+    if businesses:
+        if isinstance(data, list):
+            data = {'results': data}
+        if isinstance(data, dict):
+            data['businesses'] = businesses
+    return drop_nulls(data)
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Slim JSON for mobile clients, selected with `?format=compact` or
+    `Accept: application/vnd.minglin.compact+json`: businesses are
+    de-duplicated into a side table and null fields are dropped.
+    """
+    media_type = 'application/vnd.minglin.compact+json'
+    format = 'compact'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if data is not None and (response is None or not response.exception):
+            data = compact_payload(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+# See README.md and inline comments for documentation.
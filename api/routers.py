@@ -0,0 +1,140 @@
+"""
+Read-replica routing for public read endpoints.
+
+Views opt in with ReplicaReadMixin. For safe (GET/HEAD/OPTIONS) requests the
+mixin picks a healthy replica alias and ReplicaRouter sends that request's
+reads to it; everything else uses the primary ('default'). After a user
+writes, their reads stay on the primary for READ_YOUR_WRITES_SECONDS so they
+never see replication lag on their own changes. The pin lives in the default
+cache, so it must be shared between workers (see CACHES in settings.py).
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger('api')
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+_wrote = ContextVar('replica_wrote', default=False)
+
+# alias -> (healthy, checked_at), per worker process
+_replica_health = {}
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _probe(alias):
+    """
+    Return True if the replica accepts queries and is within the allowed lag.
+    """
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 30)
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )
+            lag = float(cursor.fetchone()[0])
+        if lag > max_lag:
+            logger.warning('Replica %s lagging by %.1fs, using primary', alias, lag)
+            return False
+        return True
+    except Exception as e:
+        logger.warning('Replica %s unhealthy, using primary: %s', alias, e)
+        connections[alias].close()
+        return False
+
+
+def is_healthy(alias):
+    interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+    healthy, checked_at = _replica_health.get(alias, (None, 0.0))
+    if healthy is None or time.monotonic() - checked_at > interval:
+        healthy = _probe(alias)
+        _replica_health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def choose_replica():
+    healthy = [alias for alias in replica_aliases() if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), 1, timeout=getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+    """
+    Database router: reads go to the replica chosen for the current request, if any.
+    """
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias and not connections['default'].in_atomic_block:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+class ReplicaReadMixin:
+    """
+    Send safe reads of this view to a replica, unless the user wrote recently.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # Authenticates the user first
+        if request.method not in SAFE_METHODS or not replica_aliases():
+            return
+        if request.user.is_authenticated and is_pinned(request.user.id):
+            return
+        _read_alias.set(choose_replica())
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Reset per-request routing state and pin users to the primary after they write.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        read_token = _read_alias.set(None)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            # Only user-initiated writes pin; e.g. view analytics recorded on GET do not
+            user = getattr(request, 'user', None)
+            if (request.method not in SAFE_METHODS and _wrote.get() and replica_aliases()
+                    and user is not None and user.is_authenticated):
+                pin_to_primary(user.id)
+            return response
+        finally:
+            _read_alias.reset(read_token)
+            _wrote.reset(wrote_token)
+
+# See README.md and inline comments for documentation.
@@ -2,6 +2,24 @@ from rest_framework import serializers
 from .models import User, Business, Deal, SavedDeal, Notification, DealAnalytics, OTP, CustomerRequest
 from django.contrib.gis.geos import Point
 from django.contrib.auth.password_validation import validate_password
+from django.db import models
+from . import counters
+
+class SparseFieldsetMixin:
+    """
+    Limit a read response to `?fields=id,title,...`. Unrequested fields are never
+    computed (e.g. is_saved), so this also saves queries, not just bytes.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if requested:
+            wanted = {name.strip() for name in requested.split(',') if name.strip()}
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
 
 class PhoneAuthSerializer(serializers.Serializer):
     """
@@ -56,7 +74,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'phone']
 
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     owner_user = serializers.PrimaryKeyRelatedField(read_only=True)
     logo_url = serializers.SerializerMethodField()
     location = serializers.SerializerMethodField()
@@ -89,7 +107,16 @@ class BusinessSerializer(serializers.ModelSerializer):
             ret['location'] = Point(float(lon), float(lat))
         return ret
 
-class DealSerializer(serializers.ModelSerializer):
+class DealCountersListSerializer(serializers.ListSerializer):
+    """Prefetches the page's unreconciled view/click shards in one query."""
+
+    def to_representation(self, data):
+        deals = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'views' in self.child.fields or 'clicks' in self.child.fields:
+            counters.prefetch(deals)
+        return super().to_representation(deals)
+
+class DealSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     business = BusinessSerializer(read_only=True)
     business_id = serializers.PrimaryKeyRelatedField(
         queryset=Business.objects.all(), source='business', write_only=True, required=False
@@ -98,9 +125,13 @@ class DealSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True, max_length=None)
     image_url = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
+    # Deal.views/clicks plus the increments still in counter shards (api/counters.py)
+    views = serializers.SerializerMethodField()
+    clicks = serializers.SerializerMethodField()
 
     class Meta:
         model = Deal
+        list_serializer_class = DealCountersListSerializer
         fields = [
             'id', 'business', 'business_id', 'title', 'description', 'image', 'image_url',
             'category', 'cta', 'start_time', 'end_time', 'location',
@@ -121,6 +152,12 @@ class DealSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_views(self, obj):
+        return counters.current(obj)[0]
+
+    def get_clicks(self, obj):
+        return counters.current(obj)[1]
+
     def get_is_saved(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
@@ -150,6 +187,21 @@ class DealSerializer(serializers.ModelSerializer):
             
         return ret
 
+class DealListSerializer(DealSerializer):
+    """
+    DealSerializer for listings: `business` is the deal's denormalized
+    business_summary (id, name, logo_url, is_verified, categories), so no
+    business row is loaded.
+    """
+    business = serializers.SerializerMethodField()
+
+    def get_business(self, obj):
+        summary = dict(obj.business_summary)
+        request = self.context.get('request')
+        if request and summary.get('logo_url'):
+            summary['logo_url'] = request.build_absolute_uri(summary['logo_url'])
+        return summary
+
 class SavedDealSerializer(serializers.ModelSerializer):
     deal = DealSerializer(read_only=True)
     deal_id = serializers.PrimaryKeyRelatedField(
@@ -161,18 +213,39 @@ class SavedDealSerializer(serializers.ModelSerializer):
         fields = ['id', 'deal', 'deal_id', 'saved_at']
         read_only_fields = ['id', 'saved_at']
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     related_deal = DealSerializer(read_only=True)
 
     class Meta:
         model = Notification
         fields = [
             'id', 'title', 'message', 'notification_type', 'is_read',
-            'related_deal', 'created_at'
+            'related_deal', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class NotificationDealSerializer(serializers.ModelSerializer):
+    """
+    Deal summary embedded in inbox notifications: the business comes from
+    business_summary and there is no is_saved query.
+    """
+    business = serializers.SerializerMethodField()
+    image_url = serializers.SerializerMethodField()
+
+    get_business = DealListSerializer.get_business
+    get_image_url = DealSerializer.get_image_url
+
+    class Meta:
+        model = Deal
+        fields = ['id', 'title', 'category', 'image_url', 'end_time', 'is_active', 'business']
+        read_only_fields = fields
+
+class NotificationListSerializer(NotificationSerializer):
+    related_deal = NotificationDealSerializer(read_only=True)
 
 class DealAnalyticsSerializer(serializers.ModelSerializer):
+    user_agent = serializers.SerializerMethodField()
+
     class Meta:
         model = DealAnalytics
         fields = [
@@ -181,7 +254,60 @@ class DealAnalyticsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
-class CustomerRequestSerializer(serializers.ModelSerializer):
+    def get_user_agent(self, obj):
+        # Select `agent` on the queryset to avoid a lookup per row
+        return obj.agent.value if obj.agent_id else obj.user_agent
+
+class DealInteractionEventSerializer(serializers.Serializer):
+    """
+    One client-side deal interaction in a batch upload.
+    """
+    deal_id = serializers.IntegerField(min_value=1)
+    action_type = serializers.ChoiceField(choices=DealAnalytics.ACTION_CHOICES)
+    ts = serializers.DateTimeField(required=False)
+
+class DealInteractionBatchSerializer(serializers.Serializer):
+    """
+    Batch of deal interactions, accepted as {"events": [...]} or a bare list.
+    """
+    events = DealInteractionEventSerializer(many=True, allow_empty=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            data = {'events': data}
+        return super().to_internal_value(data)
+
+    def validate_events(self, value):
+        from django.conf import settings
+        limit = getattr(settings, 'DEAL_INTERACTION_BATCH_LIMIT', 200)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} events per batch.")
+        return value
+
+class DealImportSerializer(serializers.Serializer):
+    """
+    One row of a bulk deal import (CSV or JSON Lines, see api/bulk.py).
+    Deals without lat/lon take their business's location.
+    """
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    category = serializers.CharField(max_length=128, required=False, allow_blank=True, default='')
+    cta = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    is_active = serializers.BooleanField(required=False, default=True)
+    lat = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    lon = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+    business_id = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': 'Must be after start_time.'})
+        if (attrs.get('lat') is None) != (attrs.get('lon') is None):
+            raise serializers.ValidationError('Provide both lat and lon, or neither.')
+        return attrs
+
+class CustomerRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     location = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
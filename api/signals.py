@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import inbox
+from .models import Business, Deal, Notification, Tombstone
+from .tiles import invalidate_points
+
+# Deals and notifications are hard-deleted (directly or by cascade), so record
+# a tombstone for incremental sync clients. See api/sync.py.
+
+@receiver(post_delete, sender=Deal)
+def record_deal_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model='deal', object_id=instance.pk)  # type: ignore[attr-defined]
+
+@receiver(post_delete, sender=Notification)
+def record_notification_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model='notification', object_id=instance.pk, user_id=instance.user_id)  # type: ignore[attr-defined]
+
+# Drop cached map tiles (api/tiles.py) around deals that change, at both the
+# old and the new location when a deal moves.
+
+@receiver(pre_save, sender=Deal)
+def remember_deal_location(sender, instance, **kwargs):
+    # Deal.from_db keeps the stored location; only deals built with a pk by hand
+    # (or loaded with the location deferred) need a lookup
+    if instance.pk and not hasattr(instance, '_stored_location'):
+        instance._stored_location = (
+            Deal.objects.filter(pk=instance.pk).values_list('location', flat=True).first()  # type: ignore[attr-defined]
+        )
+
+@receiver(post_save, sender=Deal)
+def invalidate_deal_tiles(sender, instance, **kwargs):
+    points = [instance.location, getattr(instance, '_stored_location', None)]
+    instance._stored_location = instance.location
+    transaction.on_commit(lambda: invalidate_points(points))
+
+@receiver(post_delete, sender=Deal)
+def invalidate_deleted_deal_tiles(sender, instance, **kwargs):
+    location = instance.location
+    transaction.on_commit(lambda: invalidate_points([location]))
+
+@receiver(post_save, sender=Business)
+def invalidate_business_deal_tiles(sender, instance, created, **kwargs):
+    # Tiles embed the business name
+    if created:
+        return
+    points = list(instance.deals.exclude(location=None).values_list('location', flat=True))
+    transaction.on_commit(lambda: invalidate_points(points))
+
+# Keep the denormalized Deal.business_summary in step with its business.
+# QuerySet.update() on businesses bypasses this; check_business_summaries repairs it.
+
+@receiver(post_save, sender=Business)
+def sync_business_deal_summaries(sender, instance, created, **kwargs):
+    if not created:
+        instance.sync_deal_summaries()
+
+# Keep unread counters (api/inbox.py) in step with single saves and deletes.
+# Bulk paths (inbox.deliver, inbox.mark_read, inbox.delete) adjust the counters
+# themselves; use inbox.delete before deletes that cascade to many notifications.
+
+@receiver(pre_save, sender=Notification)
+def remember_notification_read_state(sender, instance, **kwargs):
+    # Notification.from_db keeps the stored read state; only rows built with a pk
+    # by hand (or loaded with is_read deferred) need a lookup
+    if instance.pk and not hasattr(instance, '_was_read'):
+        instance._was_read = (
+            Notification.objects.filter(pk=instance.pk).values_list('is_read', flat=True).first()  # type: ignore[attr-defined]
+        )
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_read = True if created else getattr(instance, '_was_read', None)
+    instance._was_read = instance.is_read
+    if was_read is not None and was_read != instance.is_read:
+        inbox.adjust({instance.user_id: -1 if instance.is_read else 1})
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        inbox.adjust({instance.user_id: -1})
@@ -1,3 +1,684 @@
-from django.test import TestCase
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
 
-# Create your tests here.
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import counters, inbox, queryplans, routers
+from api.models import (
+    OTP, Business, Deal, DealAnalytics, DealCounterShard, DealInteraction, Notification, Tombstone, User,
+)
+from api.otp import CacheOTPBackend, DatabaseOTPBackend
+from api.serializers import DealSerializer
+from api.sync import InvalidCursor, SyncCursor, sync_changes
+from api.utils import get_client_ip
+
+
+class ClientIPTests(SimpleTestCase):
+
+    def request(self, forwarded_for=None):
+        meta = {'REMOTE_ADDR': '10.0.0.2'}
+        if forwarded_for:
+            meta['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        return RequestFactory().get('/', **meta)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_spoofed_entries_left_of_the_proxy_are_ignored(self):
+        self.assertEqual(get_client_ip(self.request('1.1.1.1, 203.0.113.7')), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXY_COUNT=2)
+    def test_entries_added_by_trusted_proxies_are_skipped(self):
+        self.assertEqual(get_client_ip(self.request('1.1.1.1, 203.0.113.7, 10.0.0.1')), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_without_proxies_the_header_is_ignored(self):
+        self.assertEqual(get_client_ip(self.request('1.1.1.1')), '10.0.0.2')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_direct_request_uses_remote_addr(self):
+        self.assertEqual(get_client_ip(self.request()), '10.0.0.2')
+
+
+def create_deal(business, **fields):
+    """An active deal of business, running until tomorrow."""
+    now = timezone.now()
+    fields = {'title': 'Coffee', 'category': 'food', 'start_time': now, 'end_time': now + timedelta(days=1), **fields}
+    return Deal.objects.create(business=business, **fields)  # type: ignore[attr-defined]
+
+
+class DealUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', phone='+10000000002', password='!', role='business')  # type: ignore[attr-defined]
+        cls.business = Business.objects.create(name='Corner Cafe', owner_user=cls.owner, categories=['food'])  # type: ignore[attr-defined]
+        cls.deal = create_deal(cls.business)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_patch_cannot_forge_business_summary(self):
+        forged = {'id': self.business.id, 'name': 'Official Partner', 'logo_url': None, 'is_verified': True, 'categories': ['food']}
+        response = self.client.patch(
+            reverse('deal-detail', args=[self.deal.id]), {'title': 'Espresso', 'business_summary': forged}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.title, 'Espresso')
+        self.assertEqual(self.deal.business_summary, self.business.summary())
+
+
+class OTPBackendTests:
+    """Behaviour both OTP backends (api/otp.py) share; mixed into a test case per backend."""
+
+    backend_class = None
+    phone = '+15550000001'
+
+    def setUp(self):
+        self.backend = self.backend_class()
+
+    def issue(self, *codes):
+        with mock.patch('api.otp.generate_code', side_effect=codes):
+            for _ in codes:
+                self.backend.issue(self.phone)
+
+    def test_code_verifies_once(self):
+        self.issue('123456')
+        self.assertIsNone(self.backend.verify(self.phone, '123456'))
+        self.assertIsNotNone(self.backend.verify(self.phone, '123456'))
+
+    def test_wrong_code_is_rejected(self):
+        self.issue('123456')
+        self.assertEqual(self.backend.verify(self.phone, '654321'), 'Invalid OTP')
+        self.assertIsNone(self.backend.verify(self.phone, '123456'))
+
+    def test_code_is_bound_to_its_phone(self):
+        self.issue('123456')
+        self.assertIsNotNone(self.backend.verify('+15550000002', '123456'))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_attempts_are_limited(self):
+        self.issue('123456')
+        for _ in range(3):
+            self.assertEqual(self.backend.verify(self.phone, '000000'), 'Invalid OTP')
+        self.assertEqual(self.backend.verify(self.phone, '123456'), 'Too many attempts. Please request a new OTP')
+
+    @override_settings(OTP_TTL_SECONDS=0)
+    def test_expired_code_is_rejected(self):
+        self.issue('123456')
+        self.assertIn('expired', self.backend.verify(self.phone, '123456'))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_new_code_replaces_the_previous_one_and_resets_attempts(self):
+        self.issue('111111')
+        for _ in range(3):
+            self.backend.verify(self.phone, '000000')
+        self.issue('222222')
+        self.assertEqual(self.backend.verify(self.phone, '111111'), 'Invalid OTP')
+        self.assertIsNone(self.backend.verify(self.phone, '222222'))
+
+    def test_concurrent_verifications_succeed_once(self):
+        self.issue('123456')
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.verify_in_thread, ['123456'] * 8))
+        self.assertEqual(results.count(None), 1)
+
+    def verify_in_thread(self, code):
+        try:
+            return self.backend.verify(self.phone, code)
+        finally:
+            connection.close()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheOTPBackendTests(OTPBackendTests, SimpleTestCase):
+
+    backend_class = CacheOTPBackend
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class DatabaseOTPBackendTests(OTPBackendTests, TransactionTestCase):
+    """A TransactionTestCase, so the concurrent verifications run on their own connections."""
+
+    backend_class = DatabaseOTPBackend
+
+    def test_one_row_per_phone(self):
+        self.issue('111111', '222222', '333333')
+        otp = OTP.objects.get(phone=self.phone)  # type: ignore[attr-defined]
+        self.assertEqual(otp.code_hash, OTP.hash_code(self.phone, '333333'))
+        self.assertEqual(otp.attempts, 0)
+
+    def test_only_the_hash_is_stored(self):
+        self.issue('123456')
+        self.assertFalse(OTP.objects.filter(code_hash__contains='123456').exists())  # type: ignore[attr-defined]
+
+
+class OTPUniquePhoneMigrationTests(TransactionTestCase):
+    """0014_otp_unique_phone keeps only the newest code of each phone before adding the constraint."""
+
+    before = [('api', '0013_deal_announcements')]
+    after = [('api', '0014_otp_unique_phone')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_removed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        HistoricalOTP = executor.loader.project_state(self.before).apps.get_model('api', 'OTP')
+        now = timezone.now()
+        for phone, age in [('+15550000001', 3), ('+15550000001', 1), ('+15550000001', 2), ('+15550000002', 5)]:
+            otp = HistoricalOTP.objects.create(phone=phone, code_hash=str(age), expires_at=now)
+            HistoricalOTP.objects.filter(pk=otp.pk).update(created_at=now - timedelta(minutes=age))
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        HistoricalOTP = executor.loader.project_state(self.after).apps.get_model('api', 'OTP')
+        self.assertEqual(
+            sorted(HistoricalOTP.objects.values_list('phone', 'code_hash')),
+            [('+15550000001', '1'), ('+15550000002', '5')],
+        )
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class DealInteractionTests(TestCase):
+    """Each (deal, user, action) is recorded and counted once (api/interactions.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(username='customer', phone='+10000000003', password='!', role='user')  # type: ignore[attr-defined]
+        owner = User.objects.create_user(username='shop', phone='+10000000004', password='!', role='business')  # type: ignore[attr-defined]
+        business = Business.objects.create(name='Corner Cafe', owner_user=owner)  # type: ignore[attr-defined]
+        cls.deal = create_deal(business)
+        cls.other_deal = create_deal(business, title='Tea')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def interact(self, deal_id, action_type, status_code=200):
+        response = self.client.post(reverse('record-deal-interaction', args=[deal_id]), {'action_type': action_type}, format='json')
+        self.assertEqual(response.status_code, status_code)
+        return response.data
+
+    def test_repeated_action_counts_once(self):
+        self.assertEqual(self.interact(self.deal.id, 'view')['views'], 1)
+        self.assertEqual(self.interact(self.deal.id, 'view')['views'], 1)
+        self.assertEqual(DealInteraction.objects.filter(deal=self.deal, user=self.customer).count(), 1)  # type: ignore[attr-defined]
+        self.assertEqual(DealAnalytics.objects.filter(deal=self.deal).count(), 1)  # type: ignore[attr-defined]
+
+    def test_each_action_and_user_counts(self):
+        self.interact(self.deal.id, 'view')
+        clicked = self.interact(self.deal.id, 'click')
+        self.assertEqual((clicked['views'], clicked['clicks']), (1, 1))
+        self.client.force_authenticate(User.objects.create_user(username='other', phone='+10000000005', password='!', role='user'))  # type: ignore[attr-defined]
+        self.assertEqual(self.interact(self.deal.id, 'view')['views'], 2)
+
+    def test_unknown_deal_is_not_found(self):
+        self.interact(999999999, 'view', status_code=404)
+        self.assertFalse(DealInteraction.objects.exists())  # type: ignore[attr-defined]
+
+    def batch(self, events):
+        response = self.client.post(reverse('record-deal-interactions-batch'), {'events': events}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_batch_dedupes_and_reports_unknown_deals(self):
+        events = [
+            {'deal_id': self.deal.id, 'action_type': 'view'},
+            {'deal_id': self.deal.id, 'action_type': 'view'},
+            {'deal_id': self.deal.id, 'action_type': 'click'},
+            {'deal_id': self.other_deal.id, 'action_type': 'view'},
+            {'deal_id': 999999999, 'action_type': 'view'},
+        ]
+        result = self.batch(events)
+        self.assertEqual((result['recorded'], result['duplicates'], result['invalid_deal_ids']), (3, 1, [999999999]))
+        self.assertEqual(
+            {deal['id']: (deal['views'], deal['clicks']) for deal in result['deals']},
+            {self.deal.id: (1, 1), self.other_deal.id: (1, 0)},
+        )
+
+        again = self.batch(events)
+        self.assertEqual((again['recorded'], again['duplicates'], again['invalid_deal_ids']), (0, 4, [999999999]))
+        self.assertEqual(DealAnalytics.objects.count(), 3)  # type: ignore[attr-defined]
+
+    def test_batch_shares_the_key_with_single_interactions(self):
+        self.interact(self.deal.id, 'view')
+        result = self.batch([{'deal_id': self.deal.id, 'action_type': 'view'}])
+        self.assertEqual((result['recorded'], result['duplicates']), (0, 1))
+        self.assertEqual(result['deals'][0]['views'], 1)
+
+
+@override_settings(DEAL_COUNTER_SHARDS=4)
+class DealCounterTests(TestCase):
+    """Views and clicks are exact whether or not the shards have been reconciled (api/counters.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='shop', phone='+10000000006', password='!', role='business')  # type: ignore[attr-defined]
+        cls.deal = create_deal(Business.objects.create(name='Corner Cafe', owner_user=owner), views=10, clicks=2)  # type: ignore[attr-defined]
+
+    def counts(self):
+        deal = Deal.objects.get(pk=self.deal.pk)  # type: ignore[attr-defined]
+        data = DealSerializer(deal).data
+        return {
+            'totals': counters.totals([deal.id])[deal.id],
+            'current': counters.current(deal),
+            'serialized': (data['views'], data['clicks']),
+        }
+
+    def assertCounts(self, expected):
+        self.assertEqual(self.counts(), {'totals': expected, 'current': expected, 'serialized': expected})
+
+    def test_increments_spread_over_shards(self):
+        for _ in range(20):
+            counters.increment(self.deal.id, views=1)
+        counters.increment(self.deal.id, clicks=3)
+        self.assertLessEqual(DealCounterShard.objects.filter(deal=self.deal).count(), 4)  # type: ignore[attr-defined]
+        self.assertEqual(counters.pending([self.deal.id]), {self.deal.id: (20, 3)})
+
+    def test_counts_survive_reconcile(self):
+        counters.increment(self.deal.id, views=3, clicks=1)
+        counters.increment(self.deal.id, views=2)
+        self.assertCounts((15, 3))
+        self.assertEqual(Deal.objects.values_list('views', 'clicks').get(pk=self.deal.pk), (10, 2))  # type: ignore[attr-defined]
+
+        call_command('reconcile_deal_counters', stdout=io.StringIO())
+        self.assertFalse(DealCounterShard.objects.exists())  # type: ignore[attr-defined]
+        self.assertEqual(Deal.objects.values_list('views', 'clicks').get(pk=self.deal.pk), (15, 3))  # type: ignore[attr-defined]
+        self.assertCounts((15, 3))
+
+        counters.increment(self.deal.id, clicks=1)
+        self.assertCounts((15, 4))
+
+    def test_reconcile_without_shards_changes_nothing(self):
+        self.assertEqual(counters.reconcile(), 0)
+        self.assertCounts((10, 2))
+
+
+class SyncCursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        now = timezone.now()
+        cursor = SyncCursor.decode(SyncCursor((now, 7), (now - timedelta(hours=1), 3)).encode())
+        self.assertEqual((cursor.changed, cursor.deleted), ((now, 7), (now - timedelta(hours=1), 3)))
+        self.assertFalse(cursor.is_initial)
+
+    def test_missing_token_is_initial(self):
+        self.assertTrue(SyncCursor.decode(None).is_initial)
+
+    def test_malformed_token_is_rejected(self):
+        for token in ['not-a-cursor', 'e30', SyncCursor().encode()[:-4]]:
+            with self.subTest(token=token), self.assertRaises(InvalidCursor):
+                SyncCursor.decode(token)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncChangesTests(TestCase):
+    """Keyset sync over deals and their tombstones (api/sync.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='shop', phone='+10000000007', password='!', role='business')  # type: ignore[attr-defined]
+        cls.business = Business.objects.create(name='Corner Cafe', owner_user=owner)  # type: ignore[attr-defined]
+
+    def sync(self, cursor=None, limit=None):
+        return sync_changes(Deal.objects.all(), Tombstone.objects.filter(model='deal'), cursor or SyncCursor(), limit)  # type: ignore[attr-defined]
+
+    def test_cursor_returns_only_later_changes(self):
+        first, second = create_deal(self.business), create_deal(self.business, title='Tea')
+        changed, deleted, cursor, has_more, reset = self.sync()
+        self.assertEqual([deal.id for deal in changed], [first.id, second.id])
+        self.assertEqual((deleted, has_more, reset), ([], False, False))
+
+        self.assertEqual(self.sync(cursor)[0], [])
+        first.title = 'Espresso'
+        first.save()
+        self.assertEqual([deal.id for deal in self.sync(cursor)[0]], [first.id])
+
+    def test_pages_follow_the_cursor(self):
+        deals = [create_deal(self.business, title=f'Deal {i}') for i in range(3)]
+        changed, _, cursor, has_more, _ = self.sync(limit=2)
+        self.assertEqual(([deal.id for deal in changed], has_more), ([deals[0].id, deals[1].id], True))
+        changed, _, _, has_more, _ = self.sync(cursor, limit=2)
+        self.assertEqual(([deal.id for deal in changed], has_more), ([deals[2].id], False))
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_settle_window_holds_back_recent_changes(self):
+        deal = create_deal(self.business)
+        self.assertEqual(self.sync()[0], [])
+        Deal.objects.filter(pk=deal.pk).update(updated_at=timezone.now() - timedelta(minutes=2))  # type: ignore[attr-defined]
+        self.assertEqual([row.id for row in self.sync()[0]], [deal.id])
+
+    def test_deletes_are_reported_once_and_not_on_initial_sync(self):
+        deal = create_deal(self.business)
+        create_deal(self.business, title='Tea').delete()
+        _, deleted, cursor, _, _ = self.sync()
+        self.assertEqual(deleted, [])
+
+        deal_id = deal.id
+        deal.delete()
+        _, deleted, cursor, _, _ = self.sync(cursor)
+        self.assertEqual(deleted, [deal_id])
+        self.assertEqual(self.sync(cursor)[1], [])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_cursor_older_than_tombstone_retention_resets(self):
+        deal = create_deal(self.business)
+        stale = timezone.now() - timedelta(days=31)
+        changed, deleted, _, _, reset = self.sync(SyncCursor((stale, 0), (stale, 0)))
+        self.assertTrue(reset)
+        self.assertEqual(([row.id for row in changed], deleted), ([deal.id], []))
+
+        recent = timezone.now() - timedelta(days=29)
+        self.assertFalse(self.sync(SyncCursor((recent, 0), (recent, 0)))[4])
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class DealDestroyTests(TestCase):
+    """Deleting a deal removes its notifications in bulk, with a tombstone for each."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='shop', phone='+10000000008', password='!', role='business')  # type: ignore[attr-defined]
+        cls.business = Business.objects.create(name='Corner Cafe', owner_user=cls.owner)  # type: ignore[attr-defined]
+        cls.customers = [
+            User.objects.create_user(username=f'customer{i}', phone=f'+1000000010{i}', password='!', role='user')  # type: ignore[attr-defined]
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def announce(self, deal, customers):
+        return inbox.deliver([
+            Notification(user=customer, title='New Deal!', message=deal.title, notification_type='new_deal', related_deal=deal)
+            for customer in customers
+        ])
+
+    def destroy(self, deal):
+        with CaptureQueriesContext(connections['default']) as captured:
+            response = self.client.delete(reverse('deal-detail', args=[deal.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_notifications_get_tombstones(self):
+        deal = create_deal(self.business)
+        notifications = self.announce(deal, self.customers)
+        deal_id = deal.id
+        self.destroy(deal)
+        self.assertFalse(Notification.objects.filter(id__in=[n.id for n in notifications]).exists())  # type: ignore[attr-defined]
+        self.assertEqual(
+            set(Tombstone.objects.filter(model='notification').values_list('object_id', 'user_id')),  # type: ignore[attr-defined]
+            {(n.id, n.user_id) for n in notifications},
+        )
+        self.assertTrue(Tombstone.objects.filter(model='deal', object_id=deal_id).exists())  # type: ignore[attr-defined]
+
+    def test_queries_do_not_grow_with_the_audience(self):
+        small, large = create_deal(self.business), create_deal(self.business, title='Tea')
+        self.announce(small, self.customers[:2])
+        self.announce(large, self.customers)
+        small_queries = self.destroy(small)
+        self.assertLessEqual(self.destroy(large), small_queries)
+
+
+class InboxTests(TestCase):
+    """Unread counters match the unread notifications through every write path (api/inbox.py, api/signals.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', phone='+10000000020', password='!', role='user')  # type: ignore[attr-defined]
+        cls.other = User.objects.create_user(username='other', phone='+10000000021', password='!', role='user')  # type: ignore[attr-defined]
+
+    def setUp(self):
+        # The first read creates the counter rows; adjustments skip users without one
+        inbox.unread_count(self.user.id)
+        inbox.unread_count(self.other.id)
+
+    def notify(self, user, count=1, **fields):
+        fields = {'title': 'Hello', 'message': '', 'notification_type': 'system', **fields}
+        return inbox.deliver([Notification(user=user, **fields) for _ in range(count)])
+
+    def assertUnread(self, user, expected):
+        self.assertEqual(Notification.objects.filter(user=user, is_read=False).count(), expected)  # type: ignore[attr-defined]
+        self.assertEqual(inbox.unread_count(user.id), expected)
+
+    def test_counter_starts_from_a_count(self):
+        user = User.objects.create_user(username='new', phone='+10000000022', password='!', role='user')  # type: ignore[attr-defined]
+        self.notify(user, 2)
+        self.assertUnread(user, 2)
+
+    def test_deliver_counts_unread_notifications(self):
+        self.notify(self.user, 3)
+        self.notify(self.user, is_read=True)
+        self.notify(self.other, 2)
+        self.assertUnread(self.user, 3)
+        self.assertUnread(self.other, 2)
+
+    def test_mark_read_never_double_counts(self):
+        notifications = self.notify(self.user, 3)
+        self.assertEqual(inbox.mark_read(self.user.id, [notifications[0].id]), 1)
+        self.assertEqual(inbox.mark_read(self.user.id, [notifications[0].id]), 0)
+        self.assertUnread(self.user, 2)
+        self.assertEqual(inbox.mark_read(self.user.id), 2)
+        self.assertUnread(self.user, 0)
+
+    def test_single_saves_and_deletes(self):
+        notification = Notification.objects.create(user=self.user, title='Hello', message='', notification_type='system')  # type: ignore[attr-defined]
+        self.assertUnread(self.user, 1)
+        notification.is_read = True
+        notification.save()
+        notification.save()
+        self.assertUnread(self.user, 0)
+
+        loaded = Notification.objects.get(pk=notification.pk)  # type: ignore[attr-defined]
+        loaded.is_read = False
+        loaded.save()
+        self.assertUnread(self.user, 1)
+        loaded.delete()
+        self.assertUnread(self.user, 0)
+        self.assertTrue(Tombstone.objects.filter(model='notification', object_id=notification.pk).exists())  # type: ignore[attr-defined]
+
+    def test_save_reads_the_state_from_the_loaded_row(self):
+        loaded = Notification.objects.get(pk=self.notify(self.user)[0].pk)  # type: ignore[attr-defined]
+        loaded.is_read = True
+        with CaptureQueriesContext(connections['default']) as captured:
+            loaded.save()
+        self.assertFalse([
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and f'"{Notification._meta.db_table}"' in query['sql']
+        ])
+        self.assertUnread(self.user, 0)
+
+    def test_save_after_refresh_uses_the_refreshed_state(self):
+        first, _ = self.notify(self.user, 2)
+        loaded = Notification.objects.get(pk=first.pk)  # type: ignore[attr-defined]
+        inbox.mark_read(self.user.id, [first.id])
+        loaded.refresh_from_db()
+        loaded.title = 'Edited'
+        loaded.save()
+        self.assertUnread(self.user, 1)
+
+    def test_bulk_delete_adjusts_counters_and_writes_tombstones(self):
+        unread = self.notify(self.user, 2) + self.notify(self.other, 1)
+        read = self.notify(self.user, is_read=True)
+        kept = self.notify(self.user, title='Keep')
+        self.assertEqual(inbox.delete(Notification.objects.filter(title='Hello')), 4)  # type: ignore[attr-defined]
+        self.assertUnread(self.user, 1)
+        self.assertUnread(self.other, 0)
+        self.assertEqual(
+            set(Tombstone.objects.filter(model='notification').values_list('object_id', 'user_id')),  # type: ignore[attr-defined]
+            {(n.id, n.user_id) for n in unread + read},
+        )
+        self.assertTrue(Notification.objects.filter(pk=kept[0].pk).exists())  # type: ignore[attr-defined]
+
+    def test_prune_deletes_old_read_notifications_only(self):
+        old_read = self.notify(self.user, is_read=True)
+        old_unread = self.notify(self.user)
+        self.notify(self.user, is_read=True)
+        Notification.objects.filter(pk__in=[old_read[0].pk, old_unread[0].pk]).update(  # type: ignore[attr-defined]
+            created_at=timezone.now() - timedelta(days=90)
+        )
+        self.assertEqual(inbox.prune(timezone.now() - timedelta(days=30)), 1)
+        self.assertFalse(Notification.objects.filter(pk=old_read[0].pk).exists())  # type: ignore[attr-defined]
+        self.assertTrue(Tombstone.objects.filter(model='notification', object_id=old_read[0].pk).exists())  # type: ignore[attr-defined]
+        self.assertUnread(self.user, 1)
+
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Every registered changelist runs a fixed number of queries however many
+    rows are on the page: list_select_related covers the related columns and
+    EstimatedCountPaginator replaces the full COUNT(*).
+    """
+
+    MAX_QUERIES = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        queryplans.seed(100, batch_size=100)
+        cls.admin = User.objects.create_superuser(username='admin', email='', password='!', phone='+10000000000')  # type: ignore[attr-defined]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        for model in admin.site._registry:
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            with self.subTest(url=url), CaptureQueriesContext(connections['default']) as captured:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(captured), self.MAX_QUERIES,
+                    '\n'.join(query['sql'] for query in captured.captured_queries)
+                )
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'], THROTTLE_ENABLED=False)
+class ReplicaRoutingTests(TransactionTestCase):
+    """replica_test mirrors the test database, so routing is observable per connection."""
+
+    databases = {'default', 'replica_test'}
+
+    def setUp(self):
+        cache.clear()
+        routers._replica_health.clear()
+        self.user = User.objects.create_user(username='reader', phone='+10000000001', password='!')  # type: ignore[attr-defined]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def deal_reads(self, alias, request):
+        with CaptureQueriesContext(connections[alias]) as captured:
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in captured.captured_queries if Deal._meta.db_table in query['sql']]
+
+    def list_deals(self):
+        return self.client.get(reverse('customer-deals'))
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertTrue(self.deal_reads('replica_test', self.list_deals))
+        self.assertFalse(self.deal_reads('default', self.list_deals))
+
+    def test_write_pins_user_to_primary(self):
+        self.assertEqual(self.client.put(reverse('user-preferences'), ['food'], format='json').status_code, 200)
+        self.assertTrue(routers.is_pinned(self.user.id))
+        self.assertFalse(self.deal_reads('replica_test', self.list_deals))
+        self.assertTrue(self.deal_reads('default', self.list_deals))
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch('api.routers._probe', return_value=False):
+            self.assertIsNone(routers.choose_replica())
+            self.assertTrue(self.deal_reads('default', self.list_deals))
+
+    def test_reads_inside_atomic_block_use_primary(self):
+        token = routers._read_alias.set('replica_test')
+        try:
+            with transaction.atomic():
+                self.assertIsNone(routers.ReplicaRouter().db_for_read(Deal))
+            self.assertEqual(routers.ReplicaRouter().db_for_read(Deal), 'replica_test')
+        finally:
+            routers._read_alias.reset(token)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(routers.ReplicaRouter().allow_migrate('replica_test', 'api'))
+        self.assertTrue(routers.ReplicaRouter().allow_migrate('default', 'api'))
+
+
+class QueryPlanRegressionTests(TransactionTestCase):
+    """
+    EXPLAIN the queries of every list endpoint (api.queryplans.ENDPOINTS)
+    against seeded data and compare them with query_plan_baseline.json. A
+    plan fails when it sequentially scans a large table the baseline does not
+    already allow, or when its estimated cost exceeds the baseline by more
+    than TOLERANCE; endpoints and queries missing from the baseline fail too.
+    After reviewing an intended change, rerun with UPDATE_QUERY_PLAN_BASELINE=1
+    and commit the baseline.
+    """
+
+    BASELINE = Path(settings.BASE_DIR) / 'query_plan_baseline.json'
+    SEED_DEALS = 20000  # Baseline costs are only comparable for the same seed size
+    TOLERANCE = 0.25
+
+    def test_list_endpoints_are_catalogued(self):
+        missing = queryplans.list_url_names() - {endpoint.url_name for endpoint in queryplans.ENDPOINTS} - queryplans.UNCATALOGUED
+        self.assertFalse(missing, 'list endpoints missing from api.queryplans.ENDPOINTS')
+
+    def test_query_plans_within_baseline(self):
+        baseline = json.loads(self.BASELINE.read_text()) if self.BASELINE.exists() else {}
+        queryplans.seed(self.SEED_DEALS)
+        sample = queryplans.Sample()
+        users = {'customer': sample.customer, 'owner': sample.owner}
+        rows = queryplans.table_rows()
+
+        current, failures = {}, []
+        for endpoint in queryplans.ENDPOINTS:
+            status_code, queries = queryplans.capture(endpoint, sample, users)
+            if status_code >= 400:
+                failures.append(f'{endpoint.name}: HTTP {status_code}')
+            known_queries = baseline.get(endpoint.name)
+            if known_queries is None:
+                failures.append(f'{endpoint.name}: no baseline entry')
+                known_queries = {}
+            entries = current[endpoint.name] = {}
+            for sql, _ in queries:
+                key = queryplans.query_key(sql)
+                summary = queryplans.summarize(queryplans.explain(sql, analyze=False), rows)
+                entries[key] = {'cost': round(summary['cost'], 1), 'seq_scans': summary['seq_scans'], 'sql': sql[:500]}
+                known = known_queries.get(key)
+                if known is None:
+                    failures.append(f"{endpoint.name} [{key}]: query not in the baseline\n  {sql[:500]}")
+                    continue
+                new_scans = set(summary['seq_scans']) - set(known['seq_scans'])
+                if new_scans:
+                    failures.append(f"{endpoint.name} [{key}]: sequential scan of {', '.join(sorted(new_scans))}\n  {sql[:500]}")
+                if summary['cost'] > known['cost'] * (1 + self.TOLERANCE):
+                    failures.append(
+                        f"{endpoint.name} [{key}]: estimated cost {summary['cost']:.0f} exceeds baseline {known['cost']:.0f}\n  {sql[:500]}"
+                    )
+
+        if os.environ.get('UPDATE_QUERY_PLAN_BASELINE') == '1':
+            self.BASELINE.write_text(json.dumps(current, indent=2, sort_keys=True) + '\n')
+            return
+        self.assertFalse(failures, '\n'.join(failures))
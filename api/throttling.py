@@ -0,0 +1,112 @@
+"""
+Token-bucket throttling for public endpoints.
+
+ThrottleMiddleware runs before sessions and authentication, so rejected
+requests never touch the database. Rules in settings.THROTTLE_RULES are keyed
+by URL name and may limit per client IP ('ip') and per JWT user ('user', read
+from the signed token without a database lookup). A 'default' rule applies to
+every other API route. Buckets live in the THROTTLE_CACHE_ALIAS cache, which
+may be local memory (per worker) or database-backed (shared).
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from prometheus_client import Counter
+from rest_framework import status
+
+from .utils import get_client_ip
+
+throttled_requests = Counter(
+    'minglin_throttled_requests_total',
+    'Requests rejected by ThrottleMiddleware',
+    ['route', 'scope'],
+)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'120/m' -> (capacity 120, refill 2.0 tokens per second)."""
+    count, period = rate.split('/')
+    seconds = PERIODS[period.strip()[0].lower()]
+    return int(count), int(count) / seconds
+
+
+def consume(cache, key, rate, now):
+    """
+    Take one token from the bucket at key. Returns seconds to wait, or 0 if allowed.
+    Read-modify-write without a lock: concurrent requests may overshoot by a token or two.
+    """
+    capacity, refill = parse_rate(rate)
+    tokens, last = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - last) * refill)
+    if tokens < 1:
+        return (1 - tokens) / refill
+    cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / refill) + 1)
+    return 0
+
+
+def jwt_user_id(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not header.startswith('Bearer '):
+        return None
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+    try:
+        return AccessToken(header[len('Bearer '):]).get(settings.SIMPLE_JWT['USER_ID_CLAIM'])
+    except TokenError:
+        return None
+
+
+class ThrottleMiddleware:
+    """
+    Reject requests over their route's rate with 429 before any view or DB work.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(settings, 'THROTTLE_ENABLED', True):
+            wait = self.check(request)
+            if wait:
+                response = JsonResponse(
+                    {'detail': 'Request was throttled.', 'retry_after': math.ceil(wait)},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+        return self.get_response(request)
+
+    def check(self, request):
+        try:
+            route = resolve(request.path_info).url_name
+        except Resolver404:
+            return 0
+        rules = getattr(settings, 'THROTTLE_RULES', {})
+        rule = rules.get(route)
+        if rule is None:
+            if not request.path_info.startswith('/api/'):
+                return 0
+            rule, route = rules.get('default'), 'default'
+        if not rule:
+            return 0
+
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+        now = time.time()
+        for scope, rate in rule.items():
+            if not rate:
+                continue
+            ident = get_client_ip(request) if scope == 'ip' else jwt_user_id(request)
+            if ident is None:
+                continue
+            wait = consume(cache, f'throttle:{route}:{scope}:{ident}', rate, now)
+            if wait:
+                throttled_requests.labels(route=route, scope=scope).inc()
+                return wait
+        return 0
+
+# See README.md and inline comments for documentation.
@@ -0,0 +1,133 @@
+"""
+Slippy-map tiles of active deals for the map screen.
+
+A tile (z, x, y) covers a fixed Web Mercator square, so every client panning
+over the same area asks for the same keys and hits the cache. Tiles below
+TILE_CLUSTER_ZOOM return per-cell counts instead of individual deals.
+
+Cached tiles are invalidated when a deal (or its business) inside them is
+saved or deleted: the deal's tile at every zoom level is dropped with one
+delete_many. Bulk queryset updates bypass signals, so tiles also expire after
+TILE_CACHE_SECONDS, or sooner when a deal in them ends. Invalidation only
+reaches every worker through a shared cache (system check api.W001).
+"""
+import math
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import Deal
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) in degrees."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_for(lon, lat, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return z, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cache_key(z, x, y):
+    return f'deal-tile:{z}:{x}:{y}'
+
+
+def invalidate_points(points):
+    """Drop the cached tiles containing any of points at every zoom level."""
+    max_zoom = getattr(settings, 'TILE_MAX_ZOOM', 18)
+    keys = {
+        cache_key(*tile_for(point.x, point.y, z))
+        for point in points if point is not None
+        for z in range(max_zoom + 1)
+    }
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def _active_in(bounds):
+    return Deal.objects.filter(  # type: ignore[attr-defined]
+        is_active=True, end_time__gte=timezone.now(), location__intersects=Polygon.from_bbox(bounds, srid=4326)
+    )
+
+
+def _deals(bounds, limit):
+    rows = list(_active_in(bounds).values_list(
+        'id', 'title', 'category', 'location', 'end_time', 'business_id', 'business_summary__name'
+    ).order_by('id')[:limit + 1])
+    deals = [
+        {
+            'id': deal_id,
+            'title': title,
+            'category': category,
+            'lat': location.y,
+            'lon': location.x,
+            'end_time': end_time,
+            'business': {'id': business_id, 'name': business_name},
+        }
+        for deal_id, title, category, location, end_time, business_id, business_name in rows[:limit]
+    ]
+    return deals, len(rows) > limit
+
+
+def _clusters(bounds, grid):
+    """Count deals per cell of a grid x grid split of the tile (one GROUP BY query)."""
+    west, south, east, north = bounds
+    cell_w, cell_h = (east - west) / grid, (north - south) / grid
+    queryset = _active_in(bounds)
+    sql, params = queryset.values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT LEAST(FLOOR((ST_X(d.location::geometry) - %s) / %s), %s) AS cx,
+                   LEAST(FLOOR((ST_Y(d.location::geometry) - %s) / %s), %s) AS cy,
+                   COUNT(*), AVG(ST_Y(d.location::geometry)), AVG(ST_X(d.location::geometry)),
+                   MIN(d.end_time)
+            FROM {Deal._meta.db_table} d WHERE d.id IN ({sql})
+            GROUP BY cx, cy
+            """,
+            [west, cell_w, grid - 1, south, cell_h, grid - 1, *params]
+        )
+        rows = cursor.fetchall()
+    return [
+        {'count': count, 'lat': float(lat), 'lon': float(lon), 'ends_at': ends_at}
+        for _, _, count, lat, lon, ends_at in rows
+    ]
+
+
+def render_tile(z, x, y):
+    """Build the tile payload and the number of seconds it may be cached."""
+    bounds = tile_bounds(z, x, y)
+    payload = {'z': z, 'x': x, 'y': y}
+    if z < getattr(settings, 'TILE_CLUSTER_ZOOM', 12):
+        payload['clusters'] = _clusters(bounds, getattr(settings, 'TILE_CLUSTER_GRID', 8))
+        ends = [cluster.pop('ends_at') for cluster in payload['clusters']]
+    else:
+        payload['deals'], payload['truncated'] = _deals(bounds, getattr(settings, 'TILE_MAX_DEALS', 500))
+        ends = [deal['end_time'] for deal in payload['deals']]
+
+    timeout = getattr(settings, 'TILE_CACHE_SECONDS', 300)
+    if ends:
+        # Expire no later than the first deal in the tile ends
+        timeout = max(1, min(timeout, int((min(ends) - timezone.now()).total_seconds()) + 1))
+    return payload, timeout
+
+
+def get_tile(z, x, y):
+    key = cache_key(z, x, y)
+    payload = cache.get(key)
+    if payload is None:
+        payload, timeout = render_tile(z, x, y)
+        cache.set(key, payload, timeout=timeout)
+    return payload
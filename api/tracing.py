@@ -0,0 +1,190 @@
+"""
+Adaptive trace sampling.
+
+AdaptiveSampler decides which requests are traced:
+- TRACE_DROP_PATHS (healthcheck, /metrics) are never traced;
+- routes in TRACE_ROUTE_RATES (hot reads) are traced at their own low rate,
+  everything else at TRACE_DEFAULT_RATE;
+- a route that just served a slow (SLOW_REQUEST_THRESHOLD) or failed request,
+  or whose recent latency has regressed past TRACE_REGRESSION_FACTOR times its
+  baseline, is traced at TRACE_BOOST_RATE for TRACE_BOOST_SECONDS.
+
+TracingMiddleware feeds every request's latency to the sampler. Sentry uses it
+through `traces_sampler`; since Sentry decides when a transaction starts, slow
+and failed requests are caught by the boost that follows them (error events
+are reported regardless). The local SpanRecorder decides when the root span
+ends, so it keeps every slow or failed trace. It writes JSON lines to
+TRACE_FILE, e.g. to inspect traces in tests without a network.
+"""
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+# Fast and slow exponentially weighted moving averages of route latency
+FAST_ALPHA = 0.2
+SLOW_ALPHA = 0.01
+MIN_OBSERVATIONS = 50
+
+
+@lru_cache(maxsize=2048)
+def route_for(path):
+    try:
+        return resolve(path).url_name or path
+    except Resolver404:
+        return None
+
+
+class AdaptiveSampler:
+    def __init__(self):
+        self.latency = {}  # route -> [fast_ewma, slow_ewma, count]
+        self.boosted_until = {}  # route -> monotonic deadline
+
+    def rate(self, path):
+        if any(path.startswith(prefix) for prefix in getattr(settings, 'TRACE_DROP_PATHS', ())):
+            return 0.0
+        route = route_for(path)
+        if self.boosted_until.get(route, 0) > time.monotonic():
+            return getattr(settings, 'TRACE_BOOST_RATE', 1.0)
+        return getattr(settings, 'TRACE_ROUTE_RATES', {}).get(route, getattr(settings, 'TRACE_DEFAULT_RATE', 0.1))
+
+    def observe(self, path, duration, error=False):
+        """Record a finished request; boost its route if it was slow, failed or regressing."""
+        route = route_for(path)
+        if route is None:
+            return
+        stats = self.latency.setdefault(route, [duration, duration, 0])
+        stats[0] += FAST_ALPHA * (duration - stats[0])
+        stats[1] += SLOW_ALPHA * (duration - stats[1])
+        stats[2] += 1
+        regressed = (
+            stats[2] >= MIN_OBSERVATIONS
+            and stats[0] > stats[1] * getattr(settings, 'TRACE_REGRESSION_FACTOR', 2.0)
+        )
+        if error or regressed or duration >= getattr(settings, 'SLOW_REQUEST_THRESHOLD', 1.0):
+            self.boosted_until[route] = time.monotonic() + getattr(settings, 'TRACE_BOOST_SECONDS', 300)
+
+    def should_keep(self, path, duration, error=False, sampled=None):
+        """Tail decision for locally recorded traces: always keep slow or failed ones."""
+        rate = self.rate(path)
+        if rate == 0:
+            return False
+        if error or duration >= getattr(settings, 'SLOW_REQUEST_THRESHOLD', 1.0):
+            return True
+        return sampled if sampled is not None else random.random() < rate
+
+
+sampler = AdaptiveSampler()
+
+
+def traces_sampler(sampling_context):
+    """sentry_sdk traces_sampler: follow the parent's decision, else the adaptive rate."""
+    if sampling_context.get('parent_sampled') is not None:
+        return float(sampling_context['parent_sampled'])
+    environ = sampling_context.get('wsgi_environ') or {}
+    path = environ.get('PATH_INFO')
+    if path is None:
+        scope = sampling_context.get('asgi_scope') or {}
+        path = scope.get('path')
+    if path is None:
+        return getattr(settings, 'TRACE_DEFAULT_RATE', 0.1)
+    return sampler.rate(path)
+
+
+class SpanRecorder:
+    """
+    Minimal OpenTelemetry-style recorder: nested spans share a trace id, and the
+    finished trace is appended to `path` as one JSON object per span.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.current = ContextVar('current_span', default=None)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = self.current.get()
+        span = {
+            'trace_id': parent['trace_id'] if parent else secrets.token_hex(16),
+            'span_id': secrets.token_hex(8),
+            'parent_id': parent['span_id'] if parent else None,
+            'name': name,
+            'attributes': attributes,
+            'start': time.time(),
+            'children': [],
+        }
+        token = self.current.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span['error'] = repr(e)
+            raise
+        finally:
+            self.current.reset(token)
+            span['duration_ms'] = round((time.time() - span['start']) * 1000, 3)
+            if parent:
+                parent['children'].append(span)
+
+    def flush(self, root):
+        """Write a finished root span and its descendants."""
+        lines = []
+        pending = [root]
+        while pending:
+            span = pending.pop()
+            pending.extend(span['children'])
+            lines.append(json.dumps({key: value for key, value in span.items() if key != 'children'}, default=str))
+        with self.lock, open(self.path, 'a') as out:
+            out.write('\n'.join(lines) + '\n')
+
+
+@lru_cache(maxsize=None)
+def recorder():
+    path = getattr(settings, 'TRACE_FILE', '')
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SpanRecorder(path)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Child span of the current request's trace; a no-op without TRACE_FILE."""
+    local = recorder()
+    if local is None or local.current.get() is None:
+        yield None
+        return
+    with local.span(name, **attributes) as current:
+        yield current
+
+
+class TracingMiddleware:
+    """
+    Feed request latency to the adaptive sampler and, when TRACE_FILE is set,
+    record a root span per request for the local SpanRecorder.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        local = recorder()
+        start = time.perf_counter()
+        if local is None:
+            response = self.get_response(request)
+        else:
+            with local.span('http.request', method=request.method, path=request.path) as root:
+                response = self.get_response(request)
+                root['attributes']['status'] = response.status_code
+        duration = time.perf_counter() - start
+        error = response.status_code >= 500
+        sampler.observe(request.path, duration, error)
+        if local is not None and sampler.should_keep(request.path, duration, error):
+            local.flush(root)
+        return response
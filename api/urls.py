@@ -19,13 +19,21 @@ urlpatterns = [
     # Deals customer/public endpoints
     path('deals/customer/', views.CustomerDealsView.as_view(), name='customer-deals'),
     path('deals/customer/<int:pk>/', views.CustomerDealDetailView.as_view(), name='customer-deal-detail'),
+    path('deals/feed/', views.DealFeedView.as_view(), name='deal-feed'),
+    path('deals/tiles/<int:z>/<int:x>/<int:y>/', views.DealTileView.as_view(), name='deal-tile'),
+    path('deals/import/', views.DealImportView.as_view(), name='deal-import'),
+    path('deals/export/', views.DealExportView.as_view(), name='deal-export'),
     path('deals/my/', views.MyDealsView.as_view(), name='my-deals'),
+    # Incremental sync endpoints for mobile clients
+    path('deals/sync/', views.DealSyncView.as_view(), name='deal-sync'),
+    path('notifications/sync/', views.NotificationSyncView.as_view(), name='notification-sync'),
     # User profile endpoints (me, preferences, location)
     path('users/me/', views.MeView.as_view(), name='me'),
     path('users/preferences/', views.UserPreferencesView.as_view(), name='user-preferences'),
     path('users/location/', views.UserLocationView.as_view(), name='user-location'),
     # Analytics endpoints
     path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('analytics/export/', views.AnalyticsExportView.as_view(), name='analytics-export'),
     # Search endpoints
     path('deals/search/', views.DealSearchView.as_view(), name='deal-search'),
     # Verified businesses directory
@@ -37,6 +45,7 @@ urlpatterns = [
     path('businesses/logo/', views.BusinessLogoUploadView.as_view(), name='business-logo-upload'),
     # Deal interaction tracking
     path('deals/<int:deal_id>/interaction/', views.record_deal_interaction, name='record-deal-interaction'),
+    path('deals/interactions/batch/', views.record_deal_interactions_batch, name='record-deal-interactions-batch'),
     # Customer request endpoints
     path('business/requests/', views.BusinessRequestNotificationsView.as_view(), name='business-requests'),
     # Platform statistics endpoint
@@ -1,5 +1,4 @@
 from custom_environs import environment
-import requests
 import random
 import string
 import time
@@ -26,17 +25,7 @@ def notify(phone_number, msg):
     sender_id = os.getenv('PROBASE_SENDER_ID')
     url = os.getenv('PROBASE_URL')
     source = os.getenv('PROBASE_SOURCE')
-    
-    # Check for specific issues
-    if username:
-        logger.info(f"Username ends with: '{username[-2:]}' (should be '$$')")
-    if password:
-        logger.info(f"Password ends with: '{password[-2:]}' (should be '$$')")
-    
-    # Log credentials for debugging (mask password partially)
-    masked_password = f"{password[:4]}***{password[-2:]}" if password and len(password) > 6 else "***"
-    logger.info(f"Probase credentials - Username: {username}, Password: {masked_password}, SenderID: {sender_id}, URL: {url}")
-  
+
     payload = {
         "username": username,
         "password": password,
@@ -47,16 +36,37 @@ def notify(phone_number, msg):
         "msg_ref": msg_ref
     }
 
+    import requests  # Imported on first SMS rather than at startup
+
     try:
         response = requests.post(url, json=payload, headers=headers)
         results = response.text
-        logger.info(f"SMS sent to {phone_number}: {results}")
-        logger.info(f"SMS response status code: {response.status_code}")
+        logger.info('SMS sent to %s: status %s', phone_number, response.status_code)
+        logger.debug('SMS gateway response for %s: %s', phone_number, results)
         return results
     except Exception as e:
-        logger.error(f"Error sending SMS to {phone_number}: {str(e)}")
+        logger.error('Error sending SMS to %s: %s', phone_number, e)
         return None
 
+def get_client_ip(request):
+    """
+    Resolve the client IP behind TRUSTED_PROXY_COUNT proxies (nginx). Each
+    proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is the rightmost entry not added by one of
+    the trusted proxies; anything left of it is client-controlled. Without
+    trusted proxies REMOTE_ADDR is the client.
+    """
+    from django.conf import settings
+
+    trusted = getattr(settings, 'TRUSTED_PROXY_COUNT', 1)
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if trusted and x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(',')]
+        ip = addresses[-min(trusted, len(addresses))]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
 def extract_gps_from_image(image_file):
     """
     Extract GPS coordinates from an uploaded image file.
@@ -118,9 +128,9 @@ def extract_gps_from_image(image_file):
         if lon_ref == 'W':
             longitude = -longitude
         
-        logger.info(f"GPS coordinates extracted from image: {latitude}, {longitude}")
+        logger.info('GPS coordinates extracted from image: %s, %s', latitude, longitude)
         return latitude, longitude
         
     except Exception as e:
-        logger.error(f"Error extracting GPS from image: {str(e)}")
+        logger.error('Error extracting GPS from image: %s', e)
         return None, None
\ No newline at end of file
@@ -2,23 +2,44 @@ from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import exception_handler
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.pagination import CursorPagination
 from django.contrib.auth import authenticate
-from .models import User, Business, Deal, SavedDeal, Notification, DealAnalytics, OTP, CustomerRequest
+from .models import User, Business, Deal, SavedDeal, Notification, DealAnalytics, CustomerRequest, Tombstone, PlatformStats, UserAgent
 from .serializers import (
-    RegisterSerializer, UserSerializer, BusinessSerializer, DealSerializer,
-    SavedDealSerializer, NotificationSerializer, DealAnalyticsSerializer,
-    PhoneAuthSerializer, OTPVerificationSerializer, CustomerRequestSerializer
+    RegisterSerializer, UserSerializer, BusinessSerializer, DealSerializer, DealListSerializer,
+    SavedDealSerializer, NotificationSerializer, NotificationListSerializer, DealAnalyticsSerializer,
+    PhoneAuthSerializer, OTPVerificationSerializer, CustomerRequestSerializer,
+    DealInteractionBatchSerializer
 )
 from rest_framework import viewsets, generics, status, permissions, serializers
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
-from django.db.models import Q, Count, F, Sum
+from django.db.models import Q, Count
+from django.db import router, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 import logging
 from django.http import JsonResponse
 from datetime import datetime, timedelta
-from api.utils import notify
+from api.utils import notify, get_client_ip, extract_gps_from_image
+from api.sync import SyncCursor, InvalidCursor, sync_changes
+from api.routers import ReplicaReadMixin
+from api.interactions import record_interactions
+from api.counters import totals as counter_totals
+from api.otp import otp_backend
+from api.log import sample
+from api.ranking import FeedCursor, rank_feed
+from api.tiles import get_tile
+from api.tracing import span
+from api import inbox
+from api.bulk import (
+    ANALYTICS_EXPORT_COLUMNS, EXPORT_COLUMNS, FORMATS as IMPORT_FORMATS, csv_response, detect_format,
+    export_analytics_rows, export_deal_rows, import_deals, ndjson_response, queue_announcement,
+)
+from django.conf import settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView as SimpleJWTTokenRefreshView
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
@@ -52,11 +73,12 @@ class SendOTPView(generics.GenericAPIView):
         phone = serializer.validated_data['phone']
         role = serializer.validated_data.get('role', 'user')
         
-        logger.info(f"OTP request for phone: {phone}, role: {role}")
+        logger.info('OTP request for phone: %s, role: %s', phone, role)
         
         try:
-            # Generate OTP
-            otp = OTP.generate_otp(phone)
+            # Generate OTP (stored hashed by the configured backend, see api/otp.py)
+            otp_code = otp_backend().issue(phone)
+            valid_minutes = settings.OTP_TTL_SECONDS // 60
             
             # Clean phone number for SMS (remove + if present, the notify function will add 26 prefix)
             clean_phone = phone
@@ -64,18 +86,18 @@ class SendOTPView(generics.GenericAPIView):
                 clean_phone = phone[1:]  # Remove + if present
             
             # Send SMS (notify function will add 26 prefix automatically)
-            sms_result = notify(clean_phone, f'Your Minglin OTP is {otp.otp_code}. Valid for 10 minutes.')
-            logger.info(f"OTP generated for {phone}: {otp.otp_code}, SMS result: {sms_result}")
+            sms_result = notify(clean_phone, f'Your Minglin OTP is {otp_code}. Valid for {valid_minutes} minutes.')
+            logger.info('OTP generated for %s, SMS result: %s', phone, sms_result)
             
             return Response({
                 'message': 'OTP sent successfully',
                 'phone': phone,
                 'role': role,
-                'otp_code': otp.otp_code  # Remove this in production
+                'otp_code': otp_code  # Remove this in production
             })
             
         except Exception as e:
-            logger.error(f"OTP generation failed: {str(e)}")
+            logger.error('OTP generation failed: %s', e)
             return Response(
                 {'error': 'Failed to send OTP. Please try again.'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -98,11 +120,11 @@ class VerifyOTPView(generics.GenericAPIView):
         first_name = serializer.validated_data.get('first_name', '')
         last_name = serializer.validated_data.get('last_name', '')
         
-        logger.info(f"OTP verification attempt for phone: {phone}")
+        logger.info('OTP verification attempt for phone: %s', phone)
         
         try:
             # Verify OTP
-            otp, error = OTP.verify_otp(phone, otp_code)
+            error = otp_backend().verify(phone, otp_code)
             
             if error:
                 return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
@@ -132,7 +154,7 @@ class VerifyOTPView(generics.GenericAPIView):
             refresh = RefreshToken.for_user(user)
             access_token = refresh.access_token
             
-            logger.info(f"User authenticated successfully: {user.id}")
+            logger.info('User authenticated successfully: %s', user.id)
             
             return Response({
                 'message': 'Authentication successful',
@@ -143,7 +165,7 @@ class VerifyOTPView(generics.GenericAPIView):
             })
             
         except Exception as e:
-            logger.error(f"OTP verification failed: {str(e)}")
+            logger.error('OTP verification failed: %s', e)
             return Response(
                 {'error': 'Authentication failed'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -207,7 +229,6 @@ class UserLocationView(generics.UpdateAPIView):
         longitude = request.data.get('longitude') or request.data.get('lon')
         address = request.data.get('address')
         if latitude is not None and longitude is not None:
-            from django.contrib.gis.geos import Point
             user.location = Point(float(longitude), float(latitude))
             if address:
                 # Optionally store address in preferences or a new field
@@ -232,14 +253,16 @@ class BusinessViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         business = serializer.save(owner_user=self.request.user)
         # Notify all users who want new_business notifications
-        for user in User.objects.filter(role='user'):
-            if user_wants_notification(user, 'new_business'):
-                Notification.objects.create(
-                    user=user,
-                    title='New Business Joined!',
-                    message=f'{business.name} has joined Minglin. Check out their deals!',
-                    notification_type='new_business',
-                )
+        audience = User.objects.filter(User.notification_audience('new_business'), role='user').values_list('id', flat=True)
+        inbox.deliver(
+            Notification(
+                user_id=user_id,
+                title='New Business Joined!',
+                message=f'{business.name} has joined Minglin. Check out their deals!',
+                notification_type='new_business',
+            )
+            for user_id in audience.iterator(chunk_size=1000)
+        )
         return business
 
     @action(detail=False, methods=['get', 'put'])
@@ -262,7 +285,7 @@ class BusinessViewSet(viewsets.ModelViewSet):
             serializer = BusinessSerializer(business, data=request.data, partial=True, context={'request': request})
             if serializer.is_valid():
                 serializer.save()
-                logger.info(f"Business profile updated: {business.id} by user {request.user.id}")
+                logger.info('Business profile updated: %s by user %s', business.id, request.user.id)
                 return Response(serializer.data)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -289,7 +312,7 @@ class DealViewSet(viewsets.ModelViewSet):
         if not serializer.validated_data.get('business'):
             businesses = Business.objects.filter(owner_user=self.request.user)  # type: ignore[attr-defined]
             if not businesses.exists():
-                logger.error(f"Deal creation failed - no business profile: {self.request.user.id}")
+                logger.error('Deal creation failed - no business profile: %s', self.request.user.id)
                 raise serializers.ValidationError('No business profile found')
             deal = serializer.save(business=businesses.first())
         else:
@@ -297,80 +320,26 @@ class DealViewSet(viewsets.ModelViewSet):
         
         # Try to extract GPS coordinates from image if no location is provided
         if deal.image and not deal.location:
-            from .utils import extract_gps_from_image
             lat, lon = extract_gps_from_image(deal.image)
             if lat is not None and lon is not None:
-                from django.contrib.gis.geos import Point
                 deal.location = Point(lon, lat)  # Note: Point takes (x, y) which is (lon, lat)
                 deal.save()
-                logger.info(f"GPS coordinates extracted from image for deal {deal.id}: {lat}, {lon}")
+                logger.info('GPS coordinates extracted from image for deal %s: %s, %s', deal.id, lat, lon)
         
         # If still no location and business has location, use business location as fallback
         if not deal.location and deal.business.location:
             deal.location = deal.business.location
             deal.save()
-            logger.info(f"Using business location as fallback for deal {deal.id}")
+            logger.info('Using business location as fallback for deal %s', deal.id)
         
-        logger.info(f"Deal created: {deal.id} by user {self.request.user.id}")
+        logger.info('Deal created: %s by user %s', deal.id, self.request.user.id)
         
-        # Send SMS notifications to all customers
-        try:
-            self.send_deal_notifications(deal)
-        except Exception as e:
-            logger.error(f"Failed to send deal notifications: {str(e)}")
+        # SMS and in-app notifications go out from the send_announcements worker
+        self.send_deal_notifications(deal)
     
     def send_deal_notifications(self, deal):
-        """Send SMS notifications to all customers about the new deal."""
-        from .utils import notify
-        
-        # Get all customer users
-        customers = User.objects.filter(role='user')  # type: ignore[attr-defined]
-        
-        # Create notification message
-        business_name = deal.business.name
-        deal_title = deal.title
-        cta_text = deal.cta if deal.cta else "Visit Store"
-        
-        customer_message = f"New promotion from {business_name}: {deal_title}. Open your Minglin app for details."
-        push_notification_msg = f"New promotion from {business_name}: {deal_title}."
-        
-        # Send SMS to each customer
-        notification_count = 0
-        for customer in customers:
-            try:
-                if not user_wants_notification(customer, 'new_deal'):
-                    continue
-                if customer.phone:
-                    # Clean phone number (remove + if present, notify function will add 26 prefix)
-                    clean_phone = customer.phone
-                    if customer.phone.startswith('+'):
-                        clean_phone = customer.phone[1:]
-                    
-                    notify(clean_phone, customer_message)
-                    Notification.objects.create(
-                        user=customer,
-                        title='New Deal!',
-                        message=push_notification_msg,
-                        notification_type='new_deal',
-                        related_deal=deal
-                    )
-                    notification_count += 1
-                    logger.info(f"SMS notification sent to {customer.phone} for deal {deal.id}")
-            except Exception as e:
-                logger.error(f"Failed to send SMS to {customer.phone}: {str(e)}")
-        
-        # Send confirmation message to business owner
-        if deal.business.contact_phone and notification_count > 0:
-            try:
-                business_message = f"Promotion notifications sent to {notification_count} customers"
-                clean_business_phone = deal.business.contact_phone
-                if deal.business.contact_phone.startswith('+'):
-                    clean_business_phone = deal.business.contact_phone[1:]
-                notify(clean_business_phone, business_message)
-            except Exception as e:
-                logger.error(f"Failed to send confirmation SMS to business: {str(e)}")
-        
-        logger.info(f"Deal notifications sent to {notification_count} customers")
+        """Queue the announcement to every customer who wants new deal alerts (see api/bulk.py)."""
+        queue_announcement(deal.business, [deal])
 
     def update(self, request, *args, **kwargs):
         """
@@ -379,10 +348,10 @@ class DealViewSet(viewsets.ModelViewSet):
         deal = self.get_object()
         business = Business.objects.filter(owner_user=request.user).first()  # type: ignore[attr-defined]
         if not business or deal.business != business:
-            logger.warning(f"Unauthorized deal update attempt: {deal.id} by user {request.user.id}")
+            logger.warning('Unauthorized deal update attempt: %s by user %s', deal.id, request.user.id)
             return Response({'message': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
         
-        logger.info(f"Deal updated: {deal.id} by user {request.user.id}")
+        logger.info('Deal updated: %s by user %s', deal.id, request.user.id)
         # Update fields
         for field, value in request.data.items():
             if hasattr(deal, field):
@@ -397,30 +366,35 @@ class DealViewSet(viewsets.ModelViewSet):
         deal = self.get_object()
         business = Business.objects.filter(owner_user=request.user).first()  # type: ignore[attr-defined]
         if not business or deal.business != business:
-            logger.warning(f"Unauthorized deal deletion attempt: {deal.id} by user {request.user.id}")
+            logger.warning('Unauthorized deal deletion attempt: %s by user %s', deal.id, request.user.id)
             return Response({'message': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
         
-        logger.info(f"Deal deleted: {deal.id} by user {request.user.id}")
-        # Notify users who saved this deal and want deal_removed notifications
-        for saved in deal.saved_by.all():
-            user = saved.user
-            if user_wants_notification(user, 'deal_removed'):
-                Notification.objects.create(
-                    user=user,
-                    title='Deal Removed',
-                    message=f'A deal you saved ("{deal.title}") has been removed.',
-                    notification_type='deal_removed',
-                    related_deal=deal
-                )
-        deal.delete()
+        logger.info('Deal deleted: %s by user %s', deal.id, request.user.id)
+        # Notify users who saved this deal and want deal_removed notifications.
+        # No related_deal: the deal is deleted next and would take the notifications with it.
+        audience = User.objects.filter(User.notification_audience('deal_removed'), saved_deals__deal=deal).values_list('id', flat=True)
+        inbox.deliver([
+            Notification(
+                user_id=user_id,
+                title='Deal Removed',
+                message=f'A deal you saved ("{deal.title}") has been removed.',
+                notification_type='deal_removed',
+            )
+            for user_id in audience
+        ])
+        with transaction.atomic():
+            # The deal's new_deal notifications reach its whole audience: delete them
+            # in bulk so the cascade does not run the per-row receivers for each one
+            inbox.delete(Notification.objects.filter(related_deal=deal))  # type: ignore[attr-defined]
+            deal.delete()
         return Response({'message': 'Deal removed'})
 
 # Public/customer deals endpoint
-class CustomerDealsView(generics.ListAPIView):
+class CustomerDealsView(ReplicaReadMixin, generics.ListAPIView):
     """
     List all active deals for customers, with optional location filtering (equivalent to getCustomerDeals in Node.js).
     """
-    serializer_class = DealSerializer
+    serializer_class = DealListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -428,7 +402,7 @@ class CustomerDealsView(generics.ListAPIView):
         queryset = Deal.objects.filter(  # type: ignore[attr-defined]
             is_active=True,
             end_time__gte=timezone.now()
-        ).select_related('business')
+        )
         
         # Filter by category if provided
         category = self.request.query_params.get('category')
@@ -451,10 +425,10 @@ class CustomerDealsView(generics.ListAPIView):
         return queryset
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        deals = list(self.get_queryset())
+        serializer = self.get_serializer(deals, many=True)
         data = serializer.data
-        logger.debug(f"CustomerDealsView response body: {data}")
+        logger.debug('CustomerDealsView response body: %s', data)
         
         # Calculate distances if user has location
         user_lat = request.query_params.get('lat')
@@ -468,41 +442,23 @@ class CustomerDealsView(generics.ListAPIView):
                     distance_km = user_location.distance(deal_location) * 111  # Convert to km
                     deal_data['distance'] = round(distance_km, 1)
         
-        # Record views for deals (if user is authenticated)
-        if request.user.is_authenticated:
-            for deal in queryset:
-                try:
-                    # Check if this user has already viewed this deal to avoid duplicate views
-                    existing_view = DealAnalytics.objects.filter(
-                        deal=deal,
-                        user=request.user,
-                        action_type='view'
-                    ).first()
-                    
-                    if not existing_view:
-                        # Create analytics record
-                        DealAnalytics.objects.create(
-                            deal=deal,
-                            user=request.user,
-                            action_type='view',
-                            ip_address=get_client_ip(request),
-                            user_agent=request.META.get('HTTP_USER_AGENT', '')
-                        )
-                        # Update deal views count using F() to avoid race conditions
-                        deal.views = F('views') + 1
-                        deal.save()
-                        # Refresh the deal object to get the updated count
-                        deal.refresh_from_db()
-                        logger.info(f"View recorded for deal {deal.id} by user {request.user.id}")
-                    else:
-                        logger.info(f"User {request.user.id} already viewed deal {deal.id}")
-                except Exception as e:
-                    logger.error(f"Failed to record view for deal {deal.id}: {str(e)}")
+        # Record first views for all listed deals in one statement (if user is authenticated).
+        # Ids come from the instances: ?fields= may leave `id` out of the response.
+        if request.user.is_authenticated and deals:
+            try:
+                record_interactions(
+                    request.user,
+                    [(deal.id, 'view', None) for deal in deals],
+                    ip_address=get_client_ip(request),
+                    agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
+                )
+            except Exception as e:
+                logger.error('Failed to record views for user %s: %s', request.user.id, e)
         
         return Response(data)
 
 # Public deal detail endpoint
-class CustomerDealDetailView(generics.RetrieveAPIView):
+class CustomerDealDetailView(ReplicaReadMixin, generics.RetrieveAPIView):
     """
     Get individual deal details for customers (public endpoint).
     """
@@ -528,41 +484,128 @@ class CustomerDealDetailView(generics.RetrieveAPIView):
         # Record view for this specific deal (if user is authenticated)
         if request.user.is_authenticated:
             try:
-                # Check if this user has already viewed this deal to avoid duplicate views
-                existing_view = DealAnalytics.objects.filter(
-                    deal=deal,
-                    user=request.user,
-                    action_type='view'
-                ).first()
-                
-                if not existing_view:
-                    # Create analytics record
-                    DealAnalytics.objects.create(
-                        deal=deal,
-                        user=request.user,
-                        action_type='view',
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', '')
-                    )
-                    # Update deal views count using F() to avoid race conditions
-                    deal.views = F('views') + 1
-                    deal.save()
-                    # Refresh the deal object to get the updated count
-                    deal.refresh_from_db()
-                    logger.info(f"View recorded for deal {deal.id} by user {request.user.id}")
-                else:
-                    logger.info(f"User {request.user.id} already viewed deal {deal.id}")
+                record_interactions(
+                    request.user,
+                    [(deal.id, 'view', None)],
+                    ip_address=get_client_ip(request),
+                    agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
+                )
             except Exception as e:
-                logger.error(f"Failed to record view for deal {deal.id}: {str(e)}")
+                logger.error('Failed to record view for deal %s: %s', deal.id, e)
         
         return Response(data)
 
+# Personalised deal feed
+class DealFeedView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Deals near `lat`/`lon` (or the user's saved location) ranked by distance,
+    preferred categories, recency, CTR and what the user already saved or viewed
+    (see api/ranking.py). Paginate with the returned `cursor`.
+    """
+    serializer_class = DealListSerializer
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            cursor = FeedCursor.decode(request.query_params.get('cursor'))
+        except InvalidCursor as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page_size = min(int(request.query_params.get('limit', settings.FEED_PAGE_SIZE)), settings.FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'message': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lat = request.query_params.get('lat')
+        lon = request.query_params.get('lon')
+        if lat and lon:
+            point = Point(float(lon), float(lat), srid=4326)
+        else:
+            point = getattr(request.user, 'location', None)
+
+        with span('feed.rank', page_size=page_size):
+            deal_ids, scores, distances, next_cursor, has_more = rank_feed(request.user, point, cursor, max(page_size, 1))
+        deals = Deal.objects.in_bulk(deal_ids)  # type: ignore[attr-defined]
+        results = []
+        for deal_id, deal_score, distance_km in zip(deal_ids, scores, distances):
+            if deal_id not in deals:
+                continue
+            item = self.get_serializer(deals[deal_id]).data
+            item['score'] = round(deal_score, 4)
+            if point is not None:
+                item['distance'] = round(distance_km, 1)
+            results.append(item)
+        return Response({
+            'results': results,
+            'cursor': next_cursor.encode() if next_cursor else None,
+            'has_more': has_more,
+        })
+
+# Map tiles of active deals
+class DealTileView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Active deals in slippy-map tile z/x/y, or clustered counts below
+    TILE_CLUSTER_ZOOM. Tiles are cached and invalidated when a deal in them
+    changes (see api/tiles.py).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, z, x, y):
+        if z > settings.TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            return Response({'message': 'Tile out of range'}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(get_tile(z, x, y))
+        response['Cache-Control'] = f'public, max-age={settings.TILE_CLIENT_MAX_AGE}'
+        return response
+
+# Bulk deal import for merchants
+class DealImportView(generics.GenericAPIView):
+    """
+    Create many deals from an uploaded CSV or JSON Lines `file` (see api/bulk.py).
+    Rows are validated as they are read; invalid rows are reported by line.
+    Pass `dry_run=1` to validate only and `notify=0` to skip customer notifications.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        businesses = list(Business.objects.filter(owner_user=request.user).order_by('id'))  # type: ignore[attr-defined]
+        if not businesses:
+            return Response({'message': 'No business profile found'}, status=status.HTTP_400_BAD_REQUEST)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'message': 'Upload a CSV or JSON Lines file as `file`'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('type') or detect_format(upload.name, upload.content_type or '')
+        if fmt not in IMPORT_FORMATS:
+            return Response({'message': 'type must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = import_deals(
+            businesses, upload, fmt,
+            notify_customers=request.query_params.get('notify', '1') not in ('0', 'false'),
+            dry_run=request.query_params.get('dry_run') in ('1', 'true'),
+        )
+        logger.info('Deal import by user %s: %s created, %s errors', request.user.id, result['created'], result['error_count'])
+        if result['created'] and not result['dry_run']:
+            return Response(result, status=status.HTTP_201_CREATED)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST if result['error_count'] else status.HTTP_200_OK)
+
+# Streaming CSV export of a merchant's deals with their counters
+class DealExportView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Stream the caller's deals and their views, clicks and saves as CSV.
+    The columns can be imported again through deals/import/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        businesses = Business.objects.filter(owner_user=request.user)  # type: ignore[attr-defined]
+        rows = export_deal_rows(businesses, using=router.db_for_read(Deal))
+        return csv_response(f"deals-{timezone.now():%Y%m%d}.csv", EXPORT_COLUMNS, rows)
+
 # My deals endpoint
 class MyDealsView(generics.ListAPIView):
     """
     List deals for the current user's business (equivalent to getMyDeals in Node.js).
     """
-    serializer_class = DealSerializer
+    serializer_class = DealListSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -573,16 +616,49 @@ class MyDealsView(generics.ListAPIView):
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         data = serializer.data
-        logger.debug(f"MyDealsView response body: {data}")
+        logger.debug('MyDealsView response body: %s', data)
         return Response(data)
 
+def sync_response(request, queryset, tombstones, serializer_class):
+    """
+    Shared body of the incremental sync endpoints (see api/sync.py).
+    """
+    try:
+        cursor = SyncCursor.decode(request.query_params.get('since'))
+    except InvalidCursor as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    changed, deleted, next_cursor, has_more, reset = sync_changes(queryset, tombstones, cursor)
+    return Response({
+        'results': serializer_class(changed, many=True, context={'request': request}).data,
+        'deleted': deleted,
+        'cursor': next_cursor.encode(),
+        'has_more': has_more,
+        'reset': reset,  # Client must discard its local copy before applying results
+    })
+
+# Incremental deal sync for mobile clients
+class DealSyncView(generics.GenericAPIView):
+    """
+    Return deals created, updated or deleted since the `since` cursor.
+    Without a cursor, returns a snapshot of the currently active deals.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        queryset = Deal.objects.select_related('business')  # type: ignore[attr-defined]
+        if not request.query_params.get('since'):
+            queryset = queryset.filter(is_active=True, end_time__gte=timezone.now())
+        tombstones = Tombstone.objects.filter(model='deal')  # type: ignore[attr-defined]
+        return sync_response(request, queryset, tombstones, DealSerializer)
+
 def custom_exception_handler(exc, context):
     """
     Custom exception handler for better error logging and response formatting.
     """
     # Log the exception with context
     logger.error(
-        f"Exception in {context['view'].__class__.__name__}: {str(exc)}",
+        'Exception in %s: %s', context['view'].__class__.__name__, exc,
         exc_info=True,
         extra={
             'view': context['view'].__class__.__name__,
@@ -593,7 +669,6 @@ def custom_exception_handler(exc, context):
     )
     
     # Call the default exception handler
-    from rest_framework.views import exception_handler
     response = exception_handler(exc, context)
     
     if response is None:
@@ -624,7 +699,7 @@ class SavedDealViewSet(viewsets.ModelViewSet):
             user=self.request.user,
             action_type='save',
             ip_address=self.get_client_ip(self.request),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
+            agent_id=UserAgent.id_for(self.request.META.get('HTTP_USER_AGENT', ''))
         )
 
     def destroy(self, request, *args, **kwargs):
@@ -638,29 +713,40 @@ class SavedDealViewSet(viewsets.ModelViewSet):
             user=request.user,
             action_type='unsave',
             ip_address=self.get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', ''))
         )
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 # Notification endpoints
+class NotificationPagination(CursorPagination):
+    """Newest first; `cursor` pages stay stable while new notifications arrive."""
+    ordering = '-created_at'
+    page_size = settings.NOTIFICATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
 class NotificationViewSet(viewsets.ModelViewSet):
     """
-    CRUD for notifications.
+    The user's notification inbox. The list is paginated and embeds a short deal
+    summary; `unread=1` lists only unread notifications. unread-count reads the
+    counter maintained by api/inbox.py.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)  # type: ignore[attr-defined]
+        queryset = Notification.objects.filter(user=self.request.user).select_related('related_deal')  # type: ignore[attr-defined]
+        if self.action == 'list' and self.request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+        return queryset.order_by('-created_at')
+
+    def get_serializer_class(self):
+        return NotificationListSerializer if self.action == 'list' else NotificationSerializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -668,14 +754,30 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['patch'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        inbox.mark_read(request.user.id, [notification.id])
+        notification.refresh_from_db()
         return Response(NotificationSerializer(notification).data)
 
     @action(detail=False, methods=['patch'])
     def mark_all_read(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)  # type: ignore[attr-defined]
-        return Response({'message': 'All notifications marked as read'})
+        changed = inbox.mark_read(request.user.id)
+        return Response({'message': 'All notifications marked as read', 'updated': changed})
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({'unread': inbox.unread_count(request.user.id)})
+
+# Incremental notification sync for mobile clients
+class NotificationSyncView(generics.GenericAPIView):
+    """
+    Return the current user's notifications created, updated or deleted since the `since` cursor.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        queryset = Notification.objects.filter(user=request.user).select_related('related_deal__business')  # type: ignore[attr-defined]
+        tombstones = Tombstone.objects.filter(model='notification', user_id=request.user.id)  # type: ignore[attr-defined]
+        return sync_response(request, queryset, tombstones, NotificationSerializer)
 
 # Analytics endpoints
 class AnalyticsView(generics.GenericAPIView):
@@ -708,7 +810,10 @@ class AnalyticsView(generics.GenericAPIView):
         # Get deals
         deals = Deal.objects.filter(business__in=businesses)  # type: ignore[attr-defined]
         if deal_id:
-            deals = deals.filter(id=deal_id)
+            try:
+                deals = deals.filter(id=int(deal_id))
+            except ValueError:
+                return Response({'message': 'dealId must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get analytics data for the timeframe
         analytics = DealAnalytics.objects.filter(
@@ -721,9 +826,11 @@ class AnalyticsView(generics.GenericAPIView):
         timeframe_clicks = analytics.filter(action_type='click').count()
         timeframe_saves = analytics.filter(action_type='save').count()
 
-        # Get current totals from Deal model (all-time)
-        total_views = deals.aggregate(total=Sum('views'))['total'] or 0
-        total_clicks = deals.aggregate(total=Sum('clicks'))['total'] or 0
+        # All-time totals: Deal.views/clicks plus unreconciled counter shards
+        deals = list(deals)
+        current = counter_totals([deal.id for deal in deals])
+        total_views = sum(views for views, _ in current.values())
+        total_clicks = sum(clicks for _, clicks in current.values())
 
         # Deal-specific analytics
         deal_analytics = []
@@ -735,9 +842,7 @@ class AnalyticsView(generics.GenericAPIView):
                 saves=Count('id', filter=Q(action_type='save'))
             )
             
-            # Get current totals from Deal model
-            deal_current_views = deal.views or 0
-            deal_current_clicks = deal.clicks or 0
+            deal_current_views, deal_current_clicks = current.get(deal.id, (deal.views, deal.clicks))
             
             deal_analytics.append({
                 'id': deal.id,
@@ -766,12 +871,68 @@ class AnalyticsView(generics.GenericAPIView):
             'clickThroughRate': (total_clicks / total_views * 100) if total_views > 0 else 0,
             'conversionRate': (timeframe_saves / timeframe_views * 100) if timeframe_views > 0 else 0,
             'avgRadiusReach': '5.2',  # Placeholder - would need to calculate from location data
-            'totalDeals': deals.count(),
+            'totalDeals': len(deals),
             'deals': deal_analytics  # Include deals array for frontend
         })
 
+# Raw analytics export for business owners
+class AnalyticsExportView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Stream the DealAnalytics rows of the caller's deals as CSV (default) or
+    NDJSON (`type=ndjson`). `from` and `to` are ISO dates or datetimes; `to` is
+    inclusive for dates and defaults to now, `from` to 30 days before `to`.
+    Optional `dealId` limits the export to one deal.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def _parse_bound(value, end=False):
+        moment = parse_datetime(value)
+        if moment is not None:
+            return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        return moment + timedelta(days=1) if end else moment
+
+    def get(self, request):
+        deals = Deal.objects.filter(business__owner_user=request.user)  # type: ignore[attr-defined]
+        deal_id = request.query_params.get('dealId')
+        if deal_id:
+            try:
+                deals = deals.filter(id=int(deal_id))
+            except ValueError:
+                return Response({'message': 'dealId must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        deals = dict(deals.values_list('id', 'title'))
+        if not deals:
+            return Response({'message': 'No deals found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            end = self._parse_bound(request.query_params['to'], end=True) if 'to' in request.query_params else timezone.now()
+            start = self._parse_bound(request.query_params['from']) if 'from' in request.query_params else end - timedelta(days=30)
+        except ValueError:
+            return Response({'message': 'from and to must be ISO dates or datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({'message': 'from must be before to'}, status=status.HTTP_400_BAD_REQUEST)
+        if end - start > timedelta(days=settings.ANALYTICS_EXPORT_MAX_DAYS):
+            return Response(
+                {'message': f'The range is limited to {settings.ANALYTICS_EXPORT_MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        output = request.query_params.get('type', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response({'message': 'type must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = export_analytics_rows(deals, start, end, using=router.db_for_read(DealAnalytics))
+        filename = f"analytics-{start:%Y%m%d}-{end:%Y%m%d}.{output}"
+        logger.info('Analytics export by user %s: %s deals, %s to %s', request.user.id, len(deals), start, end)
+        if output == 'ndjson':
+            return ndjson_response(filename, ANALYTICS_EXPORT_COLUMNS, rows)
+        return csv_response(filename, ANALYTICS_EXPORT_COLUMNS, rows)
+
 # Verified Businesses endpoint (for customer directory)
-class VerifiedBusinessesView(generics.ListAPIView):
+class VerifiedBusinessesView(ReplicaReadMixin, generics.ListAPIView):
     """
     List all verified businesses for customer directory.
     """
@@ -784,7 +945,8 @@ class VerifiedBusinessesView(generics.ListAPIView):
         # Filter by category if provided
         category = self.request.query_params.get('category')
         if category:
-            queryset = queryset.filter(categories__icontains=category.lower())
+            # JSONB containment, served by the GIN index on categories
+            queryset = queryset.filter(categories__contains=[category.strip().lower()])
         
         # Filter by location if provided
         lat = self.request.query_params.get('lat')
@@ -802,15 +964,14 @@ class VerifiedBusinessesView(generics.ListAPIView):
         return queryset
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        businesses = list(self.get_queryset())
+        serializer = self.get_serializer(businesses, many=True)
         data = serializer.data
         
-        # Add deal count for each business
-        for business_data in data:
-            business_id = business_data['id']
+        # Add deal count for each business (ids from the instances: ?fields= may drop `id`)
+        for business, business_data in zip(businesses, data):
             deal_count = Deal.objects.filter(
-                business_id=business_id,
+                business_id=business.id,
                 is_active=True,
                 end_time__gte=timezone.now()
             ).count()
@@ -910,7 +1071,7 @@ class BusinessVerificationView(generics.GenericAPIView):
         })
 
 # Business Detail with Deals endpoint
-class BusinessDetailWithDealsView(generics.RetrieveAPIView):
+class BusinessDetailWithDealsView(ReplicaReadMixin, generics.RetrieveAPIView):
     """
     Get business details with their active deals.
     """
@@ -929,17 +1090,17 @@ class BusinessDetailWithDealsView(generics.RetrieveAPIView):
             end_time__gte=timezone.now()
         ).order_by('-created_at')
         
-        deals_data = DealSerializer(deals, many=True, context={'request': request}).data
+        deals_data = DealListSerializer(deals, many=True, context={'request': request}).data
         business_data['deals'] = deals_data
         
         return Response(business_data)
 
 # Search functionality
-class DealSearchView(generics.ListAPIView):
+class DealSearchView(ReplicaReadMixin, generics.ListAPIView):
     """
     Search deals by title, description, or category.
     """
-    serializer_class = DealSerializer
+    serializer_class = DealListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -954,7 +1115,7 @@ class DealSearchView(generics.ListAPIView):
             Q(category__icontains=query),
             is_active=True,
             end_time__gt=timezone.now()
-        ).select_related('business')
+        )
 
         # Apply filters
         category = self.request.query_params.get('category')
@@ -1010,56 +1171,75 @@ def record_deal_interaction(request, deal_id):
     """
     Record deal interaction (view, click, etc.).
     """
-    try:
-        deal = Deal.objects.get(id=deal_id)  # type: ignore[attr-defined]
-        action_type = request.data.get('action_type', 'view')
-        
-        # Check if this user has already performed this action for this deal
-        existing_interaction = DealAnalytics.objects.filter(
-            deal=deal,
-            user=request.user,
-            action_type=action_type
-        ).first()
-        
-        if not existing_interaction:
-            # Create analytics record
-            DealAnalytics.objects.create(
-                deal=deal,
-                user=request.user,
-                action_type=action_type,
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
-            
-            # Update deal stats using F() to avoid race conditions
-            if action_type == 'view':
-                deal.views = F('views') + 1
-            elif action_type == 'click':
-                deal.clicks = F('clicks') + 1
-            
-            deal.save()
-            # Refresh the deal object to get the updated count
-            deal.refresh_from_db()
-            logger.info(f"{action_type} recorded for deal {deal.id} by user {request.user.id}")
-        else:
-            logger.info(f"User {request.user.id} already performed {action_type} for deal {deal.id}")
-
-        return Response({
-            'message': f'{action_type} recorded successfully',
-            'views': deal.views,
-            'clicks': deal.clicks,
-            'ctr': (deal.clicks / deal.views * 100) if deal.views > 0 else 0
-        })
-    except Deal.DoesNotExist:  # type: ignore[attr-defined]
+    action_type = request.data.get('action_type', 'view')
+    if action_type not in dict(DealAnalytics.ACTION_CHOICES):
+        return Response({'message': f'Invalid action_type: {action_type}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Insert-if-first, log and count in one round trip (see api/interactions.py)
+    counters = record_interactions(
+        request.user,
+        [(deal_id, action_type, None)],
+        ip_address=get_client_ip(request),
+        agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
+    ).get(deal_id)
+    if counters is None:
         return Response({'message': 'Deal not found'}, status=status.HTTP_404_NOT_FOUND)
 
-def get_client_ip(request):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
+    if counters['recorded']:
+        sample(logger, '%s recorded for deal %s by user %s', action_type, deal_id, request.user.id)
     else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+        sample(logger, 'User %s already performed %s for deal %s', request.user.id, action_type, deal_id)
+
+    return Response({
+        'message': f'{action_type} recorded successfully',
+        'views': counters['views'],
+        'clicks': counters['clicks'],
+        'ctr': (counters['clicks'] / counters['views'] * 100) if counters['views'] > 0 else 0
+    })
+
+# Batched deal interaction tracking
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def record_deal_interactions_batch(request):
+    """
+    Record a batch of deal interactions ({deal_id, action_type, ts}) in a single statement.
+    Each (deal, action) counts once per user, as in record_deal_interaction.
+    """
+    serializer = DealInteractionBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    events = serializer.validated_data['events']
+
+    now = timezone.now()
+    oldest = now - timedelta(days=1)
+    # Dedupe, insert, log and count every event in one statement (see api/interactions.py).
+    # Client timestamps are trusted only within the last day.
+    counters = record_interactions(
+        request.user,
+        [
+            (event['deal_id'], event['action_type'], min(max(event.get('ts') or now, oldest), now))
+            for event in events
+        ],
+        ip_address=get_client_ip(request),
+        agent_id=UserAgent.id_for(request.META.get('HTTP_USER_AGENT', '')),
+    )
+    invalid = sorted({event['deal_id'] for event in events if event['deal_id'] not in counters})
+    recorded = sum(len(deal['recorded']) for deal in counters.values())
+    logger.info('Batch of %s interactions from user %s: %s recorded', len(events), request.user.id, recorded)
+
+    return Response({
+        'recorded': recorded,
+        'duplicates': sum(1 for event in events if event['deal_id'] in counters) - recorded,
+        'invalid_deal_ids': invalid,
+        'deals': [
+            {
+                'id': deal_id,
+                'views': deal['views'],
+                'clicks': deal['clicks'],
+                'ctr': (deal['clicks'] / deal['views'] * 100) if deal['views'] > 0 else 0,
+            }
+            for deal_id, deal in counters.items()
+        ],
+    })
 
 # Add more API views here (auth, users, businesses, deals, etc.)
 # See README.md and inline comments for documentation.
@@ -1085,19 +1265,21 @@ class CustomerRequestViewSet(viewsets.ModelViewSet):
                     return CustomerRequest.objects.filter(is_active=True)
                 
                 # Filter requests by categories that match business categories
-                # Convert categories to lowercase for case-insensitive matching
+                # LOWER(category) IN (...) uses the partial expression index on active requests
                 business_categories_lower = [cat.lower() for cat in business_categories]
                 
-                return CustomerRequest.objects.filter(
+                return CustomerRequest.objects.alias(
+                    category_lower=Lower('category')
+                ).filter(
                     is_active=True,
-                    category__iregex=r'^(' + '|'.join(business_categories_lower) + ')$'
+                    category_lower__in=business_categories_lower
                 )
                 
             except Business.DoesNotExist:
                 # If no business profile found, return empty queryset
                 return CustomerRequest.objects.none()
         else:
-            return CustomerRequest.objects.filter(user=self.request.user)
+            return CustomerRequest.objects.filter(user=self.request.user).order_by('-created_at')
 
     def perform_create(self, serializer):
         request = serializer.save(user=self.request.user)
@@ -1106,14 +1288,12 @@ class CustomerRequestViewSet(viewsets.ModelViewSet):
         try:
             self.send_request_notifications(request)
         except Exception as e:
-            logger.error(f"Failed to send request notifications: {str(e)}")
+            logger.error('Failed to send request notifications: %s', e)
         
-        logger.info(f"Customer request created: {request.id} by user {self.request.user.id}")
+        logger.info('Customer request created: %s by user %s', request.id, self.request.user.id)
     
     def send_request_notifications(self, customer_request):
         """Send SMS notifications to all businesses about the new customer request."""
-        from .utils import notify
-        
         # Get all business users
         business_users = User.objects.filter(role='business')
         
@@ -1134,11 +1314,11 @@ class CustomerRequestViewSet(viewsets.ModelViewSet):
                         clean_phone = business_user.phone[1:]
                     
                     notify(clean_phone, business_message)
-                    logger.info(f"Request notification sent to {business_user.phone} for request {customer_request.id}")
+                    sample(logger, 'Request notification sent to %s for request %s', business_user.phone, customer_request.id)
             except Exception as e:
-                logger.error(f"Failed to send SMS to {business_user.phone}: {str(e)}")
+                logger.error('Failed to send SMS to %s: %s', business_user.phone, e)
         
-        logger.info(f"Request notifications sent to {business_users.count()} businesses")
+        logger.info('Request notifications sent to %s businesses', business_users.count())
 
 # Business Request Notifications endpoint
 class BusinessRequestNotificationsView(generics.ListAPIView):
@@ -1195,7 +1375,7 @@ class BusinessRequestNotificationsView(generics.ListAPIView):
         return Response(data)
 
 # Platform Statistics endpoint
-class PlatformStatsView(generics.GenericAPIView):
+class PlatformStatsView(ReplicaReadMixin, generics.GenericAPIView):
     """
     Get platform statistics for business users.
     """
@@ -1207,27 +1387,18 @@ class PlatformStatsView(generics.GenericAPIView):
             return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            # Get total customers (users with role 'user')
-            total_customers = User.objects.filter(role='user').count()
-            
-            # Get total businesses (users with role 'business')
-            total_businesses = User.objects.filter(role='business').count()
-            
-            # Get total active deals
-            total_active_deals = Deal.objects.filter(is_active=True, end_time__gte=timezone.now()).count()
-            
-            # Get total customer requests
-            total_customer_requests = CustomerRequest.objects.filter(is_active=True).count()
+            # One cached primary-key read of the materialized snapshot
+            stats = PlatformStats.current()
             
             return Response({
-                'total_customers': total_customers,
-                'total_businesses': total_businesses,
-                'total_active_deals': total_active_deals,
-                'total_customer_requests': total_customer_requests,
-                'last_updated': timezone.now().isoformat(),
+                'total_customers': stats.total_customers,
+                'total_businesses': stats.total_businesses,
+                'total_active_deals': stats.total_active_deals,
+                'total_customer_requests': stats.total_customer_requests,
+                'last_updated': stats.updated_at.isoformat(),  # Real age of the snapshot
             })
         except Exception as e:
-            logger.error(f"Error getting platform stats: {str(e)}")
+            logger.error('Error getting platform stats: %s', e)
             return Response(
                 {'error': 'Failed to get platform statistics'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1236,20 +1407,11 @@ class PlatformStatsView(generics.GenericAPIView):
 # Utility to check user notification preferences
 
 def user_wants_notification(user, notification_type):
-    prefs = getattr(user, 'preferences', {})
-    if isinstance(prefs, dict):
-        notif_prefs = prefs.get('notifications', {})
-        # Map notification_type to preference key
-        mapping = {
-            'new_deal': 'dealAlerts',
-            'deal_expiring': 'expiringDeals',
-            'deal_expiring_soon': 'expiringDeals',
-            'new_business': 'newBusinesses',
-            'deal_removed': 'dealAlerts',
-        }
-        pref_key = mapping.get(notification_type, None)
-        if pref_key is not None:
-            return notif_prefs.get(pref_key, True)
+    # Columns are kept in sync with preferences by User.save(); prefer filtering
+    # querysets with User.notification_audience() over calling this per user
+    field = User.NOTIFICATION_TYPE_FIELDS.get(notification_type)
+    if field is not None:
+        return getattr(user, field, True)
     return True  # Default to True if not set
 
 class TokenRefreshView(SimpleJWTTokenRefreshView):
@@ -1259,5 +1421,5 @@ class TokenRefreshView(SimpleJWTTokenRefreshView):
         except get_user_model().DoesNotExist:
             return Response({'detail': 'User not found or inactive.'}, status=status.HTTP_401_UNAUTHORIZED)
         except Exception as e:
-            logger.error(f"Exception in TokenRefreshView: {e}")
+            logger.error('Exception in TokenRefreshView: %s', e)
             return Response({'detail': 'Token refresh failed.'}, status=status.HTTP_401_UNAUTHORIZED)
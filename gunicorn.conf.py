@@ -0,0 +1,102 @@
+"""
+Gunicorn configuration. Pick a worker profile with GUNICORN_PROFILE:
+
+- cpu: sync workers, 2 x CPUs + 1. For CPU-bound work.
+- io-threaded (default): gthread workers, CPUs + 1 processes with
+  GUNICORN_THREADS threads each. Most requests wait on PostGIS or the SMS gateway.
+- async-gevent: gevent workers with GUNICORN_WORKER_CONNECTIONS greenlets
+  each. Needs `pip install gevent`; psycopg 3 yields to other greenlets on
+  its own. Connections are closed after each request unless DB_POOL is set
+  (see DATABASES in settings.py).
+
+Every value can be overridden with the GUNICORN_* variables below.
+Each thread or greenlet holds its own database connection, so keep
+workers x threads below the Postgres connection limit (or use DB_POOL).
+"""
+import multiprocessing
+import os
+import threading
+
+PROFILES = {
+    'cpu': {
+        'worker_class': 'sync',
+        'workers': lambda cpus: cpus * 2 + 1,
+        'threads': 1,
+    },
+    'io-threaded': {
+        'worker_class': 'gthread',
+        'workers': lambda cpus: cpus + 1,
+        'threads': 8,
+    },
+    'async-gevent': {
+        'worker_class': 'gevent',
+        'workers': lambda cpus: cpus + 1,
+        'threads': 1,
+    },
+}
+
+profile_name = os.environ.get('GUNICORN_PROFILE', 'io-threaded')
+if profile_name not in PROFILES:
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE {profile_name!r}, expected one of {', '.join(PROFILES)}")
+profile = PROFILES[profile_name]
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))  # Respects container CPU pinning
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = profile['worker_class']
+workers = int(os.environ.get('GUNICORN_WORKERS', 0)) or profile['workers'](cpu_count())
+threads = int(os.environ.get('GUNICORN_THREADS', profile['threads']))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Recycle workers to cap memory growth; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))  # Behind a proxy that reuses connections
+
+# Fork workers from an already imported app. gevent must monkey-patch before
+# the app is imported, so it loads the app in each worker instead.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1' if worker_class != 'gevent' else '0') == '1'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None  # RequestLoggingMiddleware logs requests
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """
+    Open database connections before the worker takes traffic. Django
+    connections are per thread, so gthread workers warm one per pool thread.
+    """
+    from concurrent.futures import wait
+    from django.db import connections
+
+    def warm(barrier=None):
+        for alias in connections:
+            try:
+                connections[alias].ensure_connection()
+            except Exception as e:
+                worker.log.warning('Warm-up connection to %s failed: %s', alias, e)
+        if barrier is not None:
+            barrier.wait()  # Hold this thread so every task lands on a different one
+
+    pool = getattr(worker, 'tpool', None)
+    if pool is None:
+        warm()
+        return
+    barrier = threading.Barrier(threads, timeout=10)
+    wait([pool.submit(warm, barrier) for _ in range(threads)], timeout=15)
+
+
+def on_starting(server):
+    server.log.info(
+        'Gunicorn profile %s: %s workers x %s threads (%s)',
+        profile_name, workers, threads, worker_class,
+    )
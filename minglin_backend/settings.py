@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import environ
 
 # Initialize environment variables
@@ -67,7 +68,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django_prometheus.middleware.PrometheusBeforeMiddleware',
+    # Brotli/gzip response compression (COMPRESSION_MIN_SIZE)
+    'api.middleware.CompressionMiddleware',
+    # Request ids and one timing line per request
+    'api.middleware.RequestLoggingMiddleware',
+    # Adaptive trace sampling and the local span recorder (TRACE_FILE)
+    'api.tracing.TracingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Token-bucket throttling, before sessions/auth so rejections cost no DB work
+    'api.throttling.ThrottleMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,10 +85,10 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_prometheus.middleware.PrometheusAfterMiddleware',
+    # Read-replica routing state and read-your-writes stickiness
+    'api.routers.ReplicaRoutingMiddleware',
     # Custom SRE middleware
-    'api.middleware.RequestLoggingMiddleware',
     'api.middleware.ErrorLoggingMiddleware',
-    'api.middleware.PerformanceMonitoringMiddleware',
 ]
 
 ROOT_URLCONF = 'minglin_backend.urls'
@@ -114,9 +123,73 @@ DATABASES = {
         'PASSWORD': env('POSTGRES_PASSWORD', default='minglin'),
         'HOST': env('POSTGRES_HOST', default='localhost'),
         'PORT': env('POSTGRES_PORT', default='5432'),
+        # Keep each worker's connection open across requests instead of paying
+        # TLS, auth and PostGIS type lookup on every request
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+        # Ping a reused connection before the first query of a request
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        'OPTIONS': {
+            'connect_timeout': env.int('DB_CONNECT_TIMEOUT', default=5),
+        },
     }
 }
 
+# Optional psycopg 3 connection pool (psycopg[pool] in requirements.txt).
+# Django manages pooled connections itself, so CONN_MAX_AGE must be 0.
+if env.bool('DB_POOL', default=False):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+        'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),  # Seconds to wait for a free connection
+        'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),
+    }
+    if env.bool('DB_CONN_HEALTH_CHECKS', default=True):
+        from psycopg_pool import ConnectionPool
+        DATABASES['default']['OPTIONS']['pool']['check'] = ConnectionPool.check_connection
+elif env('GUNICORN_PROFILE', default='') == 'async-gevent':
+    # Every greenlet gets its own connection and greenlets are not reused, so
+    # persistent connections would pile up until Postgres refuses new ones
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replicas for public read endpoints (see api/routers.py). Each host in
+# POSTGRES_REPLICA_HOSTS becomes an alias replica_1, replica_2, ... sharing the
+# primary's credentials. In tests replicas mirror the primary database.
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(env.list('POSTGRES_REPLICA_HOSTS', default=[]), start=1):
+    alias = f'replica_{index}'
+    host, _, port = replica_host.partition(':')
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# The test suite gets a mirror of the test database to route reads to (api/tests.py
+# enables it with override_settings(DATABASE_REPLICAS=['replica_test']))
+if sys.argv[1:2] == ['test'] and 'replica_test' not in DATABASES:
+    DATABASES['replica_test'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = env.int('READ_YOUR_WRITES_SECONDS', default=5)  # Keep a user on the primary after they write
+REPLICA_HEALTH_CHECK_INTERVAL = env.int('REPLICA_HEALTH_CHECK_INTERVAL', default=10)
+REPLICA_MAX_LAG_SECONDS = env.int('REPLICA_MAX_LAG_SECONDS', default=30)
+
+
+# Cache
+# Use a cache shared by all workers in production (e.g. CACHE_URL=dbcache://django_cache
+# after `manage.py createcachetable`, or a redis URL). Local memory is per process.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -176,6 +249,12 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        # ?format=compact: businesses de-duplicated, nulls dropped
+        'api.renderers.CompactJSONRenderer',
+    ],
     'EXCEPTION_HANDLER': 'api.views.custom_exception_handler',
 }
 
@@ -219,42 +298,140 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=36500),
 }
 
+# Client IP resolution: number of trusted proxies in front of Django that append
+# to X-Forwarded-For (1 = nginx; 0 = no proxy, use REMOTE_ADDR)
+TRUSTED_PROXY_COUNT = env.int('TRUSTED_PROXY_COUNT', default=1)
+
+# Throttling (api/throttling.py): URL name -> {'ip': rate, 'user': rate}, rates as
+# 'N/s', 'N/m', 'N/h' or 'N/d' (bucket size N). 'default' covers other /api/ routes.
+THROTTLE_ENABLED = env.bool('THROTTLE_ENABLED', default=True)
+THROTTLE_CACHE_ALIAS = env('THROTTLE_CACHE_ALIAS', default='default')
+THROTTLE_RULES = {
+    'send-otp': {'ip': '5/m'},
+    'verify-otp': {'ip': '10/m'},
+    'customer-deals': {'ip': '120/m', 'user': '60/m'},
+    'customer-deal-detail': {'ip': '240/m', 'user': '120/m'},
+    'deal-search': {'ip': '60/m', 'user': '30/m'},
+    'verified-businesses': {'ip': '60/m'},
+    'business-detail-with-deals': {'ip': '120/m'},
+    'deal-sync': {'ip': '60/m'},
+    'default': {'ip': '600/m'},
+}
+
+# OTP storage: 'api.otp.DatabaseOTPBackend' or 'api.otp.CacheOTPBackend' (needs a shared cache)
+OTP_BACKEND = env('OTP_BACKEND', default='api.otp.DatabaseOTPBackend')
+OTP_TTL_SECONDS = env.int('OTP_TTL_SECONDS', default=600)
+OTP_MAX_ATTEMPTS = env.int('OTP_MAX_ATTEMPTS', default=5)
+
+# Incremental sync (deals/sync/, notifications/sync/), see api/sync.py
+SYNC_PAGE_SIZE = env.int('SYNC_PAGE_SIZE', default=500)
+SYNC_SETTLE_SECONDS = env.int('SYNC_SETTLE_SECONDS', default=2)  # Hold back rows from in-flight transactions
+SYNC_TOMBSTONE_RETENTION_DAYS = env.int('SYNC_TOMBSTONE_RETENTION_DAYS', default=30)
+
+# Maximum events accepted by deals/interactions/batch/
+DEAL_INTERACTION_BATCH_LIMIT = env.int('DEAL_INTERACTION_BATCH_LIMIT', default=200)
+
+# DealAnalytics monthly partitions and retention (manage.py analytics_partitions)
+ANALYTICS_PARTITION_MONTHS_AHEAD = env.int('ANALYTICS_PARTITION_MONTHS_AHEAD', default=3)
+ANALYTICS_RETENTION_MONTHS = env.int('ANALYTICS_RETENTION_MONTHS', default=13)  # 0 keeps everything
+ANALYTICS_RETENTION_ACTION = env('ANALYTICS_RETENTION_ACTION', default='archive')  # 'archive' or 'drop'
+ANALYTICS_ARCHIVE_DIR = env('ANALYTICS_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'analytics'))
+
+# Sharded deal view/click counters (api/counters.py); fold them into Deal with
+# `manage.py reconcile_deal_counters` every minute or so
+DEAL_COUNTER_SHARDS = env.int('DEAL_COUNTER_SHARDS', default=16)
+
+# Personalised deal feed (api.ranking)
+FEED_RADIUS_KM = env.float('FEED_RADIUS_KM', default=25.0)
+FEED_CANDIDATE_LIMIT = env.int('FEED_CANDIDATE_LIMIT', default=5000)  # Nearest deals scored per request
+FEED_PAGE_SIZE = env.int('FEED_PAGE_SIZE', default=20)
+FEED_MAX_PAGE_SIZE = env.int('FEED_MAX_PAGE_SIZE', default=100)
+FEED_DISTANCE_SCALE_KM = env.float('FEED_DISTANCE_SCALE_KM', default=5.0)
+FEED_RECENCY_HALF_LIFE_HOURS = env.float('FEED_RECENCY_HALF_LIFE_HOURS', default=72.0)
+FEED_WEIGHTS = {}  # Overrides for api.ranking.DEFAULT_WEIGHTS
+
+# Map tiles of deals (api.tiles)
+TILE_MAX_ZOOM = env.int('TILE_MAX_ZOOM', default=18)
+TILE_CLUSTER_ZOOM = env.int('TILE_CLUSTER_ZOOM', default=12)  # Lower zooms return clustered counts
+TILE_CLUSTER_GRID = env.int('TILE_CLUSTER_GRID', default=8)  # Clusters per tile side
+TILE_MAX_DEALS = env.int('TILE_MAX_DEALS', default=500)
+TILE_CACHE_SECONDS = env.int('TILE_CACHE_SECONDS', default=300)
+TILE_CLIENT_MAX_AGE = env.int('TILE_CLIENT_MAX_AGE', default=30)
+
+# Admin changelists count at most this many filtered rows (api.admin.EstimatedCountPaginator)
+ADMIN_COUNT_LIMIT = env.int('ADMIN_COUNT_LIMIT', default=10000)
+
+# Bulk deal import (api.bulk)
+DEAL_IMPORT_BATCH_SIZE = env.int('DEAL_IMPORT_BATCH_SIZE', default=500)  # Rows per INSERT
+DEAL_IMPORT_MAX_ROWS = env.int('DEAL_IMPORT_MAX_ROWS', default=5000)
+
+# Raw analytics export (api.views.AnalyticsExportView)
+ANALYTICS_EXPORT_MAX_DAYS = env.int('ANALYTICS_EXPORT_MAX_DAYS', default=366)
+ANALYTICS_EXPORT_CHUNK_SIZE = env.int('ANALYTICS_EXPORT_CHUNK_SIZE', default=5000)  # Rows fetched per server-side cursor round trip
+
+# Notification inbox (api.inbox)
+NOTIFICATION_PAGE_SIZE = env.int('NOTIFICATION_PAGE_SIZE', default=50)
+NOTIFICATION_RETENTION_DAYS = env.int('NOTIFICATION_RETENTION_DAYS', default=90)  # Read notifications older than this are pruned
+
+# Materialized platform statistics (api.models.PlatformStats)
+PLATFORM_STATS_MAX_AGE = env.int('PLATFORM_STATS_MAX_AGE', default=900)  # Recount on read when older than this
+PLATFORM_STATS_CACHE_SECONDS = env.int('PLATFORM_STATS_CACHE_SECONDS', default=60)
+
+# Responses smaller than this are not compressed (api.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = env.int('COMPRESSION_MIN_SIZE', default=1024)
+
 # Prometheus metrics endpoint
 PROMETHEUS_EXPORT_MIGRATIONS = False
 
-# Sentry integration (to be configured in production)
-import sentry_sdk
-sentry_sdk.init(
-    dsn=env('SENTRY_DSN', default=''),
-    traces_sample_rate=1.0,
-    send_default_pii=True
-)
+# Trace sampling (api.tracing): health checks and metrics are never traced, hot
+# reads at a low rate, and routes that turn slow or fail are boosted
+TRACE_DROP_PATHS = ['/api/v1/healthcheck/', '/metrics']
+TRACE_DEFAULT_RATE = env.float('TRACE_DEFAULT_RATE', default=0.1)
+TRACE_HOT_READ_RATE = env.float('TRACE_HOT_READ_RATE', default=0.01)
+TRACE_ROUTE_RATES = {
+    route: TRACE_HOT_READ_RATE
+    for route in ['customer-deals', 'customer-deal-detail', 'deal-feed', 'deal-tile', 'deal-search', 'deal-sync', 'verified-businesses']
+}
+TRACE_BOOST_RATE = env.float('TRACE_BOOST_RATE', default=1.0)
+TRACE_BOOST_SECONDS = env.int('TRACE_BOOST_SECONDS', default=300)
+TRACE_REGRESSION_FACTOR = env.float('TRACE_REGRESSION_FACTOR', default=2.0)  # Recent vs baseline latency
+TRACE_FILE = env('TRACE_FILE', default='')  # JSON-lines span output of the local recorder
+
+# Sentry integration (to be configured in production). The SDK and its
+# integrations are only imported when a DSN is set.
+SENTRY_DSN = env('SENTRY_DSN', default='')
+if SENTRY_DSN:
+    import sentry_sdk
+    from api.tracing import traces_sampler
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        traces_sampler=traces_sampler,
+        send_default_pii=True
+    )
 
 # Use custom user model for authentication
 AUTH_USER_MODEL = 'api.User'  # See api/models.py for details
 
 # Logging configuration for SRE
+LOG_LEVEL = env('LOG_LEVEL', default='INFO')
+LOG_FORMAT = env('LOG_FORMAT', default='json')  # 'json' or 'text'
+LOG_SAMPLE_RATE = env.float('LOG_SAMPLE_RATE', default=0.01)  # Share of per-row messages kept (api.log.sample)
+REQUEST_LOG_SAMPLE_RATE = env.float('REQUEST_LOG_SAMPLE_RATE', default=1.0)  # Share of fast, successful requests logged
+SLOW_REQUEST_THRESHOLD = env.float('SLOW_REQUEST_THRESHOLD', default=1.0)  # Seconds
+
+# Records are queued and written by a background thread (api.log.QueueListenerHandler)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
-        'json': {
-            'format': '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "module": "%(name)s", "message": "%(message)s"}',
-        },
-    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'class': 'api.log.QueueListenerHandler',
+            'output': LOG_FORMAT,
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'django': {
@@ -264,7 +441,7 @@ LOGGING = {
         },
         'api': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
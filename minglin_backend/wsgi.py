@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'minglin_backend.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf (and with it every view, serializer and model) now, so
+# gunicorn --preload workers fork from a warmed parent instead of paying for
+# it on their first request.
+if os.environ.get('WSGI_WARMUP', '1') == '1':
+    from django.urls import get_resolver
+    get_resolver().url_patterns
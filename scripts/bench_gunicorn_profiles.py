@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Compare gunicorn worker profiles (gunicorn.conf.py) under concurrent load.
+
+For each profile, starts gunicorn, waits for the healthcheck, then runs
+--concurrency client threads against each endpoint for --duration seconds
+and reports throughput and p50/p95 latency. Run from the project root, e.g.:
+
+    python scripts/bench_gunicorn_profiles.py
+    python scripts/bench_gunicorn_profiles.py --profiles cpu io-threaded --concurrency 64 \\
+        --path /api/v1/deals/customer/ --path '/api/v1/deals/feed/?lat=-15.41&lon=28.28'
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_startup import wait_healthy
+
+DEFAULT_PATHS = ['/api/v1/healthcheck/', '/api/v1/deals/customer/']
+
+
+def load(url, duration, concurrency, headers):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return sorted(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['cpu', 'io-threaded', 'async-gevent'])
+    parser.add_argument('--path', action='append', dest='paths')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--token', help='JWT access token sent as a Bearer Authorization header')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    for profile in args.profiles:
+        env = {**os.environ, 'GUNICORN_PROFILE': profile, 'GUNICORN_BIND': f'127.0.0.1:{args.port}'}
+        server = subprocess.Popen(
+            ['gunicorn', '-c', 'gunicorn.conf.py', 'minglin_backend.wsgi:application'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        try:
+            if wait_healthy(base_url + '/api/v1/healthcheck/', 60) is None:
+                print(f'{profile}: server did not become healthy', file=sys.stderr)
+                continue
+            for path in args.paths or DEFAULT_PATHS:
+                latencies, errors = load(base_url + path, args.duration, args.concurrency, headers)
+                if not latencies:
+                    print(f'{profile} {path}: all {errors} requests failed')
+                    continue
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                print(
+                    f'{profile:<13} {path} rps={len(latencies) / args.duration:.1f} '
+                    f'p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms errors={errors}'
+                )
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
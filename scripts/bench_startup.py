@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Measure time-to-first-healthy-response of the API server.
+
+Starts the server command, polls the healthcheck until it answers 200, stops
+the server and repeats. Run from the project root, e.g.:
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 5
+    GUNICORN_PRELOAD=0 WSGI_WARMUP=0 python scripts/bench_startup.py
+
+Compare with and without preloading to see the effect of forking from a warmed parent.
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_COMMAND = [
+    'gunicorn', '-c', 'gunicorn.conf.py', 'minglin_backend.wsgi:application', '--bind', '127.0.0.1:8001',
+]
+
+
+def wait_healthy(url, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--url', default='http://127.0.0.1:8001/api/v1/healthcheck/')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('command', nargs='*', default=DEFAULT_COMMAND)
+    args = parser.parse_args()
+
+    samples = []
+    for run in range(1, args.runs + 1):
+        start = time.perf_counter()
+        server = subprocess.Popen(args.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            elapsed = wait_healthy(args.url, args.timeout)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        if elapsed is None:
+            print(f'run {run}: no healthy response within {args.timeout}s', file=sys.stderr)
+            return 1
+        total = time.perf_counter() - start
+        samples.append(total)
+        print(f'run {run}: first healthy response after {total:.2f}s')
+    print(f'median {statistics.median(samples):.2f}s min {min(samples):.2f}s max {max(samples):.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
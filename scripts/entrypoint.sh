@@ -1,5 +1,7 @@
 #!/bin/sh
-# Entrypoint script for Docker: ensures DB is ready, runs migrations, collects static, and starts Gunicorn
+# Entrypoint script for Docker: waits for the DB and starts Gunicorn.
+# Migrations run out of band (the `migrate` service in docker-compose.yml, or
+# `docker compose run --rm web migrate`); set RUN_MIGRATIONS=1 to run them here.
 # See README.md and inline comments for documentation.
 
 set -e
@@ -12,22 +14,33 @@ done
 
 echo "Postgres is up - continuing."
 
-# Fix permissions for mounted volumes (run as root)
-echo "Fixing permissions for mounted volumes..."
-chown -R minglin:minglin /app
-chmod -R 755 /app/api/migrations
-
-# Switch to minglin user for running Django commands
-exec gosu minglin /bin/sh -c "
-  # Create migrations if they don't exist
-  python manage.py makemigrations --noinput
-
-  # Run migrations
-  python manage.py migrate --noinput
-
-  # Collect static files
-  python manage.py collectstatic --noinput
-
-  # Start Gunicorn
-  exec gunicorn minglin_backend.wsgi:application --bind 0.0.0.0:8000 --workers 3
-" 
\ No newline at end of file
+# Only the writable directories need fixing on mounted volumes; a recursive
+# chown of /app is slow and done at build time
+mkdir -p /app/media /app/logs
+chown minglin:minglin /app/media /app/logs
+
+# One-shot migration job: `entrypoint.sh migrate`
+# createcachetable is a no-op unless CACHE_URL is a dbcache:// URL
+if [ "$1" = "migrate" ]; then
+  gosu minglin python manage.py migrate --noinput
+  exec gosu minglin python manage.py createcachetable
+fi
+
+# Management commands, e.g. the announcement worker: `entrypoint.sh manage send_announcements --loop`
+if [ "$1" = "manage" ]; then
+  shift
+  exec gosu minglin python manage.py "$@"
+fi
+
+if [ "$RUN_MIGRATIONS" = "1" ]; then
+  gosu minglin python manage.py migrate --noinput
+  gosu minglin python manage.py createcachetable
+fi
+
+# Static files are collected at build time; set COLLECTSTATIC=1 for mounted source trees
+if [ "$COLLECTSTATIC" = "1" ]; then
+  gosu minglin python manage.py collectstatic --noinput
+fi
+
+# Start Gunicorn; workers, threads and preloading come from gunicorn.conf.py (GUNICORN_PROFILE)
+exec gosu minglin gunicorn -c gunicorn.conf.py minglin_backend.wsgi:application